@@ -0,0 +1,139 @@
+"""Замеры основных эндпоинтов на синтетических данных (см. synthetic.py).
+Каждый эндпоинт вызывается repeat раз через тестовый клиент с JWT;
+для него считаются p50 и p95 времени ответа, число и суммарное время
+SQL-запросов и пиковая память одного вызова (отдельным прогоном под
+tracemalloc, чтобы трассировка не искажала время)."""
+
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Board, ParticipantInBoard
+from .snapshots import invalidate_snapshot
+from taskplanner.metrics import QueryTimer
+from users.models import CustomUser
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(math.ceil(len(ordered) * percent / 100) - 1, 0)
+
+    return ordered[index]
+
+
+def get_scenarios(board_id):
+    """Список (название, метод, путь, данные, подготовка). Данные и
+    подготовка - функции номера повтора; подготовка не замеряется."""
+    board = Board.objects.get(pk=board_id)
+    list_ids = list(board.lists.order_by('position').values_list(
+        'id', flat=True))
+    card_ids = list(board.lists.get(pk=list_ids[0]).cards.order_by(
+        'rank').values_list('id', flat=True))
+    member_id = ParticipantInBoard.objects.filter(board=board).exclude(
+        participant_id=board.author_id).values_list(
+        'participant_id', flat=True).first()
+    target_list_ids = list_ids[1:2] or list_ids[:1]
+
+    def move(number):
+        list_id = target_list_ids[0] if number % 2 == 0 else list_ids[0]
+        return {'id': list_id, 'position': 1}
+
+    def add_member(number):
+        ParticipantInBoard.objects.get_or_create(board=board,
+                                                 participant_id=member_id)
+
+    scenarios = [
+        ('boards-list', 'get', '/api/v1/boards/', None, None),
+        ('boards-detail', 'get', f'/api/v1/boards/{board.id}/', None,
+         lambda number: invalidate_snapshot(board.id)),
+        ('boards-detail-cached', 'get', f'/api/v1/boards/{board.id}/', None,
+         None),
+        ('cards-list', 'get', '/api/v1/cards/', None, None),
+        ('cards-detail', 'get', f'/api/v1/cards/{card_ids[0]}/', None,
+         None),
+        ('cards-change-list', 'post',
+         f'/api/v1/cards/{card_ids[0]}/change_list/', move, None),
+        ('search', 'get', '/api/v1/search/?name=Карточка', None, None),
+    ]
+
+    if len(card_ids) > 2:
+        scenarios.append((
+            'cards-swap', 'post', '/api/v1/cards/swap/',
+            lambda number: {'card_1': card_ids[1], 'card_2': card_ids[2]},
+            None))
+
+    if member_id is not None:
+        scenarios.append((
+            'participants-destroy', 'delete',
+            f'/api/v1/boards/{board.id}/participants/{member_id}/', None,
+            add_member))
+
+    return scenarios
+
+
+def call(client, method, path, data):
+    timer = QueryTimer()
+
+    with connection.execute_wrapper(timer):
+        start = time.perf_counter()
+        response = getattr(client, method)(
+            path, data, content_type='application/json')
+        elapsed = time.perf_counter() - start
+
+    if response.status_code >= 400:
+        raise AssertionError(f'{method.upper()} {path}: '
+                             f'{response.status_code}')
+
+    return elapsed, timer.count, timer.time
+
+
+def measure(client, method, path, data, setup, repeat):
+    latencies, queries, sql_times = [], [], []
+
+    for number in range(repeat + 1):
+        if setup is not None:
+            setup(number)
+
+        elapsed, count, sql_time = call(
+            client, method, path, data(number) if data else None)
+
+        # первый вызов прогревает кэши и не учитывается
+        if number > 0:
+            latencies.append(elapsed)
+            queries.append(count)
+            sql_times.append(sql_time)
+
+    if setup is not None:
+        setup(repeat + 1)
+
+    tracemalloc.start()
+    call(client, method, path, data(repeat + 1) if data else None)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'queries': max(queries),
+        'sql_ms': round(statistics.median(sql_times) * 1000, 3),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+def run(board_id, repeat=20):
+    """Замеряет эндпоинты от имени автора доски board_id и возвращает
+    {название: показатели}."""
+    board = Board.objects.get(pk=board_id)
+    user = CustomUser.objects.get(pk=board.author_id)
+    client = Client(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    return {
+        name: measure(client, method, path, data, setup, repeat)
+        for name, method, path, data, setup in get_scenarios(board_id)
+    }
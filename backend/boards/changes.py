@@ -0,0 +1,209 @@
+"""Выдача изменений доски после версии since по журналу BoardChange и
+сокращение журнала.
+
+Для каждого объекта возвращается только последняя операция: upsert с
+текущим представлением объекта или delete. Представления загружаются
+пачкой - одним запросом на тип объекта. Удаление листа или карточки
+означает и удаление вложенных в них объектов. Если журнал уже сокращен
+дальше since или изменений слишком много, возвращается признак resync:
+клиенту нужно загрузить доску заново."""
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .membership import get_membership
+from .models import Board, BoardChange, ParticipantInBoard
+from .serializers import BoardHeaderSerializer, ParticipantInBoardSerializer
+from .tag_serializer import TagSerializer
+from cards.models import Card, CheckList, Comment, FileInCard
+from cards.serializers import (CardListOrCreateSerializer,
+                               CheckListSerializer, CommentSerializer,
+                               FileInCardSerializer)
+from lists.models import List
+from lists.serializers import ListHeaderSerializer
+from requests.models import Request
+from requests.serializers import BoardRequestSerializer
+
+
+def load_boards(board, ids, request):
+    return Board.objects.with_user_flags(request.user).filter(pk=board.pk)
+
+
+def load_participants(board, ids, request):
+    return ParticipantInBoard.objects.filter(
+        board=board, participant_id__in=ids).select_related('participant')
+
+
+def load_tags(board, ids, request):
+    return board.tags.filter(pk__in=ids)
+
+
+def load_lists(board, ids, request):
+    return List.objects.filter(board=board, pk__in=ids)
+
+
+def load_cards(board, ids, request):
+    return Card.objects.with_position().with_user_flags(
+        request.user).filter(list__board=board, pk__in=ids).with_related()
+
+
+def load_comments(board, ids, request):
+    return Comment.objects.filter(card__list__board=board,
+                                  pk__in=ids).select_related('author')
+
+
+def load_check_lists(board, ids, request):
+    return CheckList.objects.filter(card__list__board=board, pk__in=ids)
+
+
+def load_files(board, ids, request):
+    return FileInCard.objects.filter(card__list__board=board, pk__in=ids)
+
+
+def load_requests(board, ids, request):
+    user = request.user
+    membership = get_membership(board.pk, user.id)
+
+    if not (membership.is_author or membership.is_moderator
+            or user.is_staff):
+        return None
+
+    return Request.objects.filter(board=board,
+                                  pk__in=ids).select_related('user')
+
+
+# тип объекта: (загрузка, сериализатор, поле с id объекта в журнале)
+ENTITIES = {
+    'board': (load_boards, BoardHeaderSerializer, 'id'),
+    'participant': (load_participants, ParticipantInBoardSerializer,
+                    'participant_id'),
+    'tag': (load_tags, TagSerializer, 'id'),
+    'list': (load_lists, ListHeaderSerializer, 'id'),
+    'card': (load_cards, CardListOrCreateSerializer, 'id'),
+    'comment': (load_comments, CommentSerializer, 'id'),
+    'check_list': (load_check_lists, CheckListSerializer, 'id'),
+    'file': (load_files, FileInCardSerializer, 'id'),
+    'request': (load_requests, BoardRequestSerializer, 'id'),
+}
+
+
+def get_resync(version):
+    return {'version': version, 'resync': True, 'changes': []}
+
+
+def get_changes(board, since, request):
+    # версия читается из базы: экземпляр доски мог быть загружен до
+    # изменений, сделанных в этом же запросе
+    version, compacted_version = Board.objects.values_list(
+        'version', 'compacted_version').get(pk=board.pk)
+
+    if since < compacted_version or since > version:
+        return get_resync(version)
+
+    entries = BoardChange.objects.filter(
+        board=board, version__gt=since, version__lte=version,
+    ).order_by('version', 'id').values_list(
+        'version', 'entity', 'entity_id', 'operation')
+    latest = {}
+
+    for entry_version, entity, entity_id, operation in entries.iterator():
+        latest.pop((entity, entity_id), None)
+        latest[entity, entity_id] = (entry_version, operation)
+
+    if len(latest) > settings.BOARD_CHANGES_MAX_RESULTS:
+        return get_resync(version)
+
+    loaded = load_upserts(board, latest, request)
+    changes = []
+
+    for (entity, entity_id), (entry_version, operation) in latest.items():
+        if loaded.get(entity) is None:
+            continue
+
+        change = {'entity': entity, 'id': entity_id,
+                  'version': entry_version}
+
+        if entity_id in loaded[entity]:
+            change['operation'] = BoardChange.Operation.UPSERT
+            change['data'] = loaded[entity][entity_id]
+        else:
+            change['operation'] = BoardChange.Operation.DELETE
+
+        changes.append(change)
+
+    return {'version': version, 'resync': False, 'changes': changes}
+
+
+def load_upserts(board, latest, request):
+    """Возвращает {тип объекта: {id: данные}} для объектов, последняя
+    операция над которыми - upsert. None вместо словаря означает, что
+    пользователю не положено видеть объекты этого типа."""
+    ids = {}
+
+    for (entity, entity_id), (_, operation) in latest.items():
+        ids.setdefault(entity, [])
+
+        if operation == BoardChange.Operation.UPSERT:
+            ids[entity].append(entity_id)
+
+    loaded = {}
+    context = {'request': request}
+
+    for entity, entity_ids in ids.items():
+        load, serializer_class, id_field = ENTITIES[entity]
+        queryset = load(board, entity_ids, request)
+
+        if queryset is None:
+            loaded[entity] = None
+            continue
+
+        objects = list(queryset) if entity_ids else []
+        data = serializer_class(objects, many=True, context=context).data
+        loaded[entity] = {getattr(obj, id_field): item
+                          for obj, item in zip(objects, data)}
+
+    return loaded
+
+
+def compact_changes(max_age=None, max_entries=None):
+    """Удаляет записи журнала старше max_age и сверх max_entries последних
+    записей каждой доски. Версия, до которой журнал удален, сохраняется в
+    Board.compacted_version. Возвращает число удаленных записей."""
+
+    if max_age is None:
+        max_age = settings.BOARD_CHANGES_MAX_AGE
+
+    if max_entries is None:
+        max_entries = settings.BOARD_CHANGES_MAX_ENTRIES
+
+    thresholds = dict(BoardChange.objects.filter(
+        created_at__lt=timezone.now() - max_age,
+    ).order_by().values('board').annotate(version=Max('version')).values_list(
+        'board', 'version'))
+
+    crowded = BoardChange.objects.order_by().values('board').annotate(
+        count=Count('id')).filter(count__gt=max_entries).values_list(
+        'board', flat=True)
+
+    for board_id in crowded:
+        oldest_kept = BoardChange.objects.filter(
+            board_id=board_id,
+        ).order_by('-version', '-id').values_list(
+            'version', flat=True)[max_entries - 1]
+
+        if oldest_kept > 1:
+            thresholds[board_id] = max(thresholds.get(board_id, 0),
+                                       oldest_kept - 1)
+
+    deleted = 0
+
+    for board_id, version in thresholds.items():
+        count, _ = BoardChange.objects.filter(
+            board_id=board_id, version__lte=version).delete()
+        Board.objects.filter(pk=board_id,
+                             compacted_version__lt=version).update(
+            compacted_version=version)
+        deleted += count
+
+    return deleted
@@ -4,6 +4,8 @@ from .models import Board
 
 
 class BoardFilter(filters.FilterSet):
+    """Фильтры опираются на аннотации BoardQuerySet.with_user_flags,
+    которые добавляет BoardViewSet.get_queryset."""
     is_favored = filters.BooleanFilter(method='get_is_favored')
     is_author = filters.BooleanFilter(method='get_is_author')
     is_participant = filters.BooleanFilter(method='get_is_participant')
@@ -13,25 +15,10 @@ class BoardFilter(filters.FilterSet):
         fields = ('is_favored', 'is_author', 'is_participant')
 
     def get_is_favored(self, queryset, name, value):
-        user = self.request.user
-
-        if value:
-            return queryset.filter(favorite_board__user=user)
-
-        return queryset.exclude(favorite_board__user=user)
+        return queryset.filter(is_favored=value)
 
     def get_is_author(self, queryset, name, value):
-        user = self.request.user
-
-        if value:
-            return queryset.filter(author=user)
-
-        return queryset.exclude(author=user)
+        return queryset.filter(is_author=value)
 
     def get_is_participant(self, queryset, name, value):
-        user = self.request.user
-
-        if value:
-            return queryset.filter(participants__id=user.id)
-
-        return queryset.exclude(participants__id=user.id)
+        return queryset.filter(is_participant=value)
@@ -0,0 +1,20 @@
+"""Загрузка доски целиком (списки, карточки, теги, id связанных объектов
+и автор) за фиксированное число запросов, не зависящее от размера доски.
+Признак избранного берется из аннотаций BoardQuerySet.with_user_flags."""
+
+from django.db.models import Prefetch
+
+from cards.models import Card
+from users.models import CustomUser
+
+
+def load_board_detail(queryset, user):
+    cards = Card.objects.with_list_position().with_user_flags(
+        user).with_related()
+
+    return queryset.select_related('author').prefetch_related(
+        'tags',
+        'lists',
+        Prefetch('participants', queryset=CustomUser.objects.only('id')),
+        Prefetch('lists__cards', queryset=cards),
+    )
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases,
+                               teardown_test_environment)
+
+from boards import benchmark, synthetic
+
+SIZES = {
+    'users': 50,
+    'boards': 10,
+    'participants': 10,
+    'lists': 10,
+    'cards': 30,
+    'comments': 5,
+    'tags': 2,
+    'card_participants': 2,
+}
+
+
+class Command(BaseCommand):
+    help = ('Создает тестовую базу с синтетическими данными, замеряет '
+            'основные эндпоинты и выводит результаты в JSON')
+
+    def add_arguments(self, parser):
+        for name, default in SIZES.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int,
+                                default=default, dest=name)
+
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='число замеров каждого эндпоинта')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output',
+                            help='файл для результатов (по умолчанию - '
+                                 'стандартный вывод)')
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in SIZES}
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+
+        try:
+            start = time.perf_counter()
+            _, board_ids = synthetic.generate(seed=options['seed'], **sizes)
+            generation_time = time.perf_counter() - start
+            endpoints = benchmark.run(board_ids[0], options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        result = json.dumps({
+            'parameters': {**sizes, 'repeat': options['repeat'],
+                           'seed': options['seed']},
+            'generation_s': round(generation_time, 3),
+            'endpoints': endpoints,
+        }, indent=2, ensure_ascii=False)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(result + '\n')
+        else:
+            self.stdout.write(result)
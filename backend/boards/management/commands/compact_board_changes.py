@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from boards.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = ('Удаляет старые записи журнала изменений досок; клиенты, '
+            'отставшие дальше сокращенного журнала, получат resync')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            default=settings.BOARD_CHANGES_MAX_AGE.days,
+            help='удалять записи старше указанного числа дней')
+        parser.add_argument(
+            '--keep', type=int,
+            default=settings.BOARD_CHANGES_MAX_ENTRIES,
+            help='сколько последних записей оставлять для каждой доски')
+
+    def handle(self, *args, **options):
+        count = compact_changes(max_age=timedelta(days=options['days']),
+                                max_entries=options['keep'])
+
+        self.stdout.write(f'Удалено записей журнала: {count}')
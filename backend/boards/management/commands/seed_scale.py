@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from boards import synthetic
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными промышленного объема: '
+            'размеры досок распределены с длинным хвостом, несколько '
+            'досок получаются огромными')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--boards', type=int, default=10000)
+        parser.add_argument('--lists', type=float, default=4,
+                            help='число листов на доске обычного размера')
+        parser.add_argument('--cards', type=float, default=12,
+                            help='медиана числа карточек в листе')
+        parser.add_argument('--comments', type=float, default=2,
+                            help='среднее число комментариев к карточке')
+        parser.add_argument('--check-lists', type=float, default=2,
+                            dest='check_lists',
+                            help='среднее число пунктов чек-листа')
+        parser.add_argument('--max-lists', type=int, default=100)
+        parser.add_argument('--max-cards', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch', type=int, default=20,
+                            help='число досок, создаваемых за одну '
+                                 'транзакцию')
+        parser.add_argument('--prefix', default='seed',
+                            help='префикс имен пользователей')
+
+    def handle(self, *args, **options):
+        """Масштаб доски берется из распределения Парето с alpha=1.16
+        (20% досок содержат 80% данных). С масштабом растут число
+        участников, листов и карточек в листе; число карточек в листе
+        распределено логнормально, комментарии и пункты чек-листов -
+        экспоненциально."""
+
+        def participants(generator, scale):
+            return round(3 * scale ** 0.7)
+
+        def lists(generator, scale):
+            return min(round(options['lists'] * scale ** 0.5),
+                       options['max_lists'])
+
+        def cards(generator, scale):
+            median = options['cards'] * scale ** 0.5
+            return min(round(generator.lognormvariate(0, 0.8) * median),
+                       options['max_cards'])
+
+        def exponential(mean):
+            return lambda generator, scale: (
+                round(generator.expovariate(1 / mean)) if mean else 0)
+
+        def progress(count):
+            elapsed = time.monotonic() - start
+            self.stdout.write(f'Создано досок: {count} за {elapsed:.0f} с')
+
+        start = time.monotonic()
+        user_ids, board_ids = synthetic.generate(
+            users=options['users'],
+            boards=options['boards'],
+            scale=lambda generator: min(generator.paretovariate(1.16), 1000),
+            participants=participants,
+            lists=lists,
+            cards=cards,
+            comments=exponential(options['comments']),
+            check_lists=exponential(options['check_lists']),
+            tags=lambda generator, scale: generator.randint(0, 3),
+            card_participants=lambda generator, scale: generator.randint(
+                0, 2),
+            seed=options['seed'],
+            boards_per_batch=options['batch'],
+            prefix=options['prefix'],
+            progress=progress,
+        )
+
+        self.stdout.write(f'Пользователей: {len(user_ids)}, досок: '
+                          f'{len(board_ids)}, время: '
+                          f'{time.monotonic() - start:.0f} с')
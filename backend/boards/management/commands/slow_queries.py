@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from taskplanner.slow_queries import aggregate, read_log
+
+ORDERINGS = ('total', 'count', 'max', 'mean')
+
+
+class Command(BaseCommand):
+    help = ('Собирает журнал медленных запросов по видам запросов и '
+            'выводит самые затратные')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10,
+                            help='сколько видов запросов выводить')
+        parser.add_argument('--order', choices=ORDERINGS, default='total',
+                            help='сортировка: суммарное время, число, '
+                                 'максимальное или среднее время')
+        parser.add_argument('--log', nargs='+',
+                            help='файлы журнала (по умолчанию - '
+                                 'SLOW_QUERY_LOG и его архивы)')
+        parser.add_argument('--json', action='store_true',
+                            help='вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        paths = options['log'] or [
+            f'{settings.SLOW_QUERY_LOG}.{number}' for number in range(
+                settings.SLOW_QUERY_LOG_BACKUP_COUNT, 0, -1)
+        ] + [settings.SLOW_QUERY_LOG]
+
+        groups = sorted(aggregate(read_log(paths)),
+                        key=lambda group: group[options['order']],
+                        reverse=True)[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(groups, indent=2,
+                                         ensure_ascii=False))
+            return
+
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
+            return
+
+        for number, group in enumerate(groups, 1):
+            routes = ', '.join(
+                f'{route} ({count})' for route, count in sorted(
+                    group['routes'].items(), key=lambda item: -item[1]))
+            self.stdout.write(
+                f'{number}. {group["fingerprint"]}: '
+                f'{group["count"]} раз, '
+                f'всего {group["total"] * 1000:.1f} мс, '
+                f'в среднем {group["mean"] * 1000:.1f} мс, '
+                f'максимум {group["max"] * 1000:.1f} мс')
+            self.stdout.write(f'   маршруты: {routes}')
+            self.stdout.write(f'   {group["sql"]}')
+
+            for line in group['plan'] or ():
+                self.stdout.write(f'   | {line}')
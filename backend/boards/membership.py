@@ -0,0 +1,146 @@
+"""Сведения о том, является ли пользователь автором, участником или
+модератором доски. Состав доски кэшируется в двух уровнях: локальном кэше
+процесса с коротким временем жизни и общем кэше (MEMBERSHIP_SHARED_CACHE).
+Оба уровня сбрасываются сигналами при изменении доски или ее участников
+(см. boards/signals.py) - сразу и еще раз после коммита.
+
+Пока транзакция, изменившая состав доски, не завершена, состав читается
+из базы и не кэшируется: при откате транзакции в кэше остался бы состав,
+которого в базе нет. Такие доски запоминаются в потоке до коммита, отката
+пакета (taskplanner/batch.py) или конца HTTP-запроса."""
+
+import threading
+
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import Http404
+
+from .models import Board
+
+_state = threading.local()
+
+
+class Membership(NamedTuple):
+    is_author: bool
+    is_participant: bool
+    is_moderator: bool
+
+
+def get_cache_key(board_id):
+    return f'board-members:{board_id}'
+
+
+def load_board_members(board_id):
+    rows = Board.objects.filter(pk=board_id).values_list(
+        'author_id',
+        'participantinboard__participant_id',
+        'participantinboard__is_moderator',
+    )
+    members = None
+
+    for author_id, participant_id, is_moderator in rows:
+        if members is None:
+            members = {'author_id': author_id, 'participants': {}}
+
+        if participant_id is not None:
+            members['participants'][participant_id] = is_moderator
+
+    return members
+
+
+def get_pending():
+    if not hasattr(_state, 'pending'):
+        _state.pending = set()
+
+    return _state.pending
+
+
+def clear_pending():
+    """Забывает изменения состава, ожидавшие коммита. Вызывается в конце
+    HTTP-запроса, когда его транзакция уже завершена."""
+    get_pending().clear()
+
+
+def discard_pending():
+    """Сбрасывает кэш досок, состав которых изменила откатываемая
+    транзакция: сбросы, отложенные до коммита, при откате не
+    выполняются."""
+    pending = get_pending()
+
+    for key in pending:
+        delete(key)
+
+    pending.clear()
+
+
+def delete(key):
+    caches[settings.MEMBERSHIP_LOCAL_CACHE].delete(key)
+    caches[settings.MEMBERSHIP_SHARED_CACHE].delete(key)
+
+
+def load_or_raise(board_id):
+    members = load_board_members(board_id)
+
+    if members is None:
+        raise Http404
+
+    return members
+
+
+def get_board_members(board_id):
+    try:
+        board_id = int(board_id)
+    except (TypeError, ValueError):
+        raise Http404
+
+    key = get_cache_key(board_id)
+
+    if key in get_pending():
+        return load_or_raise(board_id)
+
+    local_cache = caches[settings.MEMBERSHIP_LOCAL_CACHE]
+    members = local_cache.get(key)
+
+    if members is None:
+        shared_cache = caches[settings.MEMBERSHIP_SHARED_CACHE]
+        members = shared_cache.get(key)
+
+        if members is None:
+            members = load_or_raise(board_id)
+            shared_cache.set(key, members, settings.MEMBERSHIP_CACHE_TIMEOUT)
+
+        local_cache.set(key, members)
+
+    return members
+
+
+def get_membership(board_id, user_id):
+    """Возвращает Membership пользователя в доске или вызывает Http404,
+    если доски не существует."""
+    members = get_board_members(board_id)
+    participants = members['participants']
+
+    return Membership(
+        is_author=user_id is not None and members['author_id'] == user_id,
+        is_participant=user_id in participants,
+        is_moderator=participants.get(user_id, False),
+    )
+
+
+def invalidate_board_members(board_id):
+    key = get_cache_key(board_id)
+    delete(key)
+
+    if not transaction.get_connection().in_atomic_block:
+        return
+
+    get_pending().add(key)
+
+    def commit():
+        delete(key)
+        get_pending().discard(key)
+
+    transaction.on_commit(commit)
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0003_board_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='compacted_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Версия, до которой журнал изменений удален'),
+        ),
+        migrations.CreateModel(
+            name='BoardChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(verbose_name='Версия')),
+                ('entity', models.CharField(max_length=20, verbose_name='Тип объекта')),
+                ('entity_id', models.BigIntegerField(verbose_name='Id объекта')),
+                ('operation', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=6, verbose_name='Операция')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='boards.board', verbose_name='Доска')),
+            ],
+            options={
+                'verbose_name': 'Изменение доски',
+                'verbose_name_plural': 'Изменения досок',
+                'ordering': ['version', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='boardchange',
+            index=models.Index(fields=['board', 'version'], name='boardchange_board_version'),
+        ),
+    ]
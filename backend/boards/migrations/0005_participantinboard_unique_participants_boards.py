@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+def remove_duplicate_participants(apps, schema_editor):
+    """Оставляет по одной записи на пару (доска, участник); запись
+    остается модераторской, если модератором была любая из копий."""
+    ParticipantInBoard = apps.get_model('boards', 'ParticipantInBoard')
+    duplicates = ParticipantInBoard.objects.values(
+        'board', 'participant').annotate(
+        count=models.Count('id'), first_id=models.Min('id')).filter(
+        count__gt=1)
+
+    for duplicate in duplicates:
+        rows = ParticipantInBoard.objects.filter(
+            board=duplicate['board'], participant=duplicate['participant'])
+        is_moderator = rows.filter(is_moderator=True).exists()
+        rows.exclude(pk=duplicate['first_id']).delete()
+        rows.update(is_moderator=is_moderator)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0004_board_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_participants,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='participantinboard',
+            constraint=models.UniqueConstraint(fields=('board', 'participant'), name='unique_participants_boards'),
+        ),
+    ]
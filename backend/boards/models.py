@@ -1,22 +1,90 @@
-from django.db import models
+from django.db import models, transaction
 
 from users.models import CustomUser
 
 
+class BoardQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Добавляет к доскам признаки is_favored, is_author и
+        is_participant для пользователя одним SQL-запросом."""
+        user_id = getattr(user, 'id', None)
+
+        return self.annotate(
+            is_favored=models.Exists(Favorite.objects.filter(
+                board=models.OuterRef('pk'), user_id=user_id)),
+            is_author=models.ExpressionWrapper(
+                models.Q(author_id=user_id),
+                output_field=models.BooleanField()),
+            is_participant=models.Exists(ParticipantInBoard.objects.filter(
+                board=models.OuterRef('pk'), participant_id=user_id)),
+        )
+
+
 class BoardManager(models.Manager):
 
     def create_board(self, author, **kwargs):
-        current_user = author
-        board = Board.objects.create(author=current_user, **kwargs)
-        ParticipantInBoard.objects.create(board=board,
-                                          participant=current_user,
-                                          is_moderator=True)
-
-        for color in Tag.Color.values:
-            Tag.objects.create(color=color, board=board)
+        with transaction.atomic():
+            board = self.create(author=author, **kwargs)
+            self.add_defaults([board])
 
         return board
 
+    def create_boards(self, boards):
+        """Создает несохраненные доски boards (с заполненным author) вместе
+        с их участниками и тегами четырьмя запросами независимо от числа
+        досок. Сигналы post_save для досок не отправляются."""
+
+        with transaction.atomic():
+            boards = self.bulk_create(boards)
+
+            if boards and boards[0].pk is None:
+                # SQLite не возвращает id вставленных строк, но до коммита
+                # в таблицу никто другой писать не может
+                ids = self.order_by('-pk').values_list('pk', flat=True)[
+                    :len(boards)]
+
+                for board, pk in zip(boards, reversed(ids)):
+                    board.pk = pk
+
+            self.add_defaults(boards)
+
+        return boards
+
+    def remove_participant(self, board, user_id):
+        """Исключает пользователя из доски и из участников всех ее карточек.
+        Связи с карточками удаляются одним DELETE по всей доске в той же
+        транзакции, что и участие в доске."""
+        from cards.models import Card
+        from .versioning import changed_rows, record_changes
+
+        card_participants = Card.participants.through.objects.filter(
+            card__list__board=board, customuser_id=user_id)
+
+        with transaction.atomic():
+            record_changes('card', BoardChange.Operation.UPSERT, changed_rows(
+                Card.objects.filter(pk__in=card_participants.values('card')),
+                'list__board_id', 'id'))
+            card_participants.delete()
+            count, _ = ParticipantInBoard.objects.filter(
+                board=board, participant_id=user_id).delete()
+
+        return count > 0
+
+    def add_defaults(self, boards):
+        """Автор становится модератором доски, а у доски появляется по
+        тегу каждого цвета."""
+        ParticipantInBoard.objects.bulk_create([
+            ParticipantInBoard(board=board, participant_id=board.author_id,
+                               is_moderator=True)
+            for board in boards
+        ])
+        Tag.objects.bulk_create([
+            Tag(board=board, color=color)
+            for board in boards
+            for color in Tag.Color.values
+        ])
+
 
 class Board(models.Model):
     name = models.CharField(max_length=50,
@@ -43,7 +111,16 @@ class Board(models.Model):
                                           blank=True,
                                           verbose_name='Участники',
                                           )
-    objects = BoardManager()
+    version = models.PositiveBigIntegerField(default=0,
+                                             editable=False,
+                                             verbose_name='Версия',
+                                             )
+    compacted_version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия, до которой журнал изменений удален',
+    )
+    objects = BoardManager.from_queryset(BoardQuerySet)()
 
     class Meta:
         verbose_name = 'Доска'
@@ -53,6 +130,20 @@ class Board(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Версия меняется только запросом UPDATE version = version + 1,
+        поэтому при сохранении загруженной ранее доски она не
+        перезаписывается устаревшим значением."""
+
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in ('version', 'compacted_version')
+            ]
+
+        super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     class Color(models.IntegerChoices):
@@ -139,6 +230,47 @@ class ParticipantInBoard(models.Model):
     class Meta:
         verbose_name = 'Участник в доске'
         verbose_name_plural = 'Участники в досках'
+        constraints = [models.UniqueConstraint(
+            fields=['board', 'participant'],
+            name='unique_participants_boards')]
 
     def __str__(self):
         return f'Участник: {self.participant} => {self.board}'
+
+
+class BoardChange(models.Model):
+    """Запись журнала изменений доски: объект entity с id entity_id
+    создан или изменен (upsert) либо удален (delete) в версии version."""
+
+    class Operation(models.TextChoices):
+        UPSERT = 'upsert'
+        DELETE = 'delete'
+
+    board = models.ForeignKey(Board,
+                              on_delete=models.CASCADE,
+                              related_name='changes',
+                              verbose_name='Доска',
+                              )
+    version = models.PositiveBigIntegerField(verbose_name='Версия')
+    entity = models.CharField(max_length=20,
+                              verbose_name='Тип объекта',
+                              )
+    entity_id = models.BigIntegerField(verbose_name='Id объекта')
+    operation = models.CharField(max_length=6,
+                                 choices=Operation.choices,
+                                 verbose_name='Операция',
+                                 )
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Дата изменения',
+                                      )
+
+    class Meta:
+        verbose_name = 'Изменение доски'
+        verbose_name_plural = 'Изменения досок'
+        ordering = ['version', 'id']
+        indexes = [models.Index(fields=['board', 'version'],
+                                name='boardchange_board_version')]
+
+    def __str__(self):
+        return (f'{self.board_id} v{self.version}: {self.operation} '
+                f'{self.entity} {self.entity_id}')
@@ -0,0 +1,10 @@
+from taskplanner.pagination import KeysetPagination
+
+
+class BoardPaginator(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class ParticipantsInBoardPaginator(KeysetPagination):
+    ordering = ('id', )
+    page_size = 5
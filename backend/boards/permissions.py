@@ -1,6 +1,7 @@
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from rest_framework import permissions
 
+from .membership import get_membership
 from .models import Board, ParticipantInBoard, Tag
 
 
@@ -9,13 +10,13 @@ class IsAuthor(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
 
         if type(obj) is Board:
-            return obj.author == request.user
+            return obj.author_id == request.user.id
 
         if type(obj) is ParticipantInBoard:
-            return obj.board.author == request.user
+            return get_membership(obj.board_id, request.user.id).is_author
 
         if type(obj) is Tag:
-            return obj.board.author == request.user
+            return get_membership(obj.board_id, request.user.id).is_author
 
 
 class IsParticipant(permissions.BasePermission):
@@ -23,13 +24,15 @@ class IsParticipant(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
 
         if type(obj) is Board:
-            return obj.participants.filter(id=request.user.id).exists()
+            return get_membership(obj.pk, request.user.id).is_participant
 
         if type(obj) is ParticipantInBoard:
-            return obj.board.participants.filter(id=request.user.id).exists()
+            return get_membership(obj.board_id,
+                                  request.user.id).is_participant
 
         if type(obj) is Tag:
-            return obj.board.participants.filter(id=request.user.id).exists()
+            return get_membership(obj.board_id,
+                                  request.user.id).is_participant
 
 
 class IsStaff(permissions.BasePermission):
@@ -42,11 +45,12 @@ class IsAuthorOrParticipantOrAdminListParticipantsAndTags(permissions.
                                                           BasePermission):
 
     def has_permission(self, request, view):
-        board = get_object_or_404(Board, id=view.kwargs.get('board_id'))
+        membership = get_membership(view.kwargs.get('board_id'),
+                                    request.user.id)
 
         if request.user.is_authenticated:
-            return (request.user == board.author or
-                    board.participants.filter(id=request.user.id).exists() or
+            return (membership.is_author or
+                    membership.is_participant or
                     request.user.is_staff)
 
 
@@ -54,13 +58,13 @@ class IsAuthorOrModeratorOrAdminDelParticipantsPutTags(permissions.
                                                        BasePermission):
 
     def has_permission(self, request, view):
-        board = get_object_or_404(Board, id=view.kwargs.get('board_id'))
-        participant_in_board = get_object_or_404(ParticipantInBoard,
-                                                 board=board,
-                                                 participant=request.user
-                                                 )
+        membership = get_membership(view.kwargs.get('board_id'),
+                                    request.user.id)
+
+        if not membership.is_participant:
+            raise Http404
 
         if request.user.is_authenticated:
-            return (request.user == board.author or
-                    participant_in_board.is_moderator or
+            return (membership.is_author or
+                    membership.is_moderator or
                     request.user.is_staff)
@@ -0,0 +1,231 @@
+"""Полнотекстовый поиск по доскам и карточкам на основе SQLite FTS5.
+
+Индекс досок (boards_board_fts) хранит названия и описания досок, индекс
+карточек (cards_card_fts) - названия и описания карточек, названия их тегов
+и имена участников. Оба индекса поддерживаются триггерами, поэтому
+учитывают и массовые операции (bulk_create, update). При пересоздании
+таблицы миграцией SQLite удаляет ее триггеры, поэтому индексы и триггеры
+восстанавливаются после каждой миграции (post_migrate).
+
+Для остальных СУБД поиск работает через icontains."""
+
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Case, IntegerField, When
+
+CARD_DOCUMENT = """
+    SELECT c.id, c.name, c.description,
+           (SELECT group_concat(t.name, ' ')
+              FROM cards_card_tags ct
+              JOIN boards_tag t ON t.id = ct.tag_id
+             WHERE ct.card_id = c.id),
+           (SELECT group_concat(u.first_name || ' ' || u.last_name || ' ' ||
+                                u.username, ' ')
+              FROM cards_card_participants cp
+              JOIN users_customuser u ON u.id = cp.customuser_id
+             WHERE cp.card_id = c.id)
+      FROM cards_card c
+"""
+
+REFRESH_CARDS = """
+    DELETE FROM cards_card_fts WHERE rowid IN ({ids});
+    INSERT INTO cards_card_fts(rowid, name, description, tags, participants)
+    """ + CARD_DOCUMENT + """ WHERE c.id IN ({ids});
+"""
+
+BOARD_COLUMNS = "rowid, name, description"
+
+POSITION = 'search_position'
+
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS boards_board_fts USING fts5(
+        name, description,
+        content='boards_board', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS boards_board_fts_insert
+        AFTER INSERT ON boards_board BEGIN
+            INSERT INTO boards_board_fts({BOARD_COLUMNS})
+            VALUES (new.id, new.name, new.description);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS boards_board_fts_delete
+        AFTER DELETE ON boards_board BEGIN
+            INSERT INTO boards_board_fts(boards_board_fts, {BOARD_COLUMNS})
+            VALUES ('delete', old.id, old.name, old.description);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS boards_board_fts_update
+        AFTER UPDATE OF name, description ON boards_board BEGIN
+            INSERT INTO boards_board_fts(boards_board_fts, {BOARD_COLUMNS})
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO boards_board_fts({BOARD_COLUMNS})
+            VALUES (new.id, new.name, new.description);
+        END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS cards_card_fts USING fts5(
+        name, description, tags, participants,
+        tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_insert
+        AFTER INSERT ON cards_card BEGIN
+        """ + REFRESH_CARDS.format(ids='new.id') + """
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_update
+        AFTER UPDATE OF name, description ON cards_card BEGIN
+        """ + REFRESH_CARDS.format(ids='new.id') + """
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_delete
+        AFTER DELETE ON cards_card BEGIN
+            DELETE FROM cards_card_fts WHERE rowid = old.id;
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_tag_insert
+        AFTER INSERT ON cards_card_tags BEGIN
+        """ + REFRESH_CARDS.format(ids='new.card_id') + """
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_tag_delete
+        AFTER DELETE ON cards_card_tags BEGIN
+        """ + REFRESH_CARDS.format(ids='old.card_id') + """
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_participant_insert
+        AFTER INSERT ON cards_card_participants BEGIN
+        """ + REFRESH_CARDS.format(ids='new.card_id') + """
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_participant_delete
+        AFTER DELETE ON cards_card_participants BEGIN
+        """ + REFRESH_CARDS.format(ids='old.card_id') + """
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_tag_update
+        AFTER UPDATE OF name ON boards_tag BEGIN
+        """ + REFRESH_CARDS.format(
+        ids='SELECT card_id FROM cards_card_tags WHERE tag_id = new.id') + """
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_card_fts_user_update
+        AFTER UPDATE OF first_name, last_name, username ON users_customuser
+        BEGIN
+        """ + REFRESH_CARDS.format(
+        ids='SELECT card_id FROM cards_card_participants '
+            'WHERE customuser_id = new.id') + """
+        END""",
+]
+
+COUNT_TRIGGERS = """
+    SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s
+"""
+
+REBUILD = [
+    "INSERT INTO boards_board_fts(boards_board_fts) VALUES ('rebuild')",
+    "DELETE FROM cards_card_fts",
+    """INSERT INTO cards_card_fts(rowid, name, description, tags,
+                                  participants)""" + CARD_DOCUMENT,
+]
+
+SEARCH_BOARDS = """
+    SELECT f.rowid
+      FROM boards_board_fts f
+      JOIN boards_participantinboard p
+        ON p.board_id = f.rowid AND p.participant_id = %s
+     WHERE boards_board_fts MATCH %s
+     ORDER BY f.rank
+     LIMIT %s
+"""
+
+SEARCH_CARDS = """
+    SELECT f.rowid
+      FROM cards_card_fts f
+      JOIN cards_card c ON c.id = f.rowid
+      JOIN lists_list l ON l.id = c.list_id
+      JOIN boards_participantinboard p
+        ON p.board_id = l.board_id AND p.participant_id = %s
+     WHERE cards_card_fts MATCH %s
+     ORDER BY f.rank
+     LIMIT %s
+"""
+
+SEARCH_ALL_CARDS = """
+    SELECT f.rowid
+      FROM cards_card_fts f
+     WHERE cards_card_fts MATCH %s
+     ORDER BY f.rank
+     LIMIT %s
+"""
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создает индексы и триггеры, если их нет. Индекс перестраивается,
+    только если какого-то из триггеров не было, т.е. изменения могли быть
+    пропущены."""
+    with using.cursor() as cursor:
+        cursor.execute(COUNT_TRIGGERS, ['%_fts_%'])
+        (triggers_before, ) = cursor.fetchone()
+
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+        cursor.execute(COUNT_TRIGGERS, ['%_fts_%'])
+        (triggers_after, ) = cursor.fetchone()
+
+        if triggers_before != triggers_after:
+            for statement in REBUILD:
+                cursor.execute(statement)
+
+
+def install_after_migrate(sender, using, **kwargs):
+    if is_available(connections[using]):
+        install(connections[using])
+
+
+def build_query(value):
+    """Превращает пользовательский ввод в запрос FTS5: каждое слово
+    ищется как префикс, все слова должны присутствовать."""
+    words = re.findall(r'\w+', value or '')
+
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_boards(value, user, limit=None):
+    query = build_query(value)
+
+    if not query:
+        return []
+
+    limit = limit or settings.SEARCH_RESULTS_LIMIT
+    return search(SEARCH_BOARDS, [user.id, query, limit])
+
+
+def search_cards(value, user=None, limit=None):
+    """Возвращает id карточек в порядке релевантности. Если передан
+    пользователь, ищет только на досках, где он участник."""
+    query = build_query(value)
+
+    if not query:
+        return []
+
+    limit = limit or settings.SEARCH_RESULTS_LIMIT
+
+    if user is None:
+        return search(SEARCH_ALL_CARDS, [query, limit])
+
+    return search(SEARCH_CARDS, [user.id, query, limit])
+
+
+def order_by_ids(queryset, ids):
+    """Оставляет в queryset объекты из ids в порядке релевантности;
+    место в выдаче доступно как аннотация POSITION."""
+
+    if not ids:
+        return queryset.none()
+
+    ordering = Case(*[When(id=id_, then=position)
+                      for position, id_ in enumerate(ids)],
+                    output_field=IntegerField())
+
+    return queryset.filter(id__in=ids).annotate(
+        **{POSITION: ordering}).order_by(POSITION)
@@ -6,6 +6,7 @@ from .tag_serializer import TagSerializer
 from cards.models import Card
 from lists.models import List
 from lists.serializers import ListSerializer
+from taskplanner.identity_map import get_cached_object_or_404
 from users.serializers import CustomUserSerializer
 
 
@@ -35,6 +36,9 @@ class BoardSerializer(serializers.ModelSerializer):
         if request is None or request.user.is_anonymous:
             return False
 
+        if hasattr(board, 'is_favored'):
+            return board.is_favored
+
         return Favorite.objects.filter(board=board, user=user).exists()
 
 
@@ -55,6 +59,9 @@ class BoardListOrCreateSerializer(serializers.ModelSerializer):
         if request is None or request.user.is_anonymous:
             return False
 
+        if hasattr(board, 'is_favored'):
+            return board.is_favored
+
         return Favorite.objects.filter(board=board, user=user).exists()
 
     def get_is_author(self, board):
@@ -63,7 +70,10 @@ class BoardListOrCreateSerializer(serializers.ModelSerializer):
         if request is None or request.user.is_anonymous:
             return False
 
-        return bool(board.author == user)
+        if hasattr(board, 'is_author'):
+            return board.is_author
+
+        return bool(board.author_id == user.id)
 
     def get_is_participant(self, board):
         request = self.context.get('request')
@@ -72,6 +82,9 @@ class BoardListOrCreateSerializer(serializers.ModelSerializer):
         if request is None or request.user.is_anonymous:
             return False
 
+        if hasattr(board, 'is_participant'):
+            return board.is_participant
+
         return board.participants.filter(id=user.id).exists()
 
     def create(self, validated_data):
@@ -83,6 +96,13 @@ class BoardListOrCreateSerializer(serializers.ModelSerializer):
         return board
 
 
+class BoardHeaderSerializer(BoardListOrCreateSerializer):
+
+    class Meta(BoardListOrCreateSerializer.Meta):
+        fields = ('id', 'name', 'description', 'avatar', 'author',
+                  'is_favored', 'is_author', 'is_participant')
+
+
 class ParticipantInBoardSerializer(serializers.ModelSerializer):
     participant = CustomUserSerializer(read_only=True)
 
@@ -95,7 +115,8 @@ class SwitchModeratorSerializer(serializers.Serializer):
     id = serializers.IntegerField()
 
     def validate_id(self, id_):
-        board = get_object_or_404(Board, id=self.initial_data.get('board_id'))
+        board = get_cached_object_or_404(self.context.get('request'), Board,
+                                         self.initial_data.get('board_id'))
         participant_in_board = get_object_or_404(ParticipantInBoard,
                                                  board=board,
                                                  participant__id=id_,
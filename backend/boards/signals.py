@@ -0,0 +1,175 @@
+from django.core.signals import request_finished
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .membership import clear_pending, invalidate_board_members
+from .models import Board, BoardChange, Favorite, ParticipantInBoard, Tag
+from .snapshots import invalidate_snapshot
+from .versioning import changed_rows, record_change, record_changes
+from cards.models import Card, CheckList, Comment, FileInCard
+from lists.models import List
+from requests.models import Request
+from users.models import CustomUser
+from users.serializers import CustomUserSerializer
+
+ENTITIES = {
+    Tag: 'tag',
+    List: 'list',
+    Request: 'request',
+    Comment: 'comment',
+    CheckList: 'check_list',
+    FileInCard: 'file',
+}
+
+
+@receiver([post_save, post_delete], sender=Board)
+def invalidate_board(sender, instance, **kwargs):
+    invalidate_board_members(instance.pk)
+    invalidate_snapshot(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ParticipantInBoard)
+def invalidate_participant(sender, instance, **kwargs):
+    invalidate_board_members(instance.board_id)
+
+
+@receiver(m2m_changed, sender=Board.participants.through)
+def invalidate_participants(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_board_members(instance.pk)
+
+        return
+
+    if action == 'pre_clear':
+        pk_set = instance.boards_participants.values_list('id', flat=True)
+
+    if action in ('post_add', 'post_remove', 'pre_clear'):
+        for board_id in pk_set:
+            invalidate_board_members(board_id)
+
+
+@receiver(request_finished)
+def forget_pending_members(sender, **kwargs):
+    clear_pending()
+
+
+def get_operation(signal):
+    if signal is post_delete:
+        return BoardChange.Operation.DELETE
+
+    return BoardChange.Operation.UPSERT
+
+
+@receiver(post_save, sender=Board)
+def record_board(sender, instance, created, **kwargs):
+
+    if not created:
+        record_change(instance.pk, 'board', instance.pk,
+                      BoardChange.Operation.UPSERT)
+
+
+@receiver(post_save, sender=CustomUser)
+def record_author(sender, instance, created, update_fields, **kwargs):
+    """Снимок доски (boards/snapshots.py) содержит данные автора, поэтому
+    изменение профиля увеличивает версии его досок. Сохранение только
+    полей, которых нет в ответе (например, last_login), версии не
+    меняет."""
+
+    if created or (update_fields is not None and update_fields.isdisjoint(
+            CustomUserSerializer.Meta.fields)):
+        return
+
+    record_changes('board', BoardChange.Operation.UPSERT, changed_rows(
+        Board.objects.filter(author_id=instance.pk), 'id', 'id'))
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+def record_favorite(sender, instance, **kwargs):
+    record_change(instance.board_id, 'board', instance.board_id,
+                  BoardChange.Operation.UPSERT)
+
+
+@receiver([post_save, post_delete], sender=ParticipantInBoard)
+def record_participant(sender, instance, signal, **kwargs):
+    record_change(instance.board_id, 'participant', instance.participant_id,
+                  get_operation(signal))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=List)
+@receiver([post_save, post_delete], sender=Request)
+def record_board_object(sender, instance, signal, **kwargs):
+    record_change(instance.board_id, ENTITIES[sender], instance.pk,
+                  get_operation(signal))
+
+
+@receiver([post_save, post_delete], sender=Card)
+def record_card(sender, instance, signal, **kwargs):
+    record_changes('card', get_operation(signal), changed_rows(
+        List.objects.filter(pk=instance.list_id), 'board_id', instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=CheckList)
+@receiver([post_save, post_delete], sender=FileInCard)
+def record_card_object(sender, instance, signal, **kwargs):
+    record_changes(ENTITIES[sender], get_operation(signal), changed_rows(
+        Card.objects.filter(pk=instance.card_id), 'list__board_id',
+        instance.pk))
+
+
+@receiver(m2m_changed, sender=Board.participants.through)
+def record_participants(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if action == 'pre_clear':
+        if reverse:
+            pk_set = instance.boards_participants.values('id')
+        else:
+            pk_set = instance.participants.values('id')
+
+    if action == 'post_add':
+        operation = BoardChange.Operation.UPSERT
+    else:
+        operation = BoardChange.Operation.DELETE
+
+    if reverse:
+        rows = changed_rows(Board.objects.filter(pk__in=pk_set), 'id',
+                            instance.pk)
+    else:
+        rows = changed_rows(CustomUser.objects.filter(pk__in=pk_set),
+                            instance.pk, 'id')
+
+    record_changes('participant', operation, rows)
+
+
+CARD_RELATIONS = {
+    Card.tags.through: 'tags',
+    Card.participants.through: 'participants',
+}
+
+
+@receiver(m2m_changed, sender=Card.tags.through)
+@receiver(m2m_changed, sender=Card.participants.through)
+def record_card_relations(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            record_card(Card, instance, post_save)
+
+        return
+
+    if action == 'pre_clear':
+        pk_set = Card.objects.filter(
+            **{CARD_RELATIONS[sender]: instance}).values('id')
+
+    if action in ('post_add', 'post_remove', 'pre_clear'):
+        record_changes('card', BoardChange.Operation.UPSERT, changed_rows(
+            Card.objects.filter(pk__in=pk_set), 'list__board_id', 'id'))
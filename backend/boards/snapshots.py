@@ -0,0 +1,72 @@
+"""Готовый ответ доски (BoardSerializer) без полей, зависящих от
+пользователя, хранится в кэше вместе с версией доски. Любое изменение
+доски увеличивает версию (см. boards/versioning.py), и снимок этой доски
+с прежней версией перестает использоваться, не затрагивая другие доски.
+Снимок содержит данные автора доски, поэтому версии досок увеличиваются
+и при изменении профиля автора (boards/signals.py).
+При ответе из кэша поля пользователя накладываются на снимок:
+is_favored - одним запросом, is_participant карточек - по спискам их
+участников, которые уже есть в снимке.
+
+Версия доски увеличивается в транзакции изменения и при ее откате
+возвращается к прежнему значению, которое затем получит другое
+изменение. Поэтому снимок попадает в кэш только после коммита
+транзакции, в которой он построен."""
+
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Favorite
+
+
+def get_cache_key(board_id):
+    return f'board-snapshot:{board_id}'
+
+
+def get_snapshot(board_id, version, request):
+    cached = caches[settings.BOARD_SNAPSHOT_CACHE].get(
+        get_cache_key(board_id))
+
+    if cached is None or cached['version'] != version:
+        return None
+
+    if cached['host'] != request.get_host():
+        return None
+
+    return cached['data']
+
+
+def set_snapshot(board_id, version, request, data):
+    snapshot = copy.deepcopy(data)
+    snapshot['is_favored'] = None
+
+    for list_ in snapshot['lists']:
+        for card in list_['cards']:
+            card['is_participant'] = None
+
+    cached = {'version': version, 'host': request.get_host(),
+              'data': snapshot}
+    transaction.on_commit(lambda: caches[settings.BOARD_SNAPSHOT_CACHE].set(
+        get_cache_key(board_id), cached, settings.BOARD_SNAPSHOT_TIMEOUT))
+
+
+def invalidate_snapshot(board_id):
+    caches[settings.BOARD_SNAPSHOT_CACHE].delete(get_cache_key(board_id))
+
+
+def apply_user_fields(snapshot, board_id, user):
+    data = copy.copy(snapshot)
+    data['is_favored'] = Favorite.objects.filter(board_id=board_id,
+                                                 user_id=user.id).exists()
+    data['lists'] = [
+        {**list_, 'cards': [
+            {**card, 'is_participant': user.id in card['participants']}
+            for card in list_['cards']
+        ]}
+        for list_ in snapshot['lists']
+    ]
+
+    return data
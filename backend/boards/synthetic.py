@@ -0,0 +1,175 @@
+"""Генерация синтетических данных для замеров производительности:
+пользователи, доски с участниками и тегами, листы, карточки с тегами,
+участниками, комментариями и чек-листами. Размеры задаются числами или
+функциями от генератора случайных чисел и масштаба доски, которые
+вызываются для каждой доски, листа или карточки - так задаются
+распределения с длинным хвостом (см. команду seed_scale). Данные
+вставляются по нескольку досок за раз, строки создаются генераторами и
+передаются в bulk_create частями по BATCH_SIZE, поэтому в памяти
+одновременно находится только текущая часть."""
+
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Board, ParticipantInBoard, Tag
+from cards.models import Card, CheckList, Comment, RANK_STEP
+from lists.models import List
+from users.models import CustomUser
+
+BATCH_SIZE = 1000
+
+
+def get_size(value, generator, scale):
+    if callable(value):
+        return max(value(generator, scale), 0)
+
+    return value
+
+
+def bulk_create(manager, objects):
+    """bulk_create в Django 3.2 сначала превращает objs в список, поэтому
+    строки из генератора передаются ему частями по BATCH_SIZE."""
+    objects = iter(objects)
+    batch = list(islice(objects, BATCH_SIZE))
+
+    while batch:
+        manager.bulk_create(batch)
+        batch = list(islice(objects, BATCH_SIZE))
+
+
+def create_users(count, prefix='user', password=None):
+    """Создает count пользователей с именами prefix0, prefix1, ... и
+    возвращает id только что созданных пользователей."""
+    password = make_password(password)
+    last_id = CustomUser.objects.aggregate(last_id=Max('id'))['last_id']
+    bulk_create(CustomUser.objects, (
+        CustomUser(username=f'{prefix}{number}',
+                   email=f'{prefix}{number}@example.com',
+                   first_name='Имя', last_name='Фамилия',
+                   password=password)
+        for number in range(count)))
+
+    return list(CustomUser.objects.filter(
+        pk__gt=last_id or 0, username__startswith=prefix,
+    ).order_by('id').values_list('id', flat=True))
+
+
+def sample_members(generator, user_ids, author_id, count):
+    """Автор и count - 1 случайных других пользователей. Выбирается
+    count пользователей и из них исключается автор, поэтому список
+    остальных пользователей для каждой доски не строится."""
+    others = [user_id for user_id in generator.sample(user_ids, count)
+              if user_id != author_id]
+
+    return [author_id] + others[:count - 1]
+
+
+def generate(users=10, boards=5, participants=5, lists=5, cards=20,
+             comments=3, tags=2, card_participants=2, check_lists=0,
+             scale=None, seed=0, boards_per_batch=10, prefix='user',
+             progress=None):
+    """Создает users пользователей и boards досок. У каждой доски
+    participants участников (включая автора), lists листов, в каждом
+    листе cards карточек, у каждой карточки comments комментариев,
+    check_lists пунктов чек-листа, tags тегов и card_participants
+    участников. scale - функция от генератора, задающая масштаб каждой
+    доски, который передается функциям размеров. progress вызывается с
+    числом созданных досок после каждой пачки. Возвращает id
+    пользователей и досок."""
+    generator = random.Random(seed)
+    user_ids = create_users(users, prefix)
+    board_ids = []
+    sizes = {'participants': participants, 'lists': lists, 'cards': cards,
+             'comments': comments, 'tags': tags,
+             'card_participants': card_participants,
+             'check_lists': check_lists, 'scale': scale or (lambda _: 1)}
+
+    for start in range(0, boards, boards_per_batch):
+        count = min(boards_per_batch, boards - start)
+
+        with transaction.atomic():
+            board_ids.extend(create_board_batch(generator, user_ids, start,
+                                                count, sizes))
+
+        if progress is not None:
+            progress(len(board_ids))
+
+    return user_ids, board_ids
+
+
+def create_board_batch(generator, user_ids, start, count, sizes):
+
+    def size(name, board_id, limit=None):
+        value = get_size(sizes[name], generator, scales[board_id])
+        return value if limit is None else min(value, limit)
+
+    board_objects = Board.objects.create_boards([
+        Board(name=f'Доска {number}', description='Описание доски',
+              author_id=user_ids[number % len(user_ids)])
+        for number in range(start, start + count)
+    ])
+    scales = {board.pk: sizes['scale'](generator) for board in board_objects}
+    members = {}
+
+    for board in board_objects:
+        members_count = max(size('participants', board.pk, len(user_ids)),
+                            1)
+        members[board.pk] = sample_members(generator, user_ids,
+                                           board.author_id, members_count)
+
+    bulk_create(ParticipantInBoard.objects, (
+        ParticipantInBoard(board_id=board_id, participant_id=user_id)
+        for board_id, board_members in members.items()
+        for user_id in board_members[1:]))
+
+    bulk_create(List.objects, (
+        List(board_id=board_id, name=f'Лист {position}', position=position)
+        for board_id in members
+        for position in range(1, size('lists', board_id) + 1)))
+    list_boards = dict(List.objects.filter(
+        board_id__in=members).values_list('id', 'board_id'))
+
+    bulk_create(Card.objects, (
+        Card(list_id=list_id, name=f'Карточка {number}',
+             description='Описание карточки', rank=number * RANK_STEP)
+        for list_id, board_id in list_boards.items()
+        for number in range(1, size('cards', board_id) + 1)))
+    card_boards = {
+        card_id: list_boards[list_id]
+        for card_id, list_id in Card.objects.filter(
+            list__board_id__in=members).values_list('id', 'list_id')
+    }
+    board_tags = {}
+
+    for tag_id, board_id in Tag.objects.filter(
+            board_id__in=members).values_list('id', 'board_id'):
+        board_tags.setdefault(board_id, []).append(tag_id)
+
+    bulk_create(Card.tags.through.objects, (
+        Card.tags.through(card_id=card_id, tag_id=tag_id)
+        for card_id, board_id in card_boards.items()
+        for tag_id in generator.sample(
+            board_tags[board_id],
+            size('tags', board_id, len(board_tags[board_id])))))
+    bulk_create(Card.participants.through.objects, (
+        Card.participants.through(card_id=card_id, customuser_id=user_id)
+        for card_id, board_id in card_boards.items()
+        for user_id in generator.sample(
+            members[board_id],
+            size('card_participants', board_id, len(members[board_id])))))
+    bulk_create(Comment.objects, (
+        Comment(card_id=card_id, text=f'Комментарий {number}',
+                author_id=generator.choice(members[board_id]))
+        for card_id, board_id in card_boards.items()
+        for number in range(1, size('comments', board_id) + 1)))
+    bulk_create(CheckList.objects, (
+        CheckList(card_id=card_id, text=f'Пункт {number}',
+                  is_active=generator.random() < 0.7)
+        for card_id, board_id in card_boards.items()
+        for number in range(1, size('check_lists', board_id) + 1)))
+
+    return list(members)
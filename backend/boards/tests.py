@@ -0,0 +1,779 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.http import Http404
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .changes import compact_changes
+from .membership import Membership, get_membership
+from .models import Board, Favorite, ParticipantInBoard
+from .paginators import BoardPaginator
+from cards.models import (Card, CheckList, Comment, FileInCard,
+                          RANK_STEP)
+from lists.models import List
+from requests.models import Request
+from taskplanner.events import events_application
+from users.models import CustomUser
+
+
+def count_queries(context):
+    """Число запросов без BEGIN и точек сохранения, которые добавляет
+    ATOMIC_REQUESTS."""
+    return len([query for query in context.captured_queries
+                if 'SAVEPOINT' not in query['sql']
+                and query['sql'] != 'BEGIN'])
+
+
+class BoardDetailQueriesTest(TestCase):
+    """Число запросов при получении доски не должно зависеть от количества
+    списков, карточек и связанных с ними объектов."""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create(username='author',
+                                                email='author@test.ru')
+        self.member = CustomUser.objects.create(username='member',
+                                                email='member@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.member)}')
+
+    def create_board(self, lists, cards):
+        board = Board.objects.create_board(author=self.author, name='Доска')
+        board.participants.add(self.member)
+        Favorite.objects.create(user=self.member, board=board)
+        tags = list(board.tags.all())
+
+        for list_position in range(1, lists + 1):
+            list_ = List.objects.create(name='Список', board=board,
+                                        position=list_position)
+
+            for card_position in range(1, cards + 1):
+                card = Card.objects.create(name='Карточка', list=list_,
+                                           rank=card_position * RANK_STEP)
+                card.tags.add(*tags[:card_position % len(tags) + 1])
+                card.participants.add(self.author, self.member)
+                Comment.objects.create(author=self.author, card=card,
+                                       text='Комментарий')
+                CheckList.objects.create(card=card, text='Пункт')
+                FileInCard.objects.create(card=card, file='card_files/f.txt')
+
+        return board
+
+    def count_queries(self, board):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/v1/boards/{board.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        return count_queries(context), response.json()
+
+    def test_number_of_queries_is_constant(self):
+        small_count, _ = self.count_queries(self.create_board(1, 1))
+        large_count, data = self.count_queries(self.create_board(5, 10))
+
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, 13)
+        self.assertTrue(data['is_favored'])
+        self.assertEqual(len(data['lists']), 5)
+        self.assertEqual(len(data['lists'][0]['cards']), 10)
+        self.assertTrue(data['lists'][0]['cards'][0]['is_participant'])
+
+
+class BoardCreationTest(TestCase):
+    """Доски создаются вместе с автором-модератором и тегами постоянным
+    числом запросов."""
+
+    def setUp(self):
+        self.authors = [
+            CustomUser.objects.create(username=f'author{number}',
+                                      email=f'author{number}@test.ru')
+            for number in range(3)
+        ]
+
+    def create_boards(self, count):
+        boards = [Board(author=self.authors[number % len(self.authors)],
+                        name=str(number)) for number in range(count)]
+
+        with CaptureQueriesContext(connection) as context:
+            boards = Board.objects.create_boards(boards)
+
+        return count_queries(context), boards
+
+    def test_number_of_queries_is_constant(self):
+        small_count, _ = self.create_boards(2)
+        large_count, boards = self.create_boards(30)
+
+        self.assertEqual(small_count, large_count)
+
+        for board in boards:
+            self.assertEqual(Board.objects.get(pk=board.pk).name, board.name)
+            self.assertEqual(board.tags.count(), 6)
+            self.assertEqual(
+                get_membership(board.pk, board.author_id),
+                Membership(is_author=True, is_participant=True,
+                           is_moderator=True))
+
+    def test_create_board(self):
+        with CaptureQueriesContext(connection) as context:
+            board = Board.objects.create_board(author=self.authors[0],
+                                               name='Доска')
+
+        self.assertLessEqual(count_queries(context), 3)
+        self.assertEqual(board.tags.count(), 6)
+
+
+class BoardListQueriesTest(TestCase):
+    """Признаки is_favored, is_author и is_participant в списке досок
+    вычисляются аннотациями, а не отдельными запросами на каждую доску."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.other = CustomUser.objects.create(username='other',
+                                               email='other@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def create_boards(self, count):
+        for number in range(count):
+            author = self.user if number % 2 else self.other
+            board = Board.objects.create_board(author=author, name='Доска')
+
+            if author != self.user:
+                board.participants.add(self.user)
+
+            if number % 3 == 0:
+                Favorite.objects.create(user=self.user, board=board)
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+
+        self.assertEqual(response.status_code, 200)
+        return count_queries(context), response.json()['results']
+
+    def test_number_of_queries_is_constant(self):
+        self.create_boards(2)
+        small_count, _ = self.count_queries('/api/v1/boards/')
+        self.create_boards(10)
+        large_count, boards = self.count_queries('/api/v1/boards/')
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(boards), 12)
+        self.assertEqual(sum(board['is_favored'] for board in boards), 5)
+        self.assertEqual(sum(board['is_author'] for board in boards), 6)
+        self.assertTrue(all(board['is_participant'] for board in boards))
+
+    def test_filters_use_annotations(self):
+        self.create_boards(6)
+        _, favored = self.count_queries('/api/v1/boards/?is_favored=true')
+        _, not_author = self.count_queries('/api/v1/boards/?is_author=false')
+
+        self.assertEqual(len(favored), 2)
+        self.assertEqual(len(not_author), 3)
+
+
+class MembershipCacheTest(TransactionTestCase):
+    """Повторные проверки доступа к доске не обращаются к базе, а
+    изменение состава участников сбрасывает кэш. Кэш заполняется только
+    закоммиченным составом, поэтому тест работает без общей транзакции."""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+        self.author = CustomUser.objects.create(username='author',
+                                                email='author@test.ru')
+        self.member = CustomUser.objects.create(username='member',
+                                                email='member@test.ru')
+        self.board = Board.objects.create_board(author=self.author,
+                                                name='Доска')
+        self.board.participants.add(self.member)
+
+    def test_cached_membership(self):
+        get_membership(self.board.id, self.member.id)
+
+        with self.assertNumQueries(0):
+            membership = get_membership(self.board.id, self.member.id)
+
+        self.assertEqual(membership, Membership(is_author=False,
+                                                is_participant=True,
+                                                is_moderator=False))
+        self.assertTrue(get_membership(self.board.id,
+                                       self.author.id).is_moderator)
+
+    def test_invalidation(self):
+        get_membership(self.board.id, self.member.id)
+        participant_in_board = ParticipantInBoard.objects.get(
+            board=self.board, participant=self.member)
+        participant_in_board.is_moderator = True
+        participant_in_board.save()
+
+        self.assertTrue(get_membership(self.board.id,
+                                       self.member.id).is_moderator)
+
+        self.member.boards_participants.remove(self.board)
+
+        self.assertFalse(get_membership(self.board.id,
+                                        self.member.id).is_participant)
+
+        self.board.author = self.member
+        self.board.save()
+
+        self.assertTrue(get_membership(self.board.id,
+                                       self.member.id).is_author)
+
+    def test_missing_board(self):
+        with self.assertRaises(Http404):
+            get_membership(self.board.id + 1, self.member.id)
+
+    def test_changed_membership_is_cached_after_commit(self):
+        invitee = CustomUser.objects.create(username='invitee',
+                                            email='invitee@test.ru')
+
+        with transaction.atomic():
+            self.board.participants.add(invitee)
+
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    self.assertTrue(get_membership(
+                        self.board.id, invitee.id).is_participant)
+
+        get_membership(self.board.id, invitee.id)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(get_membership(self.board.id,
+                                           invitee.id).is_participant)
+
+    def test_rolled_back_membership_is_not_cached(self):
+        invitee = CustomUser.objects.create(username='invitee',
+                                            email='invitee@test.ru')
+        request_ = Request.objects.create(board=self.board, user=invitee)
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(invitee)}')
+
+        response = client.post('/api/v1/batch/', [
+            {'method': 'POST',
+             'path': f'/api/v1/my_requests/{request_.id}/accept/'},
+            {'method': 'GET', 'path': f'/api/v1/boards/{self.board.id}/'},
+            {'method': 'POST', 'path': '/api/v1/cards/0/change_list/',
+             'data': {'id': 0, 'position': 1}},
+        ], content_type='application/json')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['results'][1]['status'], 200)
+        self.assertFalse(get_membership(self.board.id,
+                                        invitee.id).is_participant)
+
+        response = client.post('/api/v1/lists/', {'name': 'Список',
+                                                  'board': self.board.id})
+        self.assertEqual(response.status_code, 403)
+
+
+class ParticipantRemovalTest(TestCase):
+    """Исключение из доски и выход из нее убирают пользователя из всех
+    карточек доски постоянным числом запросов."""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create(username='author',
+                                                email='author@test.ru')
+        self.member = CustomUser.objects.create(username='member',
+                                                email='member@test.ru')
+
+    def create_board(self, lists, cards):
+        board = Board.objects.create_board(author=self.author, name='Доска')
+        board.participants.add(self.member)
+
+        for list_position in range(1, lists + 1):
+            list_ = List.objects.create(name='Список', board=board,
+                                        position=list_position)
+
+            for card_position in range(1, cards + 1):
+                card = Card.objects.create(name='Карточка', list=list_,
+                                           rank=card_position * RANK_STEP)
+                card.participants.add(self.author, self.member)
+
+        return board
+
+    def remove(self, board):
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.author)}')
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.delete(
+                f'/api/v1/boards/{board.id}/participants/{self.member.id}/')
+
+        self.assertEqual(response.status_code, 204)
+        return count_queries(context)
+
+    def test_number_of_queries_is_constant(self):
+        small_count = self.remove(self.create_board(1, 1))
+        large_count = self.remove(self.create_board(5, 10))
+
+        self.assertEqual(small_count, large_count)
+        self.assertFalse(self.member.cards_participants.exists())
+        self.assertFalse(self.member.boards_participants.exists())
+        self.assertEqual(self.author.cards_participants.count(), 51)
+
+    def test_leave_removes_card_assignments(self):
+        board = self.create_board(2, 2)
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.member)}')
+
+        response = client.post(f'/api/v1/boards/{board.id}/leave/')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(self.member.cards_participants.exists())
+        self.assertFalse(
+            get_membership(board.id, self.member.id).is_participant)
+
+
+class SearchTest(TestCase):
+    """Поиск по индексу FTS5, который поддерживается триггерами."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru',
+                                              last_name='Иванова')
+        self.stranger = CustomUser.objects.create(username='stranger',
+                                                  email='stranger@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Ремонт квартиры')
+        list_ = List.objects.create(name='Список', board=self.board,
+                                    position=1)
+        self.card = Card.objects.create(name='Купить краску', list=list_)
+        self.other_card = Card.objects.create(name='Позвонить мастеру',
+                                              list=list_, rank=2 * RANK_STEP)
+        self.tag = self.board.tags.get(color=1)
+
+    def search(self, value):
+        response = self.client.get('/api/v1/search/', {'name': value})
+        data = response.json()
+
+        return ([board['id'] for board in data['boards']],
+                [card['id'] for card in data['cards']])
+
+    def filter_cards(self, value):
+        response = self.client.get('/api/v1/cards/', {'search': value})
+
+        return [card['id'] for card in response.json()['results']]
+
+    def test_search_by_prefix(self):
+        self.assertEqual(self.search('ремон'), ([self.board.id], []))
+        self.assertEqual(self.search('краск'), ([], [self.card.id]))
+        self.assertEqual(self.filter_cards('позвон мастер'),
+                         [self.other_card.id])
+
+    def test_index_follows_related_objects(self):
+        self.tag.name = 'Срочно'
+        self.tag.save()
+        self.card.tags.add(self.tag)
+        self.other_card.participants.add(self.user)
+
+        self.assertEqual(self.filter_cards('срочно'), [self.card.id])
+        self.assertEqual(self.filter_cards('иванова'), [self.other_card.id])
+        self.assertEqual(self.filter_cards('красный'), [self.card.id])
+
+        self.card.tags.remove(self.tag)
+        self.user.last_name = 'Петрова'
+        self.user.save()
+
+        self.assertEqual(self.filter_cards('срочно'), [])
+        self.assertEqual(self.filter_cards('петрова'), [self.other_card.id])
+
+    def test_cards_keep_relevance_order(self):
+        first = Card.objects.create(
+            name='Краска', description='Краска для стен, краска для пола',
+            list=self.card.list, rank=3 * RANK_STEP)
+
+        self.assertEqual(self.filter_cards('краск'),
+                         [first.id, self.card.id])
+
+    def test_search_only_in_own_boards(self):
+        self.client = Client(HTTP_AUTHORIZATION=(
+            f'Bearer {AccessToken.for_user(self.stranger)}'))
+
+        self.assertEqual(self.search('краск'), ([], []))
+
+
+class BoardPaginationTest(TestCase):
+    """Список досок выдается страницами по ключу (name, id)."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+        for name in ['Б', 'А', 'В', 'А', 'Г']:
+            Board.objects.create_board(author=self.user, name=name)
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_follow_key_order(self):
+        first = self.get_page('/api/v1/boards/?page_size=2')
+        Board.objects.create_board(author=self.user, name='1')
+        second = self.get_page(first['next'])
+        third = self.get_page(second['next'])
+
+        names = [board['name'] for page in (first, second, third)
+                 for board in page['results']]
+        self.assertEqual(names, ['А', 'А', 'Б', 'В', 'Г'])
+        self.assertIsNone(first['previous'])
+        self.assertIsNone(third['next'])
+
+        previous = self.get_page(third['previous'])
+        self.assertEqual(previous['results'], second['results'])
+
+    def test_page_size_is_limited(self):
+        with mock.patch.object(BoardPaginator, 'max_page_size', 3):
+            data = self.get_page('/api/v1/boards/?page_size=100000')
+
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(
+            self.client.get('/api/v1/boards/?cursor=bad').status_code, 404)
+
+
+class BoardVersionTest(TestCase):
+    """Любое изменение содержимого доски увеличивает ее версию, а
+    повторный запрос с актуальным ETag получает 304."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+        self.list = List.objects.create(name='Список', board=self.board,
+                                        position=1)
+        self.card = Card.objects.create(name='Карточка', list=self.list)
+
+    def get_version(self):
+        return Board.objects.values_list('version', flat=True).get(
+            pk=self.board.pk)
+
+    def test_mutations_bump_version(self):
+        mutations = [
+            lambda: Comment.objects.create(card=self.card, author=self.user,
+                                           text='Комментарий'),
+            lambda: CheckList.objects.create(card=self.card, text='Пункт'),
+            lambda: self.card.tags.add(self.board.tags.first()),
+            lambda: self.card.participants.add(self.user),
+            lambda: Favorite.objects.create(user=self.user,
+                                            board=self.board),
+            lambda: Card.objects.rebalance(self.list),
+            lambda: List.objects.set_positions([self.list.id]),
+            lambda: self.card.delete(),
+        ]
+
+        for mutation in mutations:
+            version = self.get_version()
+            mutation()
+            self.assertGreater(self.get_version(), version)
+
+    def test_stale_board_does_not_reset_version(self):
+        board = Board.objects.get(pk=self.board.pk)
+        Comment.objects.create(card=self.card, author=self.user, text='1')
+        version = self.get_version()
+
+        board.name = 'Новое название'
+        board.save()
+
+        self.assertEqual(self.get_version(), version + 1)
+
+    def test_not_modified(self):
+        for path in (f'/api/v1/boards/{self.board.id}/',
+                     f'/api/v1/lists/{self.list.id}/',
+                     f'/api/v1/cards/{self.card.id}/'):
+            etag = self.client.get(path)['ETag']
+
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(response.status_code, 304)
+            self.assertLessEqual(count_queries(context), 3)
+
+            self.card.participants.add(self.user)
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.card.participants.clear()
+
+    def test_not_modified_requires_access(self):
+        etag = self.client.get(f'/api/v1/boards/{self.board.id}/')['ETag']
+        self.board.participants.remove(self.user)
+
+        response = self.client.get(f'/api/v1/boards/{self.board.id}/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+
+class BoardSnapshotTest(TransactionTestCase):
+    """Повторный запрос доски собирается из снимка в кэше, а поля
+    пользователя вычисляются для каждого запроса заново. Снимок
+    сохраняется после коммита, поэтому тест работает без общей
+    транзакции."""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+        self.author = CustomUser.objects.create(username='author',
+                                                email='author@test.ru')
+        self.member = CustomUser.objects.create(username='member',
+                                                email='member@test.ru')
+        self.board = Board.objects.create_board(author=self.author,
+                                                name='Доска')
+        self.board.participants.add(self.member)
+        list_ = List.objects.create(name='Список', board=self.board,
+                                    position=1)
+        self.card = Card.objects.create(name='Карточка', list=list_)
+        self.card.participants.add(self.author)
+        Favorite.objects.create(user=self.author, board=self.board)
+
+    def get(self, user):
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(f'/api/v1/boards/{self.board.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        return count_queries(context), response.json()
+
+    def test_user_fields_are_applied_to_snapshot(self):
+        _, built = self.get(self.author)
+        count, cached = self.get(self.author)
+        _, member = self.get(self.member)
+
+        self.assertEqual(cached, built)
+        self.assertLessEqual(count, 4)
+        self.assertTrue(built['is_favored'])
+        self.assertTrue(built['lists'][0]['cards'][0]['is_participant'])
+        self.assertFalse(member['is_favored'])
+        self.assertFalse(member['lists'][0]['cards'][0]['is_participant'])
+
+    def test_changes_invalidate_snapshot(self):
+        self.get(self.author)
+        self.card.name = 'Новое название'
+        self.card.save()
+
+        _, data = self.get(self.author)
+        self.assertEqual(data['lists'][0]['cards'][0]['name'],
+                         'Новое название')
+
+    def test_author_profile_change_invalidates_snapshot(self):
+        self.get(self.member)
+        self.author.first_name = 'Иван'
+        self.author.save()
+
+        _, data = self.get(self.member)
+        self.assertEqual(data['author']['first_name'], 'Иван')
+
+        version = Board.objects.get(pk=self.board.pk).version
+        self.author.save(update_fields=['last_login'])
+        self.assertEqual(Board.objects.get(pk=self.board.pk).version,
+                         version)
+
+    def test_snapshot_requires_access(self):
+        stranger = CustomUser.objects.create(username='stranger',
+                                             email='stranger@test.ru')
+        self.get(self.author)
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(stranger)}')
+
+        response = client.get(f'/api/v1/boards/{self.board.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_rolled_back_version_is_not_cached(self):
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.author)}')
+        response = client.post('/api/v1/batch/', [
+            {'method': 'POST', 'path': '/api/v1/lists/',
+             'data': {'name': 'Призрак', 'board': self.board.id}},
+            {'method': 'GET', 'path': f'/api/v1/boards/{self.board.id}/'},
+            {'method': 'POST', 'path': '/api/v1/cards/0/change_list/',
+             'data': {'id': 0, 'position': 1}},
+        ], content_type='application/json')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['results'][1]['status'], 200)
+
+        client.post('/api/v1/lists/', {'name': 'Новый список',
+                                       'board': self.board.id})
+
+        _, data = self.get(self.author)
+        self.assertEqual([list_['name'] for list_ in data['lists']],
+                         ['Список', 'Новый список'])
+
+
+class BoardChangesTest(TestCase):
+    """Журнал изменений отдает последнюю операцию над каждым объектом
+    после версии since или признак resync."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+        self.list = List.objects.create(name='Список', board=self.board,
+                                        position=1)
+        self.card = Card.objects.create(name='Карточка', list=self.list)
+        self.since = Board.objects.get(pk=self.board.pk).version
+
+    def get_changes(self, since):
+        response = self.client.get(
+            f'/api/v1/boards/{self.board.id}/changes/?since={since}')
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def test_changes_are_collapsed(self):
+        comment = Comment.objects.create(card=self.card, author=self.user,
+                                         text='Комментарий')
+        self.card.name = 'Первое название'
+        self.card.save()
+        self.card.name = 'Второе название'
+        self.card.save()
+        comment_id = comment.id
+        comment.delete()
+
+        data = self.get_changes(self.since)
+        changes = {(change['entity'], change['id']): change
+                   for change in data['changes']}
+
+        self.assertFalse(data['resync'])
+        self.assertEqual(len(data['changes']), 2)
+        self.assertEqual(changes['card', self.card.id]['data']['name'],
+                         'Второе название')
+        self.assertEqual(changes['comment', comment_id]['operation'],
+                         'delete')
+        self.assertEqual(self.get_changes(data['version'])['changes'], [])
+
+    def test_cascade_delete_is_recorded_once(self):
+        Comment.objects.create(card=self.card, author=self.user, text='1')
+        since = Board.objects.get(pk=self.board.pk).version
+
+        response = self.client.delete(f'/api/v1/lists/{self.list.id}/')
+        self.assertEqual(response.status_code, 204)
+
+        data = self.get_changes(since)
+        self.assertEqual(
+            [(change['entity'], change['operation'])
+             for change in data['changes']],
+            [('list', 'delete')])
+
+    def test_compaction_forces_resync(self):
+        for name in ('1', '2', '3'):
+            self.card.name = name
+            self.card.save()
+
+        compact_changes(max_entries=1)
+
+        self.assertTrue(self.get_changes(self.since)['resync'])
+        version = Board.objects.get(pk=self.board.pk).version
+        self.assertFalse(self.get_changes(version)['resync'])
+
+    def test_invalid_since(self):
+        response = self.client.get(
+            f'/api/v1/boards/{self.board.id}/changes/?since=abc')
+        self.assertEqual(response.status_code, 400)
+
+
+class BoardEventsTest(TestCase):
+    """Участники доски получают события об изменениях после коммита."""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create(username='author',
+                                                email='author@test.ru')
+        self.member = CustomUser.objects.create(username='member',
+                                                email='member@test.ru')
+        self.stranger = CustomUser.objects.create(username='stranger',
+                                                  email='stranger@test.ru')
+        self.board = Board.objects.create_board(author=self.author,
+                                                name='Доска')
+        self.board.participants.add(self.member)
+        list_ = List.objects.create(name='Список', board=self.board,
+                                    position=1)
+        self.card = Card.objects.create(name='Карточка', list=list_)
+
+    def add_comment(self):
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.author)}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/v1/cards/{self.card.id}/comments/',
+                                   {'text': 'Комментарий'})
+
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    @async_to_sync
+    async def listen(self, token, action):
+        messages = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        scope = {'type': 'http', 'path': '/api/v1/events/',
+                 'query_string': f'token={token}'.encode(), 'headers': []}
+        task = asyncio.ensure_future(
+            events_application(scope, receive, messages.put))
+        received = [await asyncio.wait_for(messages.get(), 5)]
+
+        if received[0]['status'] == 200:
+            received.append(await asyncio.wait_for(messages.get(), 5))
+            result = await sync_to_async(action)()
+
+            try:
+                received.append(await asyncio.wait_for(messages.get(), 0.5))
+            except asyncio.TimeoutError:
+                pass
+        else:
+            result = None
+
+        disconnected.set()
+        await task
+
+        return received, result
+
+    def parse(self, message):
+        event, data = message['body'].decode().strip().split('\n')
+        return event[len('event: '):], json.loads(data[len('data: '):])
+
+    def test_member_receives_event(self):
+        received, comment_id = self.listen(AccessToken.for_user(self.member),
+                                           self.add_comment)
+
+        self.assertEqual(len(received), 3)
+        self.assertEqual(self.parse(received[1]),
+                         ('ready', {'boards': [self.board.id]}))
+        self.assertEqual(self.parse(received[2]), ('comment.created', {
+            'type': 'comment.created', 'board': self.board.id,
+            'card': self.card.id, 'id': comment_id}))
+
+    def test_stranger_receives_nothing(self):
+        received, _ = self.listen(AccessToken.for_user(self.stranger),
+                                  self.add_comment)
+
+        self.assertEqual(len(received), 2)
+        self.assertEqual(self.parse(received[1]), ('ready', {'boards': []}))
+
+    def test_token_is_required(self):
+        received, _ = self.listen('invalid', self.add_comment)
+
+        self.assertEqual(received[0]['status'], 401)
@@ -0,0 +1,172 @@
+"""Версия доски - счетчик, который увеличивается при любом изменении
+доски, ее листов, карточек, тегов, комментариев, чек-листов, файлов,
+участников, запросов на вступление и избранного (см. boards/signals.py).
+Вместе с версией в журнал BoardChange записывается, какой объект изменен,
+в той же транзакции, что и само изменение (ATOMIC_REQUESTS).
+
+По версии строится ETag ответов доски, листа и карточки: если клиент
+прислал актуальный ETag в If-None-Match, ответ 304 отдается без загрузки
+объекта и сериализаторов."""
+
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connection
+from django.db.models import BigIntegerField, F, Value
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .membership import get_membership
+from .models import Board, BoardChange
+
+INSERT_CHANGES = """
+    INSERT INTO {changes} (board_id, version, entity, entity_id, operation,
+                           created_at)
+    SELECT b.id, b.version, %s, r.change_entity, %s, %s
+      FROM ({rows}) r
+      JOIN {boards} b ON b.id = r.change_board
+"""
+
+_state = threading.local()
+
+
+def is_suppressed():
+    return getattr(_state, 'suppressed', 0) > 0
+
+
+def bump_board_versions(board_ids):
+    """board_ids - список id досок или подзапрос вида .values('board_id')."""
+
+    if is_suppressed():
+        return
+
+    Board.objects.filter(pk__in=board_ids).update(version=F('version') + 1)
+
+
+def bump_board_version(board_id):
+    bump_board_versions([board_id])
+
+
+def changed_rows(queryset, board, entity):
+    """Строки (доска, объект) для record_changes. board и entity - имена
+    полей queryset или значения."""
+
+    def to_expression(value):
+        if isinstance(value, str):
+            return F(value)
+
+        return Value(value, output_field=BigIntegerField())
+
+    return queryset.values(change_board=to_expression(board),
+                           change_entity=to_expression(entity))
+
+
+def record_changes(entity, operation, rows):
+    """Увеличивает версии досок из rows (см. changed_rows) и добавляет в
+    журнал по записи на каждую строку. Выполняется двумя запросами без
+    чтения строк в Python."""
+
+    if is_suppressed():
+        return
+
+    try:
+        sql, params = rows.query.sql_with_params()
+    except EmptyResultSet:
+        return
+
+    Board.objects.filter(pk__in=rows.values('change_board')).update(
+        version=F('version') + 1)
+
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT_CHANGES.format(
+            changes=BoardChange._meta.db_table,
+            boards=Board._meta.db_table,
+            rows=sql,
+        ), [entity, operation, created_at, *params])
+
+
+def record_change(board_id, entity, entity_id, operation):
+    record_changes(entity, operation, changed_rows(
+        Board.objects.filter(pk=board_id), board_id, entity_id))
+
+
+@contextmanager
+def bump_once(board_id=None, entity=None, entity_id=None):
+    """Внутри блока сигналы не меняют версии и не пишут журнал, а после
+    него для доски board_id записывается одно удаление объекта entity.
+    Нужен при каскадном удалении, чтобы не обновлять доску отдельно для
+    каждого комментария и файла: удаление листа или карточки означает и
+    удаление вложенных объектов."""
+    _state.suppressed = getattr(_state, 'suppressed', 0) + 1
+
+    try:
+        yield
+    finally:
+        _state.suppressed -= 1
+
+    if board_id is not None:
+        record_change(board_id, entity, entity_id,
+                      BoardChange.Operation.DELETE)
+
+
+class ConditionalRetrieveMixin:
+    """Добавляет ETag к ответу retrieve и отвечает 304 на If-None-Match.
+    board_lookup - путь от модели представления к доске."""
+    board_lookup = None
+
+    def get_board_version(self, pk):
+        prefix = f'{self.board_lookup}__' if self.board_lookup else ''
+        model = self.get_queryset().model
+
+        try:
+            return model._default_manager.filter(pk=pk).values_list(
+                f'{prefix}id', f'{prefix}version').first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def get_etag(self, board_id, version):
+        request = self.request
+        value = (f'{board_id}:{version}:{request.user.id}:'
+                 f'{request.get_full_path()}')
+
+        return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+    def has_board_access(self, board_id):
+        user = self.request.user
+
+        if user.is_superuser or user.is_staff:
+            return True
+
+        membership = get_membership(board_id, user.id)
+        return membership.is_author or membership.is_participant
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = self.get_board_version(kwargs[lookup_url_kwarg])
+
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = self.get_etag(*row)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH',
+                                                     ''))
+
+        if etag in if_none_match and self.has_board_access(row[0]):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+
+        response = self.retrieve_version(request, *row, *args, **kwargs)
+        response['ETag'] = etag
+
+        return response
+
+    def retrieve_version(self, request, board_id, version, *args, **kwargs):
+        """Ответ для известной версии доски; переопределяется, чтобы
+        брать его из кэша."""
+        return super().retrieve(request, *args, **kwargs)
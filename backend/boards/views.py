@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status, mixins
@@ -7,8 +9,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from . import search, snapshots
+from .changes import get_changes
 from .filters import BoardFilter
+from .loaders import load_board_detail
 from .models import (Board, Favorite, ParticipantInBoard)
+from .paginators import BoardPaginator, ParticipantsInBoardPaginator
 from .permissions import (IsAuthor, IsParticipant, IsStaff,
                           IsAuthorOrParticipantOrAdminListParticipantsAndTags,
                           IsAuthorOrModeratorOrAdminDelParticipantsPutTags)
@@ -17,20 +23,33 @@ from .serializers import (BoardListOrCreateSerializer, BoardSerializer,
                           SwitchModeratorSerializer,
                           SearchBoardSerializer, SearchCardSerializer)
 from .tag_serializer import TagSerializer
+from .versioning import ConditionalRetrieveMixin, bump_once
 from cards.models import Card
+from taskplanner.events import emit
+from taskplanner.identity_map import get_cached_object_or_404
 
 
-class BoardViewSet(viewsets.ModelViewSet):
+class BoardViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, ]
     filter_class = BoardFilter
+    pagination_class = BoardPaginator
 
     def get_queryset(self):
         user = self.request.user
 
-        if user.is_superuser or user.is_staff:
-            return Board.objects.all()
+        queryset = Board.objects.with_user_flags(user)
 
-        return Board.objects.filter(participants__id=self.request.user.id)
+        if not (user.is_superuser or user.is_staff):
+            # доски пользователя находятся по индексу участника, а не
+            # проверкой is_participant для каждой доски
+            queryset = queryset.filter(
+                pk__in=ParticipantInBoard.objects.filter(
+                    participant_id=user.id).values('board'))
+
+        if self.action == 'retrieve':
+            return load_board_detail(queryset, user)
+
+        return queryset
 
     def get_serializer_class(self):
 
@@ -40,12 +59,39 @@ class BoardViewSet(viewsets.ModelViewSet):
         if self.action in ('retrieve', 'update', 'partial_update', 'destroy'):
             return BoardSerializer
 
+    def retrieve_version(self, request, board_id, version, *args, **kwargs):
+        snapshot = snapshots.get_snapshot(board_id, version, request)
+
+        if snapshot is None:
+            response = super().retrieve_version(request, board_id, version,
+                                                *args, **kwargs)
+            snapshots.set_snapshot(board_id, version, request, response.data)
+
+            return response
+
+        if not self.has_board_access(board_id):
+            raise Http404
+
+        return Response(snapshots.apply_user_fields(snapshot, board_id,
+                                                    request.user))
+
+    def perform_update(self, serializer):
+        board = serializer.save()
+        # ответ содержит списки и карточки, а DRF после сохранения
+        # сбрасывает подгруженные связи, поэтому доска загружается заново
+        serializer.instance = load_board_detail(
+            self.get_queryset(), self.request.user).get(pk=board.pk)
+
+    def perform_destroy(self, instance):
+        with bump_once():
+            instance.delete()
+
     def get_permissions(self):
 
         if self.action in ('list', 'create'):
             return [IsAuthenticated()]
 
-        if self.action in ('retrieve', 'favorite', 'leave'):
+        if self.action in ('retrieve', 'favorite', 'leave', 'changes'):
             return [(IsAuthor | IsParticipant | IsStaff)()]
 
         if self.action in ('update', 'partial_update', 'destroy',
@@ -55,7 +101,7 @@ class BoardViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post', 'delete'])
     def favorite(self, request, **kwargs):
         user = request.user
-        board = get_object_or_404(Board, id=kwargs.get('pk'))
+        board = get_cached_object_or_404(self.request, Board, kwargs.get('pk'))
         self.check_object_permissions(self.request, board)
 
         if request.method == 'POST':
@@ -83,18 +129,19 @@ class BoardViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def switch_moderator(self, request, **kwargs):
-        board = get_object_or_404(Board, id=kwargs.get('pk'))
+        board = get_cached_object_or_404(self.request, Board, kwargs.get('pk'))
         self.check_object_permissions(self.request, board)
 
         data = request.data
         data['board_id'] = kwargs.get('pk')
-        serializer = SwitchModeratorSerializer(data=data)
+        serializer = SwitchModeratorSerializer(
+            data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
 
         user_id = request.data['id']
         participant_in_board = get_object_or_404(ParticipantInBoard,
                                                  board=board,
-                                                 participant__=user_id,
+                                                 participant__id=user_id,
                                                  )
 
         if participant_in_board.is_moderator:
@@ -115,7 +162,7 @@ class BoardViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def leave(self, request, **kwargs):
-        board = get_object_or_404(Board, id=kwargs.get('pk'))
+        board = get_cached_object_or_404(self.request, Board, kwargs.get('pk'))
         self.check_object_permissions(self.request, board)
 
         if request.user == board.author:
@@ -124,9 +171,30 @@ class BoardViewSet(viewsets.ModelViewSet):
                 'message': 'Автор доски не может покинуть доску!'},
                 status=status.HTTP_400_BAD_REQUEST)
 
-        board.participants.remove(request.user)
+        Board.objects.remove_participant(board, request.user.id)
+        emit(board.id, 'participant.deleted', user=request.user.id)
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=['get'])
+    def changes(self, request, **kwargs):
+        board = get_cached_object_or_404(self.request, Board, kwargs.get('pk'))
+        self.check_object_permissions(self.request, board)
+
+        try:
+            since = int(request.query_params.get('since', ''))
+        except ValueError:
+            since = -1
+
+        if since < 0:
+            return Response({
+                'status': 'error',
+                'message': 'Параметр since должен быть неотрицательным '
+                           'целым числом!'},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_changes(board, since, request))
+
 
 class ParticipantInBoardViewSet(viewsets.GenericViewSet,
                                 mixins.ListModelMixin,
@@ -134,12 +202,15 @@ class ParticipantInBoardViewSet(viewsets.GenericViewSet,
                                 mixins.DestroyModelMixin):
     serializer_class = ParticipantInBoardSerializer
     filter_backends = [DjangoFilterBackend]
+    pagination_class = ParticipantsInBoardPaginator
     filterset_fields = ['is_moderator']
 
     def get_queryset(self):
-        board = get_object_or_404(Board, id=self.kwargs.get('board_id'))
+        board = get_cached_object_or_404(self.request, Board,
+                                         self.kwargs.get('board_id'))
 
-        return ParticipantInBoard.objects.filter(board=board)
+        return ParticipantInBoard.objects.filter(
+            board=board).select_related('participant')
 
     def get_permissions(self):
 
@@ -153,7 +224,8 @@ class ParticipantInBoardViewSet(viewsets.GenericViewSet,
             return [IsAuthorOrModeratorOrAdminDelParticipantsPutTags()]
 
     def destroy(self, request, *args, **kwargs):
-        board = get_object_or_404(Board, id=kwargs.get('board_id'))
+        board = get_cached_object_or_404(self.request, Board,
+                                         kwargs.get('board_id'))
         user_id = kwargs.get('pk')
         participant_in_board = get_object_or_404(ParticipantInBoard,
                                                  board=board,
@@ -172,11 +244,8 @@ class ParticipantInBoardViewSet(viewsets.GenericViewSet,
                 'message': 'Исключить модератора может только автор доски!'},
                 status=status.HTTP_400_BAD_REQUEST)
 
-        board.participants.remove(user_id)
-
-        for list_ in board.lists.all():
-            for card in list_.cards.all():
-                card.participants.remove(user_id)
+        Board.objects.remove_participant(board, user_id)
+        emit(board.id, 'participant.deleted', user=int(user_id))
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -188,7 +257,8 @@ class TagInBoardViewSet(viewsets.GenericViewSet,
     serializer_class = TagSerializer
 
     def get_queryset(self):
-        board = get_object_or_404(Board, id=self.kwargs.get('board_id'))
+        board = get_cached_object_or_404(self.request, Board,
+                                         self.kwargs.get('board_id'))
 
         return board.tags.all()
 
@@ -208,13 +278,26 @@ class SearchAPIView(APIView):
 
     def get(self, request):
         name = request.GET.get('name', None)
-        boards = Board.objects.filter(participants__id=self.request.user.id)
-        cards = Card.objects.filter(
-            list__board__participants__id=self.request.user.id)
 
         if name:
-            boards = boards.filter(name__icontains=name)
-            cards = cards.filter(name__icontains=name)
+            if search.is_available():
+                boards = search.order_by_ids(
+                    Board.objects.all(),
+                    search.search_boards(name, request.user))
+                cards = search.order_by_ids(
+                    Card.objects.all(),
+                    search.search_cards(name, request.user))
+            else:
+                limit = settings.SEARCH_RESULTS_LIMIT
+                boards = Board.objects.filter(
+                    participants__id=self.request.user.id,
+                    name__icontains=name)[:limit]
+                cards = Card.objects.filter(
+                    list__board__participants__id=self.request.user.id,
+                    name__icontains=name)[:limit]
+
+            cards = cards.select_related('list__board').prefetch_related(
+                'participants', 'files', 'comments', 'check_lists')
 
             return JsonResponse({
                 'boards': SearchBoardSerializer(instance=boards,
@@ -3,6 +3,7 @@ from django.db.models import Q
 
 from .models import Card
 from boards.models import Tag
+from boards.search import is_available, order_by_ids, search_cards
 
 
 class CardFilter(filters.FilterSet):
@@ -25,6 +26,26 @@ class CardFilter(filters.FilterSet):
     }
 
     def get_search(self, queryset, name, value):
+
+        if not is_available():
+            return self.get_search_by_lookups(queryset, value)
+
+        user = self.request.user
+
+        if user.is_superuser or user.is_staff:
+            card_ids = search_cards(value)
+        else:
+            card_ids = search_cards(value, user)
+
+        if value in CardFilter.dict_of_colors:
+            color = CardFilter.dict_of_colors[value]
+
+            return queryset.filter(
+                Q(tags__color=color) | Q(id__in=card_ids)).distinct()
+
+        return order_by_ids(queryset, card_ids)
+
+    def get_search_by_lookups(self, queryset, value):
         query = Q()
 
         for field in [
@@ -38,9 +59,9 @@ class CardFilter(filters.FilterSet):
             query |= Q(**lookup)
 
         if value in CardFilter.dict_of_colors:
-            tag_id = CardFilter.dict_of_colors[value]
+            color = CardFilter.dict_of_colors[value]
 
-            return queryset.filter(Q(tags__id=tag_id) | Q(query)).distinct()
+            return queryset.filter(Q(tags__color=color) | Q(query)).distinct()
 
         return queryset.filter(query).distinct()
 
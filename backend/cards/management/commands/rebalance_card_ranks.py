@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from cards.models import Card
+from lists.models import List
+
+
+class Command(BaseCommand):
+    help = ('Равномерно перераспределяет ключи сортировки карточек '
+            'в листах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('lists', nargs='*', type=int,
+                            help='id листов (по умолчанию - все листы)')
+
+    def handle(self, *args, **options):
+        lists = List.objects.filter(cards__isnull=False).distinct()
+
+        if options['lists']:
+            lists = lists.filter(id__in=options['lists'])
+
+        count = 0
+
+        for list_ in lists.iterator():
+            Card.objects.rebalance(list_)
+            count += 1
+
+        self.stdout.write(f'Перераспределено листов: {count}')
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='is_updated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+RANK_STEP = 2 ** 32
+
+
+def positions_to_ranks(apps, schema_editor):
+    Card = apps.get_model('cards', 'Card')
+    Card.objects.update(rank=models.F('position') * RANK_STEP)
+
+
+def ranks_to_positions(apps, schema_editor):
+    Card = apps.get_model('cards', 'Card')
+    cards = list(Card.objects.order_by('list', 'rank', 'id'))
+    position, list_id = 0, None
+
+    for card in cards:
+        position = position + 1 if card.list_id == list_id else 1
+        card.position, list_id = position, card.list_id
+
+    Card.objects.bulk_update(cards, ['position'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_comment_is_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='rank',
+            field=models.BigIntegerField(default=4294967296, verbose_name='Ключ сортировки на листе'),
+        ),
+        migrations.RunPython(positions_to_ranks, ranks_to_positions),
+        migrations.AlterModelOptions(
+            name='card',
+            options={'ordering': ['rank'], 'verbose_name': 'Карточка', 'verbose_name_plural': 'Карточки'},
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='position',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_card_rank'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['list', 'rank'], name='card_list_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['card', 'pub_date'], name='comment_card_pub_date'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_card_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='card',
+            options={'ordering': ['rank', 'id'], 'verbose_name': 'Карточка', 'verbose_name_plural': 'Карточки'},
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='rank',
+            field=models.BigIntegerField(verbose_name='Ключ сортировки на листе'),
+        ),
+    ]
@@ -1,10 +1,162 @@
-from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, RowNumber
 
-from boards.models import Tag
+from boards.models import BoardChange, Tag
+from boards.versioning import bump_board_version, changed_rows, record_changes
 from lists.models import List
 from users.models import CustomUser
 
+RANK_STEP = 2 ** 32
+
+
+class CardQuerySet(models.QuerySet):
+
+    def with_position(self):
+        """Добавляет аннотацию position - номер карточки в листе,
+        начиная с 1, вычисленный по ключу сортировки (rank, id). Номер
+        каждой карточки считается отдельным подзапросом, поэтому для
+        загрузки листов целиком нужен with_list_position."""
+        rank = models.OuterRef('rank')
+        preceding = Card.objects.filter(
+            models.Q(rank__lt=rank) | models.Q(rank=rank,
+                                               pk__lt=models.OuterRef('pk')),
+            list=models.OuterRef('list'),
+        ).order_by().values('list').annotate(
+            count=models.Count('pk')).values('count')
+
+        return self.annotate(position=Coalesce(
+            models.Subquery(preceding,
+                            output_field=models.IntegerField()), 0) + 1)
+
+    def with_list_position(self):
+        """То же, что with_position, но оконной функцией за один проход по
+        индексу (list, rank). Номера считаются по строкам выборки, поэтому
+        в нее должны входить все карточки листов, как при подгрузке
+        карточек листов через prefetch_related."""
+        return self.annotate(position=models.Window(
+            RowNumber(), partition_by=[models.F('list')],
+            order_by=[models.F('rank').asc(), models.F('id').asc()]))
+
+    def with_user_flags(self, user):
+        """Добавляет признак is_participant для пользователя."""
+        return self.annotate(is_participant=models.Exists(
+            Card.participants.through.objects.filter(
+                card=models.OuterRef('pk'),
+                customuser_id=getattr(user, 'id', None))))
+
+    def with_related(self):
+        """Подгружает теги и id участников, файлов, комментариев и пунктов
+        чек-листа для сериализаторов карточек."""
+        return self.prefetch_related(
+            'tags',
+            models.Prefetch('participants',
+                            queryset=CustomUser.objects.only('id')),
+            models.Prefetch('files',
+                            queryset=FileInCard.objects.only('id', 'card')),
+            models.Prefetch('comments',
+                            queryset=Comment.objects.only('id', 'card')),
+            models.Prefetch('check_lists',
+                            queryset=CheckList.objects.only('id', 'card')),
+        )
+
+
+class CardManager(models.Manager):
+    """Порядок карточек в листе задается разреженным ключом rank:
+    перемещение или удаление карточки меняет только ее собственную строку,
+    а соседние ключи пересчитываются лишь когда между ними не осталось
+    свободного места."""
+
+    def lock_list(self, list_):
+        """Блокирует строку листа до конца транзакции пустым UPDATE, чтобы
+        одновременные вставки в лист не получили одинаковый rank."""
+        List.objects.filter(pk=list_.pk).update(position=models.F('position'))
+
+    def next_rank(self, list_):
+        last_rank = list_.cards.aggregate(
+            last_rank=models.Max('rank'))['last_rank']
+
+        return (last_rank or 0) + RANK_STEP
+
+    def rank_for_position(self, list_, position, exclude=None):
+        """Ключ rank для вставки карточки на место position. Соседние
+        ключи читаются из базы, поэтому лист должен быть заблокирован
+        lock_list в той же транзакции."""
+        cards = list_.cards.order_by('rank')
+
+        if exclude is not None:
+            cards = cards.exclude(pk=exclude.pk)
+
+        start = max(position - 2, 0)
+        neighbours = list(cards.values_list('rank', flat=True)[
+            start:position])
+
+        if position == 1:
+            before = 0
+            after = neighbours[0] if neighbours else None
+        else:
+            before = neighbours[0] if neighbours else None
+            after = neighbours[1] if len(neighbours) > 1 else None
+
+        if before is None:
+            return self.next_rank(list_)
+
+        if after is None:
+            return before + RANK_STEP
+
+        if after - before < 2:
+            self.rebalance(list_)
+            return self.rank_for_position(list_, position, exclude)
+
+        return (before + after) // 2
+
+    def bulk_create_in_list(self, list_, cards):
+        """Добавляет в конец листа карточки из словарей с ключами name,
+        description, tags и participants. Карточки и их связи с тегами и
+        участниками вставляются несколькими запросами независимо от числа
+        карточек. Возвращает id карточек в порядке cards."""
+
+        with transaction.atomic():
+            self.lock_list(list_)
+            last_rank = self.next_rank(list_) - RANK_STEP
+            self.bulk_create([
+                Card(list=list_, name=data['name'],
+                     description=data.get('description', ''),
+                     rank=last_rank + number * RANK_STEP)
+                for number, data in enumerate(cards, start=1)
+            ])
+            # pk после bulk_create известны не для всех баз, а новые
+            # карточки - единственные в листе с rank больше last_rank
+            card_ids = list(list_.cards.filter(rank__gt=last_rank).order_by(
+                'rank').values_list('id', flat=True))
+
+            Card.tags.through.objects.bulk_create([
+                Card.tags.through(card_id=card_id, tag_id=tag_id)
+                for card_id, data in zip(card_ids, cards)
+                for tag_id in dict.fromkeys(data.get('tags', ()))
+            ])
+            Card.participants.through.objects.bulk_create([
+                Card.participants.through(card_id=card_id,
+                                          customuser_id=user_id)
+                for card_id, data in zip(card_ids, cards)
+                for user_id in dict.fromkeys(data.get('participants', ()))
+            ])
+            record_changes('card', BoardChange.Operation.UPSERT, changed_rows(
+                self.filter(pk__in=card_ids), 'list__board_id', 'id'))
+
+        return card_ids
+
+    def rebalance(self, list_):
+        """Равномерно перераспределяет ключи карточек листа одним
+        UPDATE-запросом."""
+        cards = list(list_.cards.order_by('rank', 'id').only('id', 'rank'))
+
+        for number, card in enumerate(cards, start=1):
+            card.rank = number * RANK_STEP
+
+        with transaction.atomic():
+            self.bulk_update(cards, ['rank'])
+            bump_board_version(list_.board_id)
+
 
 class Card(models.Model):
     name = models.CharField(max_length=50,
@@ -30,16 +182,23 @@ class Card(models.Model):
                                   blank=True,
                                   verbose_name='Тег',
                                   )
-    position = models.PositiveSmallIntegerField(
-        verbose_name='Номер позиции на листе',
-        blank=True,
-        validators=[MinValueValidator(1), ]
-    )
+    rank = models.BigIntegerField(verbose_name='Ключ сортировки на листе')
+    objects = CardManager.from_queryset(CardQuerySet)()
 
     class Meta:
         verbose_name = 'Карточка'
         verbose_name_plural = 'Карточки'
-        ordering = ['position']
+        ordering = ['rank', 'id']
+        indexes = [models.Index(fields=['list', 'rank'],
+                                name='card_list_rank')]
+
+    def save(self, *args, **kwargs):
+
+        # карточка без ключа сортировки добавляется в конец листа
+        if self.rank is None:
+            self.rank = Card.objects.next_rank(self.list)
+
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -86,6 +245,8 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [models.Index(fields=['card', 'pub_date'],
+                                name='comment_card_pub_date')]
 
     def __str__(self):
         return self.text[:30]
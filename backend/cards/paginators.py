@@ -0,0 +1,26 @@
+from boards.search import POSITION
+from taskplanner.pagination import KeysetPagination
+
+
+class CardPaginator(KeysetPagination):
+    ordering = ('list', 'rank', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+
+        # результаты полнотекстового поиска упорядочены по релевантности
+        # и ограничены SEARCH_RESULTS_LIMIT, поэтому отдаются одной
+        # страницей без сортировки по ключу
+        if POSITION in queryset.query.annotations:
+            self.url = request.build_absolute_uri()
+            self.is_reversed = False
+            self.has_more = False
+            self.key = None
+            self.page = list(queryset)
+
+            return self.page
+
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CommentPaginator(KeysetPagination):
+    ordering = ('pub_date', 'id')
@@ -1,58 +1,49 @@
-from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 
 from .models import Card, FileInCard, Comment, CheckList
+from boards.membership import get_membership
 from boards.models import Tag
 from lists.models import List
+from taskplanner.identity_map import get_cached_object_or_404
 from users.models import CustomUser
 
 
-class IsAuthor(permissions.BasePermission):
-
-    def has_object_permission(self, request, view, obj):
+def get_board_id(request, view, obj):
 
-        if type(obj) is Card:
-            return obj.list.board.author == request.user
+    if type(obj) is Card:
+        return obj.list.board_id
 
-        if type(obj) is Tag:
-            return obj.board.author == request.user
+    if type(obj) is Tag:
+        return obj.board_id
 
-        if type(obj) is CustomUser or type(obj) is FileInCard:
-            card = get_object_or_404(Card, id=view.kwargs.get('card_id'))
-            board = card.list.board
-            return board.author == request.user
+    if type(obj) is CustomUser or type(obj) is FileInCard:
+        card = get_cached_object_or_404(request, Card,
+                                        view.kwargs.get('card_id'))
+        return card.list.board_id
 
-        elif type(obj) is Comment:
-            return obj.card.list.board.author == request.user
+    elif type(obj) is Comment:
+        return obj.card.list.board_id
 
-        elif type(obj) is CheckList:
-            return obj.card.list.board.author == request.user
+    elif type(obj) is CheckList:
+        return obj.card.list.board_id
 
 
-class IsParticipant(permissions.BasePermission):
+class IsAuthor(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
+        board_id = get_board_id(request, view, obj)
 
-        if type(obj) is Card:
-            return obj.list.board.participants.filter(
-                id=request.user.id).exists()
+        if board_id is not None:
+            return get_membership(board_id, request.user.id).is_author
 
-        if type(obj) is Tag:
-            return obj.board.participants.filter(
-                id=request.user.id).exists()
 
-        if type(obj) is CustomUser or type(obj) is FileInCard:
-            card = get_object_or_404(Card, id=view.kwargs.get('card_id'))
-            board = card.list.board
-            return board.participants.filter(id=request.user.id).exists()
+class IsParticipant(permissions.BasePermission):
 
-        elif type(obj) is Comment:
-            return obj.card.list.board.participants.filter(
-                id=request.user.id).exists()
+    def has_object_permission(self, request, view, obj):
+        board_id = get_board_id(request, view, obj)
 
-        elif type(obj) is CheckList:
-            return obj.card.list.board.participants.filter(
-                id=request.user.id).exists()
+        if board_id is not None:
+            return get_membership(board_id, request.user.id).is_participant
 
 
 class IsStaff(permissions.BasePermission):
@@ -64,12 +55,12 @@ class IsStaff(permissions.BasePermission):
 class IsAuthorOrParticipantOrAdminForCreateCard(permissions.BasePermission):
 
     def has_permission(self, request, view):
-        list_ = get_object_or_404(List, id=request.data['list'])
-        board = list_.board
+        list_ = get_cached_object_or_404(request, List, request.data['list'])
+        membership = get_membership(list_.board_id, request.user.id)
 
         if request.user.is_authenticated:
-            return (request.user == board.author or
-                    board.participants.filter(id=request.user.id).exists() or
+            return (membership.is_author or
+                    membership.is_participant or
                     request.user.is_staff)
 
 
@@ -84,12 +75,13 @@ class IsAuthorOrParticipantOrAdminOfBoardForActionWithCard(permissions.
     - чек-листов."""
 
     def has_permission(self, request, view):
-        card = get_object_or_404(Card, id=view.kwargs.get('card_id'))
-        board = card.list.board
+        card = get_cached_object_or_404(request, Card,
+                                        view.kwargs.get('card_id'))
+        membership = get_membership(card.list.board_id, request.user.id)
 
         if request.user.is_authenticated:
-            return (request.user == board.author or
-                    board.participants.filter(id=request.user.id).exists() or
+            return (membership.is_author or
+                    membership.is_participant or
                     request.user.is_staff)
 
 
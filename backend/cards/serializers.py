@@ -1,12 +1,30 @@
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
 from rest_framework import serializers
 
 from .models import Card, FileInCard, Comment, CheckList
+from .paginators import CommentPaginator
+from boards.membership import get_membership
 from boards.tag_serializer import TagSerializer
 from lists.models import List
+from taskplanner.identity_map import get_cached_object_or_404
+from taskplanner.pagination import KeysetPagination
 from users.serializers import CustomUserSerializer
 
 
+def get_card_position(card):
+    """Номер карточки в листе: берется из аннотации
+    CardQuerySet.with_position, а при ее отсутствии считается запросом."""
+
+    if hasattr(card, 'position'):
+        return card.position
+
+    return Card.objects.filter(
+        Q(rank__lt=card.rank) | Q(rank=card.rank, pk__lt=card.pk),
+        list_id=card.list_id).count() + 1
+
+
 class CheckListSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -41,7 +59,8 @@ class FileInCardSerializer(serializers.ModelSerializer):
         read_only_fields = ('card', )
 
     def create(self, validated_data):
-        card = get_object_or_404(Card, id=self.context.get('card_id'))
+        card = get_cached_object_or_404(self.context.get('request'), Card,
+                                        self.context.get('card_id'))
         file = validated_data.get('file')
         file_in_card = FileInCard.objects.create(card=card, file=file)
 
@@ -49,63 +68,205 @@ class FileInCardSerializer(serializers.ModelSerializer):
 
 
 class CardSerializer(serializers.ModelSerializer):
-    tags = TagSerializer(many=True)
-    files = FileInCardSerializer(many=True, read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    """Файлы, комментарии и чек-листы встраиваются последней страницей
+    (CARD_EMBEDDED_OBJECTS_LIMIT самых новых), а ссылка на предыдущую
+    страницу соответствующего эндпоинта отдается в полях files_previous,
+    comments_previous и check_lists_previous. Полный список возвращается,
+    если он указан в параметре expand, например ?expand=comments,files."""
+    tags = TagSerializer(many=True, read_only=True)
+    files = serializers.SerializerMethodField()
+    files_previous = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
+    comments_previous = serializers.SerializerMethodField()
     participants = CustomUserSerializer(many=True, read_only=True)
-    check_lists = CheckListSerializer(many=True, read_only=True)
+    check_lists = serializers.SerializerMethodField()
+    check_lists_previous = serializers.SerializerMethodField()
     is_participant = serializers.SerializerMethodField()
+    position = serializers.SerializerMethodField()
 
     class Meta:
         model = Card
         fields = ('id', 'name', 'description', 'list', 'position', 'tags',
-                  'is_participant', 'participants', 'files', 'comments',
-                  'check_lists')
-        read_only_fields = ('list', 'position')
+                  'is_participant', 'participants', 'files',
+                  'files_previous', 'comments', 'comments_previous',
+                  'check_lists', 'check_lists_previous')
+        read_only_fields = ('list', )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.embedded = {}
+
+    def get_position(self, card):
+        return get_card_position(card)
 
     def get_is_participant(self, card):
         request = self.context.get('request')
-        user = request.user
 
         if request is None or request.user.is_anonymous:
             return False
 
-        return card.participants.filter(id=user.id).exists()
+        if hasattr(card, 'is_participant'):
+            return card.is_participant
+
+        return card.participants.filter(id=request.user.id).exists()
+
+    def get_files(self, card):
+        return self.get_embedded(card, 'files')[0]
+
+    def get_files_previous(self, card):
+        return self.get_embedded(card, 'files')[1]
+
+    def get_comments(self, card):
+        return self.get_embedded(card, 'comments')[0]
+
+    def get_comments_previous(self, card):
+        return self.get_embedded(card, 'comments')[1]
+
+    def get_check_lists(self, card):
+        return self.get_embedded(card, 'check_lists')[0]
+
+    def get_check_lists_previous(self, card):
+        return self.get_embedded(card, 'check_lists')[1]
+
+    def get_embedded(self, card, name):
+        """Возвращает (список объектов, ссылка на предыдущую страницу);
+        результат запоминается, чтобы оба поля строились одним запросом."""
+        if (card.pk, name) not in self.embedded:
+            self.embedded[card.pk, name] = self.load_embedded(card, name)
+
+        return self.embedded[card.pk, name]
+
+    def load_embedded(self, card, name):
+        queryset, serializer_class, paginator_class = {
+            'files': (FileInCard.objects.all(), FileInCardSerializer,
+                      KeysetPagination),
+            'comments': (Comment.objects.select_related('author'),
+                         CommentSerializer, CommentPaginator),
+            'check_lists': (CheckList.objects.all(), CheckListSerializer,
+                            KeysetPagination),
+        }[name]
+        request = self.context.get('request')
+        queryset = queryset.filter(card=card)
+        previous = None
+
+        if request is None or name in self.get_expanded(request):
+            objects = queryset.order_by(*paginator_class.ordering)
+        else:
+            paginator = paginator_class()
+            url = reverse(f'{name}-list', kwargs={'card_id': card.id})
+            objects = paginator.paginate_tail(
+                queryset, request, url,
+                page_size=settings.CARD_EMBEDDED_OBJECTS_LIMIT)
+            previous = paginator.get_previous_link()
+
+        return (serializer_class(objects, many=True,
+                                 context=self.context).data, previous)
+
+    @staticmethod
+    def get_expanded(request):
+        return request.query_params.get('expand', '').split(',')
 
 
 class CardListOrCreateSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     is_participant = serializers.SerializerMethodField()
+    position = serializers.SerializerMethodField()
 
     class Meta:
         model = Card
         fields = ('id', 'name', 'is_participant', 'position', 'list',
                   'participants', 'tags', 'files', 'comments', 'check_lists')
-        read_only_fields = ('position', 'files', 'comments', 'check_lists')
+        read_only_fields = ('files', 'comments', 'check_lists')
+
+    def get_position(self, card):
+        return get_card_position(card)
 
     def get_is_participant(self, card):
         request = self.context.get('request')
-        user = request.user
 
         if request is None or request.user.is_anonymous:
             return False
 
-        return card.participants.filter(id=user.id).exists()
+        if hasattr(card, 'is_participant'):
+            return card.is_participant
+
+        return card.participants.filter(id=request.user.id).exists()
+
+
+class BulkCardSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=50)
+    description = serializers.CharField(required=False, allow_blank=True)
+    tags = serializers.ListField(child=serializers.IntegerField(),
+                                 required=False)
+    participants = serializers.ListField(child=serializers.IntegerField(),
+                                         required=False)
+
+
+class BulkCreateCardsSerializer(serializers.Serializer):
+    """Состав доски берется из кэша, теги всех карточек проверяются одним
+    запросом."""
+    list = serializers.IntegerField()
+    cards = BulkCardSerializer(many=True, allow_empty=False)
+
+    def validate_cards(self, cards):
+
+        if len(cards) > settings.CARDS_BULK_CREATE_MAX_SIZE:
+            raise serializers.ValidationError({
+                'status': 'error',
+                'message': f'За один запрос можно создать не больше '
+                           f'{settings.CARDS_BULK_CREATE_MAX_SIZE} карточек!'
+            })
+
+        return cards
+
+    def validate(self, data):
+        list_ = get_cached_object_or_404(self.context.get('request'), List,
+                                         data['list'])
+        tag_ids = {tag_id for card in data['cards']
+                   for tag_id in card.get('tags', ())}
+        user_ids = {user_id for card in data['cards']
+                    for user_id in card.get('participants', ())}
+
+        if tag_ids and list_.board.tags.filter(
+                id__in=tag_ids).count() != len(tag_ids):
+            raise serializers.ValidationError({
+                'status': 'error',
+                'message': 'Такого тега нет в данной доске!'
+            })
+
+        for user_id in user_ids:
+            if not get_membership(list_.board_id, user_id).is_participant:
+                raise serializers.ValidationError({
+                    'status': 'error',
+                    'message':
+                        'Данный пользователь не является участникм доски!'
+                })
+
+        return data
+
+    def create(self, validated_data):
+        list_ = get_cached_object_or_404(self.context.get('request'), List,
+                                         validated_data['list'])
+
+        return Card.objects.bulk_create_in_list(list_,
+                                                validated_data['cards'])
 
 
 class AddOrRemoveParticipantInCardSerializer(serializers.Serializer):
     id = serializers.IntegerField()
 
     def create(self, validated_data):
-        card = get_object_or_404(Card, id=self.context.get('card_id'))
+        card = get_cached_object_or_404(self.context.get('request'), Card,
+                                        self.context.get('card_id'))
         user_id = validated_data['id']
         card.participants.add(user_id)
 
         return card
 
     def validate_id(self, id_):
-        card = get_object_or_404(Card, id=self.context.get('card_id'))
-        board = card.list.board
+        card = get_cached_object_or_404(self.context.get('request'), Card,
+                                        self.context.get('card_id'))
+        membership = get_membership(card.list.board_id, id_)
 
         if card.participants.filter(id=id_).exists():
             raise serializers.ValidationError({
@@ -114,7 +275,7 @@ class AddOrRemoveParticipantInCardSerializer(serializers.Serializer):
                     'Данный пользователь уже является участником карточки!'
             })
 
-        if not board.participants.filter(id=id_).exists():
+        if not membership.is_participant:
             raise serializers.ValidationError({
                 'status': 'error',
                 'message': 'Данный пользователь не является участникм доски!'
@@ -127,14 +288,16 @@ class AddOrRemoveTagInCardSerializer(serializers.Serializer):
     id = serializers.IntegerField()
 
     def create(self, validated_data):
-        card = get_object_or_404(Card, id=self.context.get('card_id'))
+        card = get_cached_object_or_404(self.context.get('request'), Card,
+                                        self.context.get('card_id'))
         tag_id = validated_data['id']
         card.tags.add(tag_id)
 
         return card
 
     def validate_id(self, id_):
-        card = get_object_or_404(Card, id=self.context.get('card_id'))
+        card = get_cached_object_or_404(self.context.get('request'), Card,
+                                        self.context.get('card_id'))
         board = card.list.board
 
         if not board.tags.filter(id=id_).exists():
@@ -157,8 +320,10 @@ class ChangeListOfCardSerializer(serializers.Serializer):
     position = serializers.IntegerField()
 
     def validate_id(self, id_):
-        card = get_object_or_404(Card, id=self.initial_data.get('card_id'))
-        new_list = get_object_or_404(List, id=id_)
+        card = get_cached_object_or_404(self.context.get('request'), Card,
+                                        self.initial_data.get('card_id'))
+        new_list = get_cached_object_or_404(self.context.get('request'), List,
+                                            id_)
 
         if card.list.board != new_list.board:
             raise serializers.ValidationError({
@@ -169,7 +334,8 @@ class ChangeListOfCardSerializer(serializers.Serializer):
         return id_
 
     def validate_position(self, position):
-        new_list = get_object_or_404(List, id=self.initial_data.get('id'))
+        new_list = get_cached_object_or_404(self.context.get('request'), List,
+                                            self.initial_data.get('id'))
 
         if position < 1:
             raise serializers.ValidationError({
@@ -194,8 +360,10 @@ class SwapCardsSerializer(serializers.Serializer):
     def validate(self, data):
         card_id_1 = data.get('card_1')
         card_id_2 = data.get('card_2')
-        card_1 = get_object_or_404(Card, id=card_id_1)
-        card_2 = get_object_or_404(Card, id=card_id_2)
+        card_1 = get_cached_object_or_404(self.context.get('request'), Card,
+                                          card_id_1)
+        card_2 = get_cached_object_or_404(self.context.get('request'), Card,
+                                          card_id_2)
 
         if card_id_1 == card_id_2:
             raise serializers.ValidationError({
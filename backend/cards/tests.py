@@ -0,0 +1,255 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Card, CheckList, Comment, RANK_STEP
+from boards.models import Board
+from lists.models import List
+from users.models import CustomUser
+
+
+class CardOrderingTest(TestCase):
+    """Перемещение и удаление карточки меняет только ее собственную
+    строку, а клиенты по-прежнему видят позиции, начиная с 1."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        board = Board.objects.create_board(author=self.user, name='Доска')
+        self.list_1 = List.objects.create(name='1', board=board, position=1)
+        self.list_2 = List.objects.create(name='2', board=board, position=2)
+        self.cards = [
+            Card.objects.create(name=str(number), list=self.list_1,
+                                rank=number * RANK_STEP)
+            for number in range(1, 6)
+        ]
+
+    def get_names(self, list_):
+        response = self.client.get(f'/api/v1/lists/{list_.id}/')
+        cards = response.json()['cards']
+        self.assertEqual([card['position'] for card in cards],
+                         list(range(1, len(cards) + 1)))
+
+        return [card['name'] for card in cards]
+
+    def change_list(self, card, list_, position):
+        return self.client.post(f'/api/v1/cards/{card.id}/change_list/',
+                                {'id': list_.id, 'position': position},
+                                content_type='application/json')
+
+    def test_move_inside_list(self):
+        response = self.change_list(self.cards[4], self.list_1, 2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_names(self.list_1),
+                         ['1', '5', '2', '3', '4'])
+
+    def test_move_to_other_list(self):
+        self.change_list(self.cards[0], self.list_2, 1)
+        self.change_list(self.cards[2], self.list_2, 1)
+        self.change_list(self.cards[4], self.list_2, 3)
+
+        self.assertEqual(self.get_names(self.list_1), ['2', '4'])
+        self.assertEqual(self.get_names(self.list_2), ['3', '1', '5'])
+
+    def test_rebalance_when_gap_is_exhausted(self):
+        Card.objects.filter(id=self.cards[1].id).update(rank=RANK_STEP + 1)
+
+        self.change_list(self.cards[4], self.list_1, 2)
+
+        self.assertEqual(self.get_names(self.list_1),
+                         ['1', '5', '2', '3', '4'])
+        self.cards[1].refresh_from_db()
+        self.assertEqual(self.cards[1].rank, 2 * RANK_STEP)
+
+    def test_card_without_rank_is_appended(self):
+        card = Card.objects.create(name='6', list=self.list_1)
+
+        self.assertEqual(card.rank, 6 * RANK_STEP)
+        self.assertEqual(Card.objects.create(name='1', list=self.list_2).rank,
+                         RANK_STEP)
+
+    def test_create_and_delete(self):
+        response = self.client.post('/api/v1/cards/',
+                                    {'name': '6', 'list': self.list_1.id},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['position'], 6)
+
+        self.client.delete(f'/api/v1/cards/{self.cards[0].id}/')
+
+        self.assertEqual(self.get_names(self.list_1),
+                         ['2', '3', '4', '5', '6'])
+
+    def test_list_position_matches_position(self):
+        self.change_list(self.cards[3], self.list_2, 1)
+        self.change_list(self.cards[0], self.list_1, 3)
+        Card.objects.filter(pk__in=[self.cards[1].pk, self.cards[2].pk]
+                            ).update(rank=RANK_STEP)
+
+        def get_positions(queryset):
+            return dict(queryset.values_list('id', 'position'))
+
+        self.assertEqual(get_positions(Card.objects.with_list_position()),
+                         get_positions(Card.objects.with_position()))
+
+    def test_swap_loads_each_card_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                '/api/v1/cards/swap/',
+                {'card_1': self.cards[0].id, 'card_2': self.cards[1].id},
+                content_type='application/json')
+
+        card_selects = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "cards_card"' in query['sql']
+        ]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(card_selects), 2)
+        self.assertEqual(self.get_names(self.list_1),
+                         ['2', '1', '3', '4', '5'])
+
+
+class CardDetailEmbeddedTest(TestCase):
+    """Карточка содержит только последние комментарии, остальные
+    догружаются по ссылке comments_previous или через параметр expand."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        board = Board.objects.create_board(author=self.user, name='Доска')
+        list_ = List.objects.create(name='Список', board=board, position=1)
+        self.card = Card.objects.create(name='Карточка', list=list_)
+        self.authors = [
+            CustomUser.objects.create(username=f'author_{number}',
+                                      email=f'author_{number}@test.ru')
+            for number in range(3)
+        ]
+        board.participants.add(*self.authors)
+
+    def add_comments(self, numbers):
+        for number in numbers:
+            Comment.objects.create(card=self.card, text=str(number),
+                                   author=self.authors[number % 3])
+
+    def get(self, path):
+        for cache in caches.all():
+            cache.clear()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+
+        self.assertEqual(response.status_code, 200)
+        return len(context), response.json()
+
+    def test_newest_comments_with_constant_queries(self):
+        self.add_comments(range(3))
+        self.get(f'/api/v1/cards/{self.card.id}/')
+        small_count, _ = self.get(f'/api/v1/cards/{self.card.id}/')
+        self.add_comments(range(3, 25))
+        large_count, data = self.get(f'/api/v1/cards/{self.card.id}/')
+
+        self.assertEqual(small_count, large_count)
+        comments = data['comments']
+        self.assertEqual([comment['text'] for comment in comments],
+                         [str(number) for number in range(15, 25)])
+        self.assertEqual(comments[0]['author']['username'], 'author_0')
+
+        _, older = self.get(data['comments_previous'])
+        self.assertEqual([comment['text'] for comment in older['results']],
+                         [str(number) for number in range(5, 15)])
+        self.assertIsNotNone(older['previous'])
+
+    def test_is_participant_from_annotation(self):
+        path = f'/api/v1/cards/{self.card.id}/'
+        _, data = self.get(path)
+        self.assertFalse(data['is_participant'])
+
+        self.card.participants.add(self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get(path).json()
+
+        self.assertTrue(data['is_participant'])
+        self.assertFalse([query for query in context.captured_queries
+                          if query['sql'].startswith('SELECT (1) AS "a"')])
+
+    def test_expand(self):
+        self.add_comments(range(15))
+        CheckList.objects.create(card=self.card, text='Пункт')
+        _, data = self.get(f'/api/v1/cards/{self.card.id}/?expand=comments')
+
+        self.assertEqual(len(data['comments']), 15)
+        self.assertIsNone(data['comments_previous'])
+        self.assertEqual(len(data['check_lists']), 1)
+        self.assertEqual(data['files'], [])
+        self.assertIsNone(data['files_previous'])
+
+
+class CardBulkCreateTest(TestCase):
+    """Карточки создаются в конец листа одним запросом к API и
+    постоянным числом запросов к базе."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+        self.list = List.objects.create(name='Список', board=self.board,
+                                        position=1)
+        Card.objects.create(name='0', list=self.list, rank=RANK_STEP)
+        self.tags = list(self.board.tags.values_list('id', flat=True))
+
+    def bulk_create(self, cards):
+        return self.client.post('/api/v1/cards/bulk_create/',
+                                {'list': self.list.id, 'cards': cards},
+                                content_type='application/json')
+
+    def get_cards(self, numbers):
+        return [{'name': str(number), 'tags': self.tags[:2],
+                 'participants': [self.user.id]} for number in numbers]
+
+    def test_bulk_create(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.bulk_create(self.get_cards(range(1, 21)))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([card['position'] for card in response.json()],
+                         list(range(2, 22)))
+        self.assertEqual(
+            list(self.list.cards.values_list('name', flat=True)),
+            [str(number) for number in range(21)])
+        self.assertEqual(
+            Card.tags.through.objects.filter(card__list=self.list).count(),
+            40)
+        self.assertEqual(self.user.cards_participants.count(), 20)
+
+        with CaptureQueriesContext(connection) as more_context:
+            self.bulk_create(self.get_cards(range(21, 121)))
+
+        self.assertLessEqual(len(more_context.captured_queries),
+                             len(context.captured_queries))
+
+    def test_foreign_tag_is_rejected(self):
+        other = Board.objects.create_board(author=self.user, name='Другая')
+        response = self.bulk_create([
+            {'name': '1', 'tags': [other.tags.first().id]}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.list.cards.count(), 1)
+
+    def test_stranger_is_rejected(self):
+        stranger = CustomUser.objects.create(username='stranger',
+                                             email='stranger@test.ru')
+        response = self.bulk_create([
+            {'name': '1', 'participants': [stranger.id]}])
+
+        self.assertEqual(response.status_code, 400)
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status, mixins
@@ -7,6 +8,7 @@ from rest_framework.response import Response
 
 from .filters import CardFilter
 from .models import Card, FileInCard, Comment, CheckList
+from .paginators import CardPaginator, CommentPaginator
 from .permissions import (IsAuthor, IsParticipant, IsStaff,
                           IsAuthorOrParticipantOrAdminForCreateCard,
                           IsAuthorOrParticipantOrAdminOfBoardForActionWithCard,
@@ -15,24 +17,36 @@ from .serializers import (CardSerializer, CardListOrCreateSerializer,
                           AddOrRemoveParticipantInCardSerializer,
                           AddOrRemoveTagInCardSerializer,
                           FileInCardSerializer, CommentSerializer,
-                          CheckListSerializer,
+                          CheckListSerializer, BulkCreateCardsSerializer,
                           ChangeListOfCardSerializer, SwapCardsSerializer)
 from boards.tag_serializer import TagSerializer
+from boards.versioning import ConditionalRetrieveMixin, bump_once
+from taskplanner.events import emit
+from taskplanner.identity_map import get_cached_object_or_404
 from users.serializers import CustomUserSerializer
 from lists.models import List
 
 
-class CardViewSet(viewsets.ModelViewSet):
+class CardViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, ]
     filter_class = CardFilter
+    pagination_class = CardPaginator
+    board_lookup = 'list__board'
 
     def get_queryset(self):
         user = self.request.user
 
+        queryset = Card.objects.with_position().with_user_flags(user)
+
+        if self.detail:
+            queryset = queryset.select_related('list__board__author')
+        else:
+            queryset = queryset.with_related()
+
         if user.is_superuser or user.is_staff:
-            return Card.objects.all()
+            return queryset
 
-        return Card.objects.filter(
+        return queryset.filter(
             list__board__participants__id=self.request.user.id)
 
     def get_serializer_class(self):
@@ -44,26 +58,34 @@ class CardViewSet(viewsets.ModelViewSet):
             return CardSerializer
 
     def perform_create(self, serializer):
-        list_ = get_object_or_404(List, id=self.request.data['list'])
-        count_of_cards = list_.cards.count()
-        serializer.save(list=list_,
-                        position=count_of_cards + 1)
+        list_ = get_cached_object_or_404(self.request, List,
+                                         self.request.data['list'])
+
+        with transaction.atomic():
+            Card.objects.lock_list(list_)
+            serializer.save(list=list_, rank=Card.objects.next_rank(list_))
+
+        emit(list_.board_id, 'card.created', id=serializer.instance.id,
+             list=list_.id)
+
+    def perform_update(self, serializer):
+        card = serializer.save()
+        emit(card.list.board_id, 'card.updated', id=card.id,
+             list=card.list_id)
 
     def perform_destroy(self, instance):
-        position = instance.position
-        queryset_of_cards = instance.list.cards
+        board_id, card_id = instance.list.board_id, instance.id
 
-        for card in queryset_of_cards.all()[position:]:
-            card.position -= 1
-            card.save()
+        with bump_once(board_id, 'card', card_id):
+            instance.delete()
 
-        instance.delete()
+        emit(board_id, 'card.deleted', id=card_id, list=instance.list_id)
 
     def get_permissions(self):
         if self.action == 'list':
             return [IsAuthenticated()]
 
-        if self.action == 'create':
+        if self.action in ('create', 'bulk_create'):
             return [IsAuthorOrParticipantOrAdminForCreateCard()]
 
         if self.action in ('retrieve', 'update', 'partial_update', 'destroy',
@@ -72,46 +94,91 @@ class CardViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def change_list(self, request, **kwargs):
-        card = get_object_or_404(Card, id=kwargs.get('pk'))
+        card = get_cached_object_or_404(self.request, Card, kwargs.get('pk'))
         self.check_object_permissions(self.request, card)
 
         data = request.data
         data['card_id'] = kwargs.get('pk')
-        serializer = ChangeListOfCardSerializer(data=data)
+        serializer = ChangeListOfCardSerializer(
+            data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
 
         new_list_id = request.data['id']
-        new_list = get_object_or_404(List, id=new_list_id)
+        new_list = get_cached_object_or_404(self.request, List, new_list_id)
         new_position = request.data['position']
 
-        for card_ in new_list.cards.all()[new_position - 1:]:
-            card_.position += 1
-            card_.save()
+        with transaction.atomic():
+            Card.objects.lock_list(new_list)
+            card.rank = Card.objects.rank_for_position(
+                new_list, new_position, exclude=card)
+            card.list = new_list
+            card.save(update_fields=['list', 'rank'])
 
-        for card__ in card.list.cards.all()[new_position:]:
-            card__.position -= 1
-            card__.save()
-
-        card.list, card.position = new_list, new_position
-        card.save()
+        emit(new_list.board_id, 'card.moved', id=card.id, list=new_list.id,
+             position=new_position)
 
         return Response(status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def swap(self, request, **kwargs):
-        card_1 = get_object_or_404(Card, id=request.data['card_1'])
-        card_2 = get_object_or_404(Card, id=request.data['card_2'])
+        card_1 = get_cached_object_or_404(self.request, Card,
+                                          request.data['card_1'])
+        card_2 = get_cached_object_or_404(self.request, Card,
+                                          request.data['card_2'])
         self.check_object_permissions(self.request, card_1)
 
-        serializer = SwapCardsSerializer(data=request.data)
+        serializer = SwapCardsSerializer(data=request.data,
+                                         context={'request': request})
         serializer.is_valid(raise_exception=True)
 
-        card_1.position, card_2.position = card_2.position, card_1.position
-        card_1.save()
-        card_2.save()
+        with transaction.atomic():
+            Card.objects.lock_list(card_1.list)
+            card_1.rank, card_2.rank = card_2.rank, card_1.rank
+            card_1.save(update_fields=['rank'])
+            card_2.save(update_fields=['rank'])
+
+        emit(card_1.list.board_id, 'card.swapped', list=card_1.list_id,
+             ids=[card_1.id, card_2.id])
 
         return Response(status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request, **kwargs):
+        serializer = BulkCreateCardsSerializer(data=request.data,
+                                               context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        card_ids = serializer.save()
+
+        list_ = get_cached_object_or_404(self.request, List,
+                                         serializer.validated_data['list'])
+        cards = self.get_queryset().filter(pk__in=card_ids)
+        emit(list_.board_id, 'card.bulk_created', list=list_.id,
+             ids=card_ids)
+
+        return Response(CardListOrCreateSerializer(
+            cards, many=True, context={'request': request}).data,
+            status=status.HTTP_201_CREATED)
+
+
+class CardObjectEventsMixin:
+    """События об изменении объектов карточки (комментариев, чек-листов,
+    участников): event_name.created, event_name.updated и т.д."""
+    event_name = None
+
+    def emit_event(self, action, card_id, **data):
+        card = get_cached_object_or_404(self.request, Card, card_id)
+        emit(card.list.board_id, f'{self.event_name}.{action}', card=card.id,
+             **data)
+
+    def perform_update(self, serializer):
+        instance = serializer.save()
+        self.emit_event('updated', instance.card_id, id=instance.id)
+
+    def perform_destroy(self, instance):
+        card_id, instance_id = instance.card_id, instance.id
+        instance.delete()
+        self.emit_event('deleted', card_id, id=instance_id)
+
 
 class FileInCardViewSet(viewsets.GenericViewSet,
                         mixins.ListModelMixin,
@@ -121,12 +188,14 @@ class FileInCardViewSet(viewsets.GenericViewSet,
     serializer_class = FileInCardSerializer
 
     def get_queryset(self):
-        card = get_object_or_404(Card, id=self.kwargs.get('card_id'))
+        card = get_cached_object_or_404(self.request, Card,
+                                        self.kwargs.get('card_id'))
 
         return FileInCard.objects.filter(card=card)
 
     def get_serializer_context(self):
         return {
+            'request': self.request,
             'card_id': self.kwargs.get('card_id')
         }
 
@@ -139,17 +208,25 @@ class FileInCardViewSet(viewsets.GenericViewSet,
             return [(IsAuthor | IsParticipant | IsStaff)()]
 
 
-class ParticipantInCardViewSet(viewsets.GenericViewSet,
+class ParticipantInCardViewSet(CardObjectEventsMixin,
+                               viewsets.GenericViewSet,
                                mixins.ListModelMixin,
                                mixins.RetrieveModelMixin,
                                mixins.CreateModelMixin,
                                mixins.DestroyModelMixin):
+    event_name = 'card_participant'
 
     def get_queryset(self):
-        card = get_object_or_404(Card, id=self.kwargs.get('card_id'))
+        card = get_cached_object_or_404(self.request, Card,
+                                        self.kwargs.get('card_id'))
 
         return card.participants.all()
 
+    def perform_create(self, serializer):
+        card = serializer.save()
+        self.emit_event('created', card.id,
+                        user=serializer.validated_data['id'])
+
     def get_serializer_class(self):
 
         if self.action in ('list', 'retrieve'):
@@ -161,6 +238,7 @@ class ParticipantInCardViewSet(viewsets.GenericViewSet,
 
     def get_serializer_context(self):
         return {
+            'request': self.request,
             'card_id': self.kwargs.get('card_id')
         }
 
@@ -173,7 +251,8 @@ class ParticipantInCardViewSet(viewsets.GenericViewSet,
             return [(IsAuthor | IsParticipant | IsStaff)()]
 
     def destroy(self, request, *args, **kwargs):
-        card = get_object_or_404(Card, id=kwargs.get('card_id'))
+        card = get_cached_object_or_404(self.request, Card,
+                                        kwargs.get('card_id'))
         user_id = kwargs.get('pk')
 
         if not card.participants.filter(id=user_id).exists():
@@ -184,6 +263,7 @@ class ParticipantInCardViewSet(viewsets.GenericViewSet,
                 status=status.HTTP_400_BAD_REQUEST)
 
         card.participants.remove(user_id)
+        self.emit_event('deleted', card.id, user=int(user_id))
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -195,7 +275,8 @@ class TagInCardViewSet(viewsets.GenericViewSet,
                        mixins.DestroyModelMixin):
 
     def get_queryset(self):
-        card = get_object_or_404(Card, id=self.kwargs.get('card_id'))
+        card = get_cached_object_or_404(self.request, Card,
+                                        self.kwargs.get('card_id'))
 
         return card.tags.all()
 
@@ -209,6 +290,7 @@ class TagInCardViewSet(viewsets.GenericViewSet,
 
     def get_serializer_context(self):
         return {
+            'request': self.request,
             'card_id': self.kwargs.get('card_id')
         }
 
@@ -221,7 +303,8 @@ class TagInCardViewSet(viewsets.GenericViewSet,
             return [(IsAuthor | IsParticipant | IsStaff)()]
 
     def destroy(self, request, *args, **kwargs):
-        card = get_object_or_404(Card, id=kwargs.get('card_id'))
+        card = get_cached_object_or_404(self.request, Card,
+                                        kwargs.get('card_id'))
         tag_id = kwargs.get('pk')
 
         if not card.tags.filter(id=tag_id).exists():
@@ -235,21 +318,26 @@ class TagInCardViewSet(viewsets.GenericViewSet,
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(CardObjectEventsMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    pagination_class = CommentPaginator
+    event_name = 'comment'
 
     def get_queryset(self):
         user = self.request.user
-        card = get_object_or_404(Card, id=self.kwargs.get('card_id'))
+        card = get_cached_object_or_404(self.request, Card,
+                                        self.kwargs.get('card_id'))
 
-        if user.is_superuser or user.is_staff:
-            return Comment.objects.all()
+        if self.detail and (user.is_superuser or user.is_staff):
+            return Comment.objects.select_related('author')
 
-        return card.comments
+        return card.comments.select_related('author')
 
     def perform_create(self, serializer):
-        card = get_object_or_404(Card, id=self.kwargs.get('card_id'))
-        serializer.save(author=self.request.user, card=card)
+        card = get_cached_object_or_404(self.request, Card,
+                                        self.kwargs.get('card_id'))
+        comment = serializer.save(author=self.request.user, card=card)
+        self.emit_event('created', card.id, id=comment.id)
 
     def get_permissions(self):
 
@@ -263,21 +351,25 @@ class CommentViewSet(viewsets.ModelViewSet):
             return [IsAuthorOfComment()]
 
 
-class CheckListViewSet(viewsets.ModelViewSet):
+class CheckListViewSet(CardObjectEventsMixin, viewsets.ModelViewSet):
     serializer_class = CheckListSerializer
+    event_name = 'check_list'
 
     def get_queryset(self):
         user = self.request.user
-        card = get_object_or_404(Card, id=self.kwargs.get('card_id'))
+        card = get_cached_object_or_404(self.request, Card,
+                                        self.kwargs.get('card_id'))
 
-        if user.is_superuser or user.is_staff:
+        if self.detail and (user.is_superuser or user.is_staff):
             return CheckList.objects.all()
 
-        return card.check_lists
+        return card.check_lists.all()
 
     def perform_create(self, serializer):
-        card = get_object_or_404(Card, id=self.kwargs.get('card_id'))
-        serializer.save(card=card)
+        card = get_cached_object_or_404(self.request, Card,
+                                        self.kwargs.get('card_id'))
+        check_list = serializer.save(card=card)
+        self.emit_event('created', card.id, id=check_list.id)
 
     def get_permissions(self):
 
@@ -296,6 +388,8 @@ class CheckListViewSet(viewsets.ModelViewSet):
         if check_list.is_active:
             check_list.is_active = False
             check_list.save()
+            self.emit_event('updated', check_list.card_id, id=check_list.id,
+                            is_active=False)
 
             return Response(
                 {'status': 'success',
@@ -303,6 +397,8 @@ class CheckListViewSet(viewsets.ModelViewSet):
 
         check_list.is_active = True
         check_list.save()
+        self.emit_event('updated', check_list.card_id, id=check_list.id,
+                        is_active=True)
 
         return Response(
             {'status': 'success',
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='list',
+            index=models.Index(fields=['board', 'position'], name='list_board_position'),
+        ),
+    ]
@@ -1,7 +1,22 @@
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 
-from boards.models import Board
+from boards.models import Board, BoardChange
+from boards.versioning import changed_rows, record_changes
+
+
+class ListManager(models.Manager):
+
+    def set_positions(self, list_ids, start=1):
+        """Проставляет листам позиции по порядку id в list_ids одним
+        UPDATE-запросом с CASE."""
+        lists = [self.model(id=list_id, position=position)
+                 for position, list_id in enumerate(list_ids, start=start)]
+
+        with transaction.atomic():
+            self.bulk_update(lists, ['position'])
+            record_changes('list', BoardChange.Operation.UPSERT, changed_rows(
+                self.filter(pk__in=list_ids), 'board_id', 'id'))
 
 
 class List(models.Model):
@@ -19,11 +34,14 @@ class List(models.Model):
         blank=True,
         validators=[MinValueValidator(1), ]
     )
+    objects = ListManager()
 
     class Meta:
         verbose_name = 'Список'
         verbose_name_plural = 'Списки'
         ordering = ['position']
+        indexes = [models.Index(fields=['board', 'position'],
+                                name='list_board_position')]
 
     def __str__(self):
         return self.name
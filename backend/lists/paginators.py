@@ -0,0 +1,5 @@
+from taskplanner.pagination import KeysetPagination
+
+
+class ListPaginator(KeysetPagination):
+    ordering = ('board', 'position', 'id')
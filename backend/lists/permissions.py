@@ -1,30 +1,29 @@
-from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 
-from boards.models import Board
+from boards.membership import get_membership
 
 
 class IsAuthorOrParticipantOrAdminForCreateList(permissions.BasePermission):
 
     def has_permission(self, request, view):
-        board = get_object_or_404(Board, id=request.data['board'])
+        membership = get_membership(request.data['board'], request.user.id)
 
         if request.user.is_authenticated:
-            return (request.user == board.author or
-                    board.participants.filter(id=request.user.id).exists()
+            return (membership.is_author or
+                    membership.is_participant
                     or request.user.is_staff)
 
 
 class IsAuthor(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.board.author == request.user
+        return get_membership(obj.board_id, request.user.id).is_author
 
 
 class IsParticipant(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.board.participants.filter(id=request.user.id).exists()
+        return get_membership(obj.board_id, request.user.id).is_participant
 
 
 class IsStaff(permissions.BasePermission):
@@ -1,8 +1,9 @@
-from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 
 from .models import List
+from boards.models import Board
 from cards.serializers import CardListOrCreateSerializer
+from taskplanner.identity_map import get_cached_object_or_404
 
 
 class ListSerializer(serializers.ModelSerializer):
@@ -14,6 +15,13 @@ class ListSerializer(serializers.ModelSerializer):
         read_only_fields = ('board', 'position')
 
 
+class ListHeaderSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = List
+        fields = ('id', 'name', 'board', 'position')
+
+
 class SwapListsSerializer(serializers.Serializer):
     list_1 = serializers.IntegerField()
     list_2 = serializers.IntegerField()
@@ -21,8 +29,10 @@ class SwapListsSerializer(serializers.Serializer):
     def validate(self, data):
         list_id_1 = data.get('list_1')
         list_id_2 = data.get('list_2')
-        list_1 = get_object_or_404(List, id=list_id_1)
-        list_2 = get_object_or_404(List, id=list_id_2)
+        list_1 = get_cached_object_or_404(self.context.get('request'), List,
+                                          list_id_1)
+        list_2 = get_cached_object_or_404(self.context.get('request'), List,
+                                          list_id_2)
 
         if list_id_1 == list_id_2:
             raise serializers.ValidationError({
@@ -37,3 +47,28 @@ class SwapListsSerializer(serializers.Serializer):
             })
 
         return data
+
+
+class ReorderListsSerializer(serializers.Serializer):
+    board = serializers.IntegerField()
+    lists = serializers.ListField(child=serializers.IntegerField(),
+                                  allow_empty=False)
+
+    def validate(self, data):
+        board = get_cached_object_or_404(self.context.get('request'), Board,
+                                         data.get('board'))
+        list_ids = data.get('lists')
+
+        if len(set(list_ids)) != len(list_ids):
+            raise serializers.ValidationError({
+                'status': 'error',
+                'message': 'Листы не должны повторяться!'
+            })
+
+        if set(list_ids) != set(board.lists.values_list('id', flat=True)):
+            raise serializers.ValidationError({
+                'status': 'error',
+                'message': 'Нужно передать все листы данной доски!'
+            })
+
+        return data
@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import List
+from boards.models import Board
+from users.models import CustomUser
+
+
+class ListOrderingTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+        self.lists = [
+            List.objects.create(name=str(number), board=self.board,
+                                position=number)
+            for number in range(1, 21)
+        ]
+
+    def get_names(self):
+        return list(self.board.lists.values_list('name', flat=True))
+
+    def reorder(self, list_ids):
+        return self.client.post('/api/v1/lists/reorder/',
+                                {'board': self.board.id, 'lists': list_ids},
+                                content_type='application/json')
+
+    def test_reorder_in_one_update(self):
+        list_ids = [list_.id for list_ in self.lists]
+        list_ids.append(list_ids.pop(0))
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.reorder(list_ids)
+
+        updates = [query for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE "lists_list"')]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.get_names(),
+                         [str(number) for number in range(2, 21)] + ['1'])
+
+    def test_reorder_requires_all_lists_of_board(self):
+        list_ids = [list_.id for list_ in self.lists]
+
+        self.assertEqual(self.reorder(list_ids[1:]).status_code, 400)
+        self.assertEqual(self.reorder(list_ids + list_ids[:1]).status_code,
+                         400)
+
+    def test_destroy_compacts_positions(self):
+        self.client.delete(f'/api/v1/lists/{self.lists[4].id}/')
+
+        self.assertEqual(
+            list(self.board.lists.values_list('position', flat=True)),
+            list(range(1, 20)))
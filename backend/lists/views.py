@@ -1,4 +1,5 @@
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -6,46 +7,74 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from .models import List
+from .paginators import ListPaginator
 from .permissions import (IsAuthor, IsParticipant, IsStaff,
                           IsAuthorOrParticipantOrAdminForCreateList)
 
-from .serializers import ListSerializer, SwapListsSerializer
+from .serializers import (ListSerializer, SwapListsSerializer,
+                          ReorderListsSerializer)
 from boards.models import Board
+from boards.versioning import ConditionalRetrieveMixin, bump_once
+from cards.models import Card
+from taskplanner.events import emit
+from taskplanner.identity_map import get_cached_object_or_404
 
 
-class ListViewSet(viewsets.ModelViewSet):
+class ListViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     serializer_class = ListSerializer
     filter_backends = [DjangoFilterBackend, ]
     filterset_fields = ['board']
+    pagination_class = ListPaginator
+    board_lookup = 'board'
 
     def get_queryset(self):
         user = self.request.user
 
+        queryset = List.objects.prefetch_related(Prefetch(
+            'cards',
+            queryset=Card.objects.with_list_position().with_user_flags(
+                user).with_related()))
+
+        if self.detail:
+            queryset = queryset.select_related('board__author')
+
         if user.is_superuser or user.is_staff:
-            return List.objects.all()
+            return queryset
 
-        return List.objects.filter(
+        return queryset.filter(
             board__participants__id=self.request.user.id)
 
     def perform_create(self, serializer):
-        board = get_object_or_404(Board, id=self.request.data['board'])
+        board = get_cached_object_or_404(self.request, Board,
+                                         self.request.data['board'])
         count_of_lists = board.lists.count()
-        serializer.save(board=board,
-                        position=count_of_lists + 1)
+        list_ = serializer.save(board=board,
+                                position=count_of_lists + 1)
+        emit(board.id, 'list.created', id=list_.id)
+
+    def perform_update(self, serializer):
+        list_ = serializer.save()
+        # DRF после сохранения сбрасывает подгруженные карточки
+        serializer.instance = self.get_queryset().get(pk=list_.pk)
+        emit(list_.board_id, 'list.updated', id=list_.id)
 
     def perform_destroy(self, instance):
-        position = instance.position
-        queryset_of_lists = instance.board.lists
+        position, list_id = instance.position, instance.id
+        queryset_of_lists = List.objects.filter(board_id=instance.board_id,
+                                                position__gt=position)
 
-        for list_ in queryset_of_lists.all()[position:]:
-            list_.position -= 1
-            list_.save()
+        with transaction.atomic():
+            list_ids = list(queryset_of_lists.values_list('id', flat=True))
 
-        instance.delete()
+            with bump_once(instance.board_id, 'list', list_id):
+                instance.delete()
+
+            List.objects.set_positions(list_ids, start=position)
+            emit(instance.board_id, 'list.deleted', id=list_id)
 
     def get_permissions(self):
 
-        if self.action == 'create':
+        if self.action in ('create', 'reorder'):
             return [IsAuthorOrParticipantOrAdminForCreateList()]
 
         if self.action == 'list':
@@ -57,15 +86,31 @@ class ListViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def swap(self, request, **kwargs):
-        list_1 = get_object_or_404(List, id=request.data['list_1'])
-        list_2 = get_object_or_404(List, id=request.data['list_2'])
+        list_1 = get_cached_object_or_404(self.request, List,
+                                          request.data['list_1'])
+        list_2 = get_cached_object_or_404(self.request, List,
+                                          request.data['list_2'])
         self.check_object_permissions(request, list_1)
 
-        serializer = SwapListsSerializer(data=request.data)
+        serializer = SwapListsSerializer(data=request.data,
+                                         context={'request': request})
         serializer.is_valid(raise_exception=True)
 
         list_1.position, list_2.position = list_2.position, list_1.position
         list_1.save()
         list_2.save()
+        emit(list_1.board_id, 'list.swapped', ids=[list_1.id, list_2.id])
+
+        return Response(status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def reorder(self, request, **kwargs):
+        serializer = ReorderListsSerializer(data=request.data,
+                                            context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        List.objects.set_positions(serializer.validated_data['lists'])
+        emit(serializer.validated_data['board'], 'list.reordered',
+             ids=serializer.validated_data['lists'])
 
         return Response(status=status.HTTP_200_OK)
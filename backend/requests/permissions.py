@@ -1,7 +1,7 @@
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from rest_framework import permissions
 
-from boards.models import Board, ParticipantInBoard
+from boards.membership import get_membership
 
 
 class IsAuthorOrModeratorOrStaffForListOrCreateRequest(
@@ -9,31 +9,29 @@ class IsAuthorOrModeratorOrStaffForListOrCreateRequest(
 
     def has_permission(self, request, view):
         board_id = request.parser_context.get('kwargs').get('board_id')
-        board = get_object_or_404(Board, id=board_id)
+        membership = get_membership(board_id, request.user.id)
 
         if request.user.is_authenticated:
-            return (request.user == board.author or
-                    ParticipantInBoard.objects.filter(
-                        board=board,
-                        participant=request.user,
-                        is_moderator=True).exists() or
+            return (membership.is_author or
+                    membership.is_moderator or
                     request.user.is_staff)
 
 
 class IsAuthor(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.board.author == request.user
+        return get_membership(obj.board_id, request.user.id).is_author
 
 
 class IsModerator(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        participant_in_board = get_object_or_404(ParticipantInBoard,
-                                                 board=obj.board,
-                                                 participant=request.user
-                                                 )
-        return participant_in_board.is_moderator
+        membership = get_membership(obj.board_id, request.user.id)
+
+        if not membership.is_participant:
+            raise Http404
+
+        return membership.is_moderator
 
 
 class IsStaff(permissions.BasePermission):
@@ -2,8 +2,10 @@ from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 
 from .models import Request
-from boards.models import Board, ParticipantInBoard
+from boards.membership import get_membership
+from boards.models import Board
 from boards.serializers import BoardListOrCreateSerializer
+from taskplanner.identity_map import get_cached_object_or_404
 from users.models import CustomUser
 from users.serializers import CustomUserSerializer
 
@@ -21,13 +23,15 @@ class SendRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
     def create(self, validated_data):
-        board = get_object_or_404(Board, id=self.context.get('board_id'))
+        board = get_cached_object_or_404(self.context.get('request'), Board,
+                                         self.context.get('board_id'))
         user = get_object_or_404(CustomUser, email=validated_data.get('email'))
         Request.objects.create(board=board, user=user)
         return user
 
     def validate_email(self, email):
-        board = get_object_or_404(Board, id=self.context.get('board_id'))
+        board = get_cached_object_or_404(self.context.get('request'), Board,
+                                         self.context.get('board_id'))
         user = get_object_or_404(CustomUser, email=email)
         request = self.context.get('request')
 
@@ -37,8 +41,7 @@ class SendRequestSerializer(serializers.Serializer):
                 'message': 'Вы не можете отправить запрос самому себе!'
             })
 
-        if ParticipantInBoard.objects.filter(board=board,
-                                             participant=user).exists():
+        if get_membership(board.id, user.id).is_participant:
             raise serializers.ValidationError({
                 'status': 'error',
                 'message': 'Данный пользователь уже является участником доски'
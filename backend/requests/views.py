@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
@@ -9,6 +10,8 @@ from .permissions import (IsAuthor, IsModerator, IsStaff, IsRecipient,
 from .serializers import (BoardRequestSerializer, SendRequestSerializer,
                           UserRequestSerializer)
 from boards.models import Board
+from taskplanner.events import emit
+from taskplanner.identity_map import get_cached_object_or_404
 
 
 class BoardRequestViewSet(viewsets.GenericViewSet,
@@ -18,9 +21,10 @@ class BoardRequestViewSet(viewsets.GenericViewSet,
                           mixins.DestroyModelMixin):
 
     def get_queryset(self):
-        board = get_object_or_404(Board, id=self.kwargs.get('board_id'))
+        board = get_cached_object_or_404(self.request, Board,
+                                         self.kwargs.get('board_id'))
 
-        return Request.objects.filter(board=board)
+        return Request.objects.filter(board=board).select_related('user')
 
     def get_serializer_class(self):
 
@@ -52,11 +56,13 @@ class UserRequestViewSet(viewsets.GenericViewSet,
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Request.objects.prefetch_related(Prefetch(
+            'board', queryset=Board.objects.with_user_flags(user)))
 
         if user.is_superuser or user.is_staff:
-            return Request.objects.all()
+            return queryset
 
-        return Request.objects.filter(user=user)
+        return queryset.filter(user=user)
 
     @action(detail=True, methods=['post'], permission_classes=[IsRecipient])
     def accept(self, request, **kwargs):
@@ -66,6 +72,7 @@ class UserRequestViewSet(viewsets.GenericViewSet,
 
         request_.board.participants.add(user)
         request_.delete()
+        emit(request_.board_id, 'participant.created', user=user.id)
 
         return Response(status=status.HTTP_200_OK)
 
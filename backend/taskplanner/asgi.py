@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskplanner.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from .events import events_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+
+    if scope['type'] == 'http' and scope['path'] == settings.EVENTS_URL:
+        return await events_application(scope, receive, send)
+
+    return await django_application(scope, receive, send)
@@ -0,0 +1,157 @@
+"""Пакетное выполнение запросов к API: POST /api/v1/batch/ принимает
+упорядоченный список операций вида {"method", "path", "data"} и
+выполняет их одну за другой в одной транзакции.
+
+Операции выполняются теми же представлениями, что и обычные запросы, но
+без повторной проверки JWT: пользователь уже известен по внешнему
+запросу. Карта идентичности общая для всех операций пакета, поэтому
+доска и пользователи загружаются один раз; состав досок берется из кэша
+(см. boards/membership.py). Листы и карточки после изменяющей операции
+забываются, так как их позиции меняются массовыми UPDATE.
+
+Пакет выполняется целиком или не выполняется вовсе: первая операция с
+ошибкой откатывает транзакцию, события (taskplanner/events.py)
+отправляются только после успешного коммита. Кэши не должны пережить
+откат: снимки досок сохраняются только после коммита, а состав досок,
+измененных пакетом, не кэшируется до коммита и сбрасывается при откате."""
+
+import io
+import json
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .identity_map import get_identity_map
+from boards.membership import discard_pending
+from cards.models import Card
+from lists.models import List
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def get_error(message, results=(), status_code=status.HTTP_400_BAD_REQUEST):
+    return Response({'status': 'error', 'message': message,
+                     'results': list(results)}, status=status_code)
+
+
+def validate_operation(operation):
+    """Возвращает текст ошибки или None для корректной операции."""
+
+    if not isinstance(operation, dict):
+        return 'Операция должна быть объектом'
+
+    if str(operation.get('method', '')).upper() not in METHODS:
+        return f'Метод должен быть одним из: {", ".join(METHODS)}'
+
+    path = operation.get('path')
+
+    if not isinstance(path, str) or not path.startswith('/api/v1/'):
+        return 'Путь операции должен начинаться с /api/v1/'
+
+    if urlsplit(path).path == settings.BATCH_URL:
+        return 'Пакеты нельзя вкладывать друг в друга'
+
+    return None
+
+
+def rollback():
+    """Помечает транзакцию пакета к откату. Отложенные до коммита сбросы
+    кэша состава досок при откате не выполняются, поэтому выполняются
+    сразу."""
+    transaction.set_rollback(True)
+    discard_pending()
+
+
+def build_request(request, method, path, data):
+    """Запрос операции с заголовками внешнего запроса, его пользователем
+    и картой идентичности."""
+    url = urlsplit(path)
+    body = b'' if data is None else json.dumps(data).encode()
+    environ = {
+        **request.META,
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+    }
+    sub_request = WSGIRequest(environ)
+    sub_request.identity_map = get_identity_map(request)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+
+    return sub_request
+
+
+class BatchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        operations = request.data
+
+        if isinstance(operations, dict):
+            operations = operations.get('operations')
+
+        if not isinstance(operations, list) or not operations:
+            return get_error('Ожидается непустой список операций')
+
+        if len(operations) > settings.BATCH_MAX_OPERATIONS:
+            return get_error(f'В пакете может быть не больше '
+                             f'{settings.BATCH_MAX_OPERATIONS} операций')
+
+        for index, operation in enumerate(operations):
+            error = validate_operation(operation)
+
+            if error is not None:
+                return get_error(f'Операция {index}: {error}')
+
+        results = []
+
+        with transaction.atomic():
+            for index, operation in enumerate(operations):
+                result = self.perform_operation(request, operation)
+                results.append(result)
+
+                if result['status'] >= 400:
+                    rollback()
+
+                    return get_error(
+                        f'Операция {index} завершилась ошибкой, пакет '
+                        f'отменен', results, result['status'])
+
+        return Response({'status': 'success', 'results': results},
+                        status=status.HTTP_200_OK)
+
+    def perform_operation(self, request, operation):
+        method = operation['method'].upper()
+        path = operation['path']
+
+        try:
+            match = resolve(urlsplit(path).path)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND,
+                    'data': {'detail': 'Страница не найдена.'}}
+
+        sub_request = build_request(request._request, method, path,
+                                    operation.get('data'))
+        response = match.func(sub_request, *match.args, **match.kwargs)
+
+        if method != 'GET':
+            get_identity_map(request).expire(Card, List)
+
+        if hasattr(response, 'data'):
+            data = response.data
+        else:
+            data = json.loads(response.content) if response.content else None
+
+        return {'status': response.status_code, 'data': data}
@@ -0,0 +1,5 @@
+"""Инструменты проверки производительности для разработки: сценарии
+вызова эндпоинтов на тестовых данных, проверка планов запросов и команда
+audit_query_plans, которая создает для нее отдельную тестовую базу.
+Приложение подключается в INSTALLED_APPS только при DEBUG, а рабочий код
+его не импортирует."""
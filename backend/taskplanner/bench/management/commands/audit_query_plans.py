@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases,
+                               teardown_test_environment)
+
+from boards import synthetic
+from taskplanner.bench import query_plans
+from taskplanner.bench.scenarios import SIZES as FIXTURE_SIZES, build_fixture
+
+SIZES = {
+    'users': 500,
+    'boards': 500,
+    'participants': 10,
+    'lists': 4,
+    'cards': 5,
+    'comments': 2,
+    'tags': 2,
+    'card_participants': 2,
+    'check_lists': 2,
+}
+
+
+class Command(BaseCommand):
+    help = ('Создает тестовую базу с синтетическими данными, вызывает все '
+            'маршруты роутера и проверяет планы их запросов: завершается '
+            'с ошибкой, если запрос просматривает целиком таблицу больше '
+            '--min-rows строк')
+
+    def add_arguments(self, parser):
+        for name, default in SIZES.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int,
+                                default=default, dest=name)
+
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='таблицы меньшего размера можно '
+                                 'просматривать целиком')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in SIZES}
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+
+        try:
+            synthetic.generate(seed=options['seed'], **sizes)
+            fixture = build_fixture('audit', **FIXTURE_SIZES['large'])
+            violations, failures = query_plans.audit(fixture,
+                                                     options['min_rows'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        for name, status_code in failures:
+            self.stderr.write(f'{name}: ответ {status_code}')
+
+        for name, table, rows, sql in violations:
+            self.stdout.write(f'{name}: просмотр {table} ({rows} строк)\n'
+                              f'    {sql}')
+
+        if violations or failures:
+            raise CommandError(
+                f'Полных просмотров больших таблиц: {len(violations)}, '
+                f'ошибок вызова: {len(failures)}')
+
+        self.stdout.write('Полных просмотров больших таблиц нет')
@@ -0,0 +1,113 @@
+"""Проверка планов выполнения запросов эндпоинтов. Каждый сценарий из
+scenarios.py выполняется в транзакции, которая затем откатывается;
+для каждого вида запроса снимается EXPLAIN QUERY PLAN (SQLite), и
+строки SCAN - просмотр всей таблицы или всего индекса вместо поиска
+SEARCH - считаются нарушением, если в таблице больше min_rows строк."""
+
+import re
+import tempfile
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .scenarios import SCENARIOS, get_endpoints
+from taskplanner.slow_queries import explain, get_fingerprint
+
+SCAN = re.compile(r'^\s*SCAN (\w+)')
+ALIAS = re.compile(r'"(\w+)" (?:AS )?([A-Z]\d+)\b')
+
+
+def get_row_counts():
+    with connection.cursor() as cursor:
+        counts = {}
+
+        for table in connection.introspection.table_names(cursor):
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            counts[table] = cursor.fetchone()[0]
+
+    return counts
+
+
+def get_scanned_tables(sql, plan):
+    """Таблицы, которые план просматривает целиком; псевдонимы вида U0
+    из подзапросов Django заменяются именами таблиц."""
+    aliases = {alias: table for table, alias in ALIAS.findall(sql)}
+    tables = []
+
+    for line in plan:
+        match = SCAN.match(line)
+
+        if match is not None:
+            tables.append(aliases.get(match.group(1), match.group(1)))
+
+    return tables
+
+
+class QueryCollector:
+    """Обертка выполнения запросов: запоминает запросы с параметрами."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.queries.append((sql, params))
+
+        return execute(sql, params, many, context)
+
+
+def collect_queries(call, method):
+    """Выполняет вызов и откатывает его изменения; возвращает код ответа
+    и выполненные запросы."""
+    for cache in caches.all():
+        cache.clear()
+
+    client = Client(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(call.user)}')
+    extra = {} if call.multipart else {'content_type': 'application/json'}
+    collector = QueryCollector()
+
+    with transaction.atomic(), connection.execute_wrapper(collector):
+        response = getattr(client, method)(call.path, call.data, **extra)
+        transaction.set_rollback(True)
+
+    return response.status_code, collector.queries
+
+
+def audit(fixture, min_rows):
+    """Возвращает нарушения: (эндпоинт, таблица, число строк, SQL), а
+    также эндпоинты, вызов которых завершился ошибкой."""
+    row_counts = get_row_counts()
+    violations, failures = [], []
+    explained = set()
+
+    with tempfile.TemporaryDirectory() as media_root, \
+            override_settings(MEDIA_ROOT=media_root):
+        for endpoint in get_endpoints():
+            viewset, action, method = endpoint
+            name = f'{viewset}.{action} ({method})'
+            status_code, queries = collect_queries(
+                SCENARIOS[endpoint](fixture), method)
+
+            if status_code >= 400:
+                failures.append((name, status_code))
+
+            for sql, params in queries:
+                key = (name, get_fingerprint(sql))
+
+                if key in explained:
+                    continue
+
+                explained.add(key)
+
+                for table in get_scanned_tables(
+                        sql, explain(connection, sql, params) or ()):
+                    if row_counts.get(table, 0) > min_rows:
+                        violations.append((name, table, row_counts[table],
+                                           sql))
+
+    return violations, failures
@@ -0,0 +1,308 @@
+"""Сценарии вызова каждого маршрута роутера на наборе данных из
+build_fixture: по одному на (представление, действие, метод). Ими
+пользуются тест числа запросов (taskplanner/tests.py) и проверка планов
+запросов (query_plans.py)."""
+
+from collections import namedtuple
+from types import SimpleNamespace
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from taskplanner.urls import router
+from boards.models import Board, Favorite, ParticipantInBoard
+from cards.models import Card, CheckList, Comment, FileInCard, RANK_STEP
+from lists.models import List
+from requests.models import Request
+from users.models import CustomUser
+
+SIZES = {
+    'small': {'boards': 2, 'lists': 2, 'cards': 2, 'members': 2,
+              'objects': 1},
+    'large': {'boards': 6, 'lists': 5, 'cards': 8, 'members': 6,
+              'objects': 4},
+}
+
+Call = namedtuple('Call', 'user path data multipart budget',
+                  defaults=(None, False, 0))
+
+
+def create_user(name):
+    return CustomUser.objects.create(username=name, email=f'{name}@test.ru')
+
+
+def build_fixture(name, boards, lists, cards, members, objects):
+    """Доски автора с участниками, модератором, избранным и запросами;
+    на первой доске - листы и карточки с тегами, участниками,
+    комментариями, пунктами чек-листа и файлами."""
+    fixture = SimpleNamespace(
+        author=create_user(f'{name}_author'),
+        moderator=create_user(f'{name}_moderator'),
+        members=[create_user(f'{name}_member{number}')
+                 for number in range(members)],
+        outsiders=[create_user(f'{name}_outsider{number}')
+                   for number in range(members)],
+        invitee=create_user(f'{name}_invitee'),
+        recipient=create_user(f'{name}_recipient'),
+    )
+    fixture.boards = [
+        Board.objects.create_board(author=fixture.author,
+                                   name=f'{name} {number}')
+        for number in range(boards)
+    ]
+
+    for board in fixture.boards:
+        ParticipantInBoard.objects.create(board=board,
+                                          participant=fixture.moderator,
+                                          is_moderator=True)
+        ParticipantInBoard.objects.bulk_create(
+            ParticipantInBoard(board=board, participant=member)
+            for member in fixture.members)
+        Favorite.objects.create(user=fixture.author, board=board)
+        Request.objects.create(board=board, user=fixture.recipient)
+
+    fixture.board = fixture.boards[0]
+    Request.objects.bulk_create(
+        Request(board=fixture.board, user=outsider)
+        for outsider in fixture.outsiders)
+    fixture.tags = list(fixture.board.tags.order_by('id'))
+    fixture.lists = [
+        List.objects.create(name=str(number), board=fixture.board,
+                            position=number)
+        for number in range(1, lists + 1)
+    ]
+
+    for list_ in fixture.lists:
+        for number in range(1, cards + 1):
+            card = Card.objects.create(name=f'Карточка {number}',
+                                       list=list_, rank=number * RANK_STEP)
+            card.tags.add(*fixture.tags[:objects])
+            card.participants.add(fixture.author,
+                                  *fixture.members[:objects])
+
+            for _ in range(objects):
+                Comment.objects.create(author=fixture.author, card=card,
+                                       text='Комментарий')
+                CheckList.objects.create(card=card, text='Пункт')
+                FileInCard.objects.create(card=card,
+                                          file='card_files/f.txt')
+
+    fixture.list = fixture.lists[0]
+    fixture.cards = list(fixture.list.cards.order_by('rank'))
+    fixture.card = fixture.cards[0]
+
+    return fixture
+
+
+def board_path(fixture, suffix=''):
+    return f'/api/v1/boards/{fixture.board.id}/{suffix}'
+
+
+def card_path(fixture, suffix=''):
+    return f'/api/v1/cards/{fixture.card.id}/{suffix}'
+
+
+def participant_in_board(fixture):
+    return ParticipantInBoard.objects.get(board=fixture.board,
+                                          participant=fixture.members[0])
+
+
+def board_request(fixture):
+    return Request.objects.get(board=fixture.board, user=fixture.recipient)
+
+
+def upload():
+    return {'file': SimpleUploadedFile('file.txt', b'file')}
+
+
+# (представление, действие, метод) -> функция набора данных, которая
+# возвращает Call. Для каждого маршрута роутера должен быть сценарий;
+# budget - на сколько запросов большая доска может превышать малую
+SCENARIOS = {
+    ('BoardViewSet', 'list', 'get'): lambda f: Call(
+        f.author, '/api/v1/boards/'),
+    ('BoardViewSet', 'create', 'post'): lambda f: Call(
+        f.author, '/api/v1/boards/', {'name': 'Новая доска'}),
+    ('BoardViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, board_path(f)),
+    ('BoardViewSet', 'update', 'put'): lambda f: Call(
+        f.author, board_path(f), {'name': 'Доска', 'description': 'Текст'}),
+    ('BoardViewSet', 'partial_update', 'patch'): lambda f: Call(
+        f.author, board_path(f), {'name': 'Доска'}),
+    # каскадное удаление идет пачками по 100 строк: комментарии, пункты
+    # чек-листа и файлы большой доски удаляются двумя запросами
+    ('BoardViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, board_path(f), budget=3),
+    ('BoardViewSet', 'changes', 'get'): lambda f: Call(
+        f.author, board_path(f, 'changes/?since=0')),
+    ('BoardViewSet', 'favorite', 'post'): lambda f: Call(
+        f.members[0], board_path(f, 'favorite/')),
+    ('BoardViewSet', 'favorite', 'delete'): lambda f: Call(
+        f.author, board_path(f, 'favorite/')),
+    ('BoardViewSet', 'leave', 'post'): lambda f: Call(
+        f.members[0], board_path(f, 'leave/')),
+    ('BoardViewSet', 'switch_moderator', 'post'): lambda f: Call(
+        f.author, board_path(f, 'switch_moderator/'),
+        {'id': f.members[0].id}),
+
+    ('ParticipantInBoardViewSet', 'list', 'get'): lambda f: Call(
+        f.author, board_path(f, 'participants/')),
+    ('ParticipantInBoardViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, board_path(
+            f, f'participants/{participant_in_board(f).id}/')),
+    ('ParticipantInBoardViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, board_path(f, f'participants/{f.members[0].id}/')),
+
+    ('TagInBoardViewSet', 'list', 'get'): lambda f: Call(
+        f.author, board_path(f, 'tags/')),
+    ('TagInBoardViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, board_path(f, f'tags/{f.tags[0].id}/')),
+    ('TagInBoardViewSet', 'update', 'put'): lambda f: Call(
+        f.author, board_path(f, f'tags/{f.tags[0].id}/'), {'name': 'Тег'}),
+    ('TagInBoardViewSet', 'partial_update', 'patch'): lambda f: Call(
+        f.author, board_path(f, f'tags/{f.tags[0].id}/'), {'name': 'Тег'}),
+
+    ('BoardRequestViewSet', 'list', 'get'): lambda f: Call(
+        f.author, board_path(f, 'requests/')),
+    ('BoardRequestViewSet', 'create', 'post'): lambda f: Call(
+        f.author, board_path(f, 'requests/'), {'email': f.invitee.email}),
+    ('BoardRequestViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, board_path(f, f'requests/{board_request(f).id}/')),
+    ('BoardRequestViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, board_path(f, f'requests/{board_request(f).id}/')),
+
+    ('UserRequestViewSet', 'list', 'get'): lambda f: Call(
+        f.recipient, '/api/v1/my_requests/'),
+    ('UserRequestViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.recipient, f'/api/v1/my_requests/{board_request(f).id}/'),
+    ('UserRequestViewSet', 'accept', 'post'): lambda f: Call(
+        f.recipient, f'/api/v1/my_requests/{board_request(f).id}/accept/'),
+    ('UserRequestViewSet', 'refuse', 'post'): lambda f: Call(
+        f.recipient, f'/api/v1/my_requests/{board_request(f).id}/refuse/'),
+
+    ('ListViewSet', 'list', 'get'): lambda f: Call(
+        f.author, '/api/v1/lists/'),
+    ('ListViewSet', 'create', 'post'): lambda f: Call(
+        f.author, '/api/v1/lists/', {'name': 'Лист', 'board': f.board.id}),
+    ('ListViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, f'/api/v1/lists/{f.list.id}/'),
+    ('ListViewSet', 'update', 'put'): lambda f: Call(
+        f.author, f'/api/v1/lists/{f.list.id}/', {'name': 'Лист'}),
+    ('ListViewSet', 'partial_update', 'patch'): lambda f: Call(
+        f.author, f'/api/v1/lists/{f.list.id}/', {'name': 'Лист'}),
+    ('ListViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, f'/api/v1/lists/{f.list.id}/'),
+    ('ListViewSet', 'swap', 'post'): lambda f: Call(
+        f.author, '/api/v1/lists/swap/',
+        {'list_1': f.lists[0].id, 'list_2': f.lists[1].id}),
+    ('ListViewSet', 'reorder', 'post'): lambda f: Call(
+        f.author, '/api/v1/lists/reorder/',
+        {'board': f.board.id,
+         'lists': [list_.id for list_ in reversed(f.lists)]}),
+
+    ('CardViewSet', 'list', 'get'): lambda f: Call(
+        f.author, '/api/v1/cards/'),
+    ('CardViewSet', 'create', 'post'): lambda f: Call(
+        f.author, '/api/v1/cards/', {'name': 'Карточка', 'list': f.list.id}),
+    ('CardViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, card_path(f)),
+    ('CardViewSet', 'update', 'put'): lambda f: Call(
+        f.author, card_path(f), {'name': 'Карточка', 'tags': []}),
+    ('CardViewSet', 'partial_update', 'patch'): lambda f: Call(
+        f.author, card_path(f), {'name': 'Карточка'}),
+    ('CardViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, card_path(f)),
+    ('CardViewSet', 'change_list', 'post'): lambda f: Call(
+        f.author, card_path(f, 'change_list/'),
+        {'id': f.lists[1].id, 'position': 1}),
+    ('CardViewSet', 'swap', 'post'): lambda f: Call(
+        f.author, '/api/v1/cards/swap/',
+        {'card_1': f.cards[0].id, 'card_2': f.cards[1].id}),
+    ('CardViewSet', 'bulk_create', 'post'): lambda f: Call(
+        f.author, '/api/v1/cards/bulk_create/',
+        {'list': f.list.id,
+         'cards': [{'name': str(number), 'tags': [f.tags[0].id],
+                    'participants': [f.author.id]}
+                   for number in range(3)]}),
+
+    ('FileInCardViewSet', 'list', 'get'): lambda f: Call(
+        f.author, card_path(f, 'files/')),
+    ('FileInCardViewSet', 'create', 'post'): lambda f: Call(
+        f.author, card_path(f, 'files/'), upload(), multipart=True),
+    ('FileInCardViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, card_path(f, f'files/{f.card.files.first().id}/')),
+    ('FileInCardViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, card_path(f, f'files/{f.card.files.first().id}/')),
+
+    ('ParticipantInCardViewSet', 'list', 'get'): lambda f: Call(
+        f.author, card_path(f, 'participants/')),
+    ('ParticipantInCardViewSet', 'create', 'post'): lambda f: Call(
+        f.author, card_path(f, 'participants/'), {'id': f.moderator.id}),
+    ('ParticipantInCardViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, card_path(f, f'participants/{f.author.id}/')),
+    ('ParticipantInCardViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, card_path(f, f'participants/{f.members[0].id}/')),
+
+    ('TagInCardViewSet', 'list', 'get'): lambda f: Call(
+        f.author, card_path(f, 'tags/')),
+    ('TagInCardViewSet', 'create', 'post'): lambda f: Call(
+        f.author, card_path(f, 'tags/'), {'id': f.tags[-1].id}),
+    ('TagInCardViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, card_path(f, f'tags/{f.tags[0].id}/')),
+    ('TagInCardViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, card_path(f, f'tags/{f.tags[0].id}/')),
+
+    ('CommentViewSet', 'list', 'get'): lambda f: Call(
+        f.author, card_path(f, 'comments/')),
+    ('CommentViewSet', 'create', 'post'): lambda f: Call(
+        f.author, card_path(f, 'comments/'), {'text': 'Комментарий'}),
+    ('CommentViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author, card_path(f, f'comments/{f.card.comments.first().id}/')),
+    ('CommentViewSet', 'update', 'put'): lambda f: Call(
+        f.author, card_path(f, f'comments/{f.card.comments.first().id}/'),
+        {'text': 'Текст'}),
+    ('CommentViewSet', 'partial_update', 'patch'): lambda f: Call(
+        f.author, card_path(f, f'comments/{f.card.comments.first().id}/'),
+        {'text': 'Текст'}),
+    ('CommentViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author, card_path(f, f'comments/{f.card.comments.first().id}/')),
+
+    ('CheckListViewSet', 'list', 'get'): lambda f: Call(
+        f.author, card_path(f, 'check-lists/')),
+    ('CheckListViewSet', 'create', 'post'): lambda f: Call(
+        f.author, card_path(f, 'check-lists/'), {'text': 'Пункт'}),
+    ('CheckListViewSet', 'retrieve', 'get'): lambda f: Call(
+        f.author,
+        card_path(f, f'check-lists/{f.card.check_lists.first().id}/')),
+    ('CheckListViewSet', 'update', 'put'): lambda f: Call(
+        f.author,
+        card_path(f, f'check-lists/{f.card.check_lists.first().id}/'),
+        {'text': 'Пункт'}),
+    ('CheckListViewSet', 'partial_update', 'patch'): lambda f: Call(
+        f.author,
+        card_path(f, f'check-lists/{f.card.check_lists.first().id}/'),
+        {'text': 'Пункт'}),
+    ('CheckListViewSet', 'destroy', 'delete'): lambda f: Call(
+        f.author,
+        card_path(f, f'check-lists/{f.card.check_lists.first().id}/')),
+    ('CheckListViewSet', 'switch_is_active', 'post'): lambda f: Call(
+        f.author, card_path(
+            f, f'check-lists/{f.card.check_lists.first().id}/'
+               f'switch_is_active/')),
+}
+
+
+def get_endpoints():
+    """(представление, действие, метод) всех маршрутов роутера."""
+    endpoints = []
+
+    for _, viewset, _ in router.registry:
+        for route in router.get_routes(viewset):
+            mapping = router.get_method_map(viewset, route.mapping)
+
+            for method, action in mapping.items():
+                endpoint = (viewset.__name__, action, method)
+
+                if endpoint not in endpoints:
+                    endpoints.append(endpoint)
+
+    return endpoints
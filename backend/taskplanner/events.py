@@ -0,0 +1,232 @@
+"""Рассылка изменений досок клиентам через Server-Sent Events.
+
+Клиент открывает GET /api/v1/events/ с тем же JWT, что и для API (в
+заголовке Authorization или, для EventSource, в параметре token) и
+получает события всех досок, в которых он участвует; параметр boards
+сужает набор досок. Представления вызывают emit(), событие публикуется
+после коммита транзакции через брокер в памяти процесса.
+
+Событие сериализуется один раз и раскладывается по очередям подписчиков
+одной задачей в цикле событий, поэтому ожидающие соединения ничего не
+стоят, кроме периодического keep-alive. Если клиент не успевает читать
+события, он получает событие resync и соединение закрывается."""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class Subscription:
+
+    def __init__(self, user_id, board_ids):
+        self.user_id = user_id
+        self.board_ids = set(board_ids)
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class Broker:
+    """Подписки хранятся отдельно для каждого цикла событий и меняются
+    только в нем, publish() можно вызывать из любого потока."""
+
+    def __init__(self):
+        self.loops = {}
+
+    def get_state(self, loop):
+        return self.loops.setdefault(loop, {'boards': {}, 'users': {}})
+
+    def subscribe(self, subscription):
+        state = self.get_state(asyncio.get_running_loop())
+        state['users'].setdefault(subscription.user_id,
+                                  set()).add(subscription)
+
+        for board_id in subscription.board_ids:
+            state['boards'].setdefault(board_id, set()).add(subscription)
+
+    def unsubscribe(self, subscription):
+        loop = asyncio.get_running_loop()
+        state = self.get_state(loop)
+        self.discard(state['users'], subscription.user_id, subscription)
+
+        for board_id in subscription.board_ids:
+            self.discard(state['boards'], board_id, subscription)
+
+        if not state['users']:
+            del self.loops[loop]
+
+    @staticmethod
+    def discard(index, key, subscription):
+        subscriptions = index.get(key)
+
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+
+            if not subscriptions:
+                del index[key]
+
+    def publish(self, board_id, event):
+        payload = encode_event(event['type'], event)
+
+        for loop in list(self.loops):
+            if loop.is_closed():
+                self.loops.pop(loop, None)
+                continue
+
+            loop.call_soon_threadsafe(self.deliver, loop, board_id, event,
+                                      payload)
+
+    def deliver(self, loop, board_id, event, payload):
+        state = self.loops.get(loop)
+
+        if state is None:
+            return
+
+        for subscription in state['boards'].get(board_id, ()):
+            try:
+                subscription.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+
+        if event['type'] in ('participant.created', 'participant.deleted'):
+            self.update_membership(state, board_id, event)
+
+    def update_membership(self, state, board_id, event):
+        """Подписывает соединения пользователя на доску, в которую его
+        добавили, и отписывает от доски, из которой он вышел."""
+
+        for subscription in state['users'].get(event['user'], ()):
+            if event['type'] == 'participant.created':
+                subscription.board_ids.add(board_id)
+                state['boards'].setdefault(board_id,
+                                           set()).add(subscription)
+            else:
+                subscription.board_ids.discard(board_id)
+                self.discard(state['boards'], board_id, subscription)
+
+
+broker = Broker()
+
+
+def encode_event(event_type, data):
+    return (f'event: {event_type}\n'
+            f'data: {json.dumps(data, separators=(",", ":"))}\n\n').encode()
+
+
+def emit(board_id, event_type, **data):
+    """Публикует событие доски после коммита текущей транзакции."""
+    event = {'type': event_type, 'board': board_id, **data}
+    transaction.on_commit(lambda: broker.publish(board_id, event))
+
+
+def get_token(scope):
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            parts = value.decode().split()
+
+            if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+                return parts[1]
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    return query.get('token', [None])[0]
+
+
+def get_board_ids(user_id, requested):
+    from boards.models import ParticipantInBoard
+
+    board_ids = ParticipantInBoard.objects.filter(
+        participant_id=user_id, participant__is_active=True,
+    ).values_list('board_id', flat=True)
+
+    if requested is not None:
+        board_ids = board_ids.filter(board_id__in=requested)
+
+    return list(board_ids)
+
+
+def get_requested_boards(scope):
+    query = parse_qs(scope.get('query_string', b'').decode())
+
+    if 'boards' not in query:
+        return None
+
+    return [int(board_id) for board_id in query['boards'][0].split(',')
+            if board_id.isdigit()]
+
+
+async def send_error(send, status, message):
+    body = json.dumps({'status': 'error', 'message': message}).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def events_application(scope, receive, send):
+    token = get_token(scope)
+
+    try:
+        user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        token = None
+
+    if token is None:
+        await send_error(send, 401, 'Требуется авторизация')
+        return
+
+    board_ids = await sync_to_async(get_board_ids)(
+        user_id, get_requested_boards(scope))
+    subscription = Subscription(user_id, board_ids)
+    broker.subscribe(subscription)
+
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': encode_event('ready', {'boards': board_ids})})
+        await stream(subscription, receive, send)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def stream(subscription, receive, send):
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+
+    try:
+        while True:
+            get = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({get, disconnect},
+                                         timeout=settings.EVENTS_KEEPALIVE,
+                                         return_when=asyncio.FIRST_COMPLETED)
+
+            if disconnect in done:
+                get.cancel()
+                return
+
+            if subscription.overflowed:
+                get.cancel()
+                await send({'type': 'http.response.body',
+                            'body': encode_event('resync', {})})
+                return
+
+            body = get.result() if get in done else b': keep-alive\n\n'
+
+            if get not in done:
+                get.cancel()
+
+            await send({'type': 'http.response.body', 'body': body,
+                        'more_body': True})
+    finally:
+        disconnect.cancel()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
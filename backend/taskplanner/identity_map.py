@@ -0,0 +1,100 @@
+"""Карта идентичности в рамках одного запроса: каждая доска, лист,
+карточка и пользователь загружаются из базы не более одного раза, даже если
+их по отдельности запрашивают представление, сериализатор и разрешения."""
+
+import logging
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+logger = logging.getLogger(__name__)
+
+SELECT_RELATED = {
+    'boards.Board': ('author', ),
+    'lists.List': ('board__author', ),
+    'cards.Card': ('list__board__author', ),
+}
+
+
+class IdentityMap:
+
+    def __init__(self):
+        self.objects = {}
+        self.fetches = 0
+        self.hits = 0
+
+    def key(self, model, pk):
+        try:
+            return model._meta.label, model._meta.pk.to_python(pk)
+        except ValidationError:
+            raise Http404
+
+    def add(self, obj):
+        """Запоминает объект и все объекты, загруженные вместе с ним через
+        select_related."""
+        self.objects.setdefault(self.key(type(obj), obj.pk), obj)
+
+        for related in obj._state.fields_cache.values():
+            if related is not None:
+                self.add(related)
+
+        return obj
+
+    def expire(self, *models):
+        """Забывает объекты моделей, которые могли измениться в базе мимо
+        загруженных экземпляров (например, массовым UPDATE)."""
+        labels = {model._meta.label for model in models}
+        self.objects = {key: obj for key, obj in self.objects.items()
+                        if key[0] not in labels}
+
+    def get(self, model, pk):
+        key = self.key(model, pk)
+
+        if key in self.objects:
+            self.hits += 1
+            return self.objects[key]
+
+        queryset = model._default_manager.select_related(
+            *SELECT_RELATED.get(model._meta.label, ()))
+        obj = get_object_or_404(queryset, pk=key[1])
+        self.fetches += 1
+
+        return self.add(obj)
+
+
+def get_identity_map(request):
+    http_request = getattr(request, '_request', request)
+
+    if not hasattr(http_request, 'identity_map'):
+        http_request.identity_map = IdentityMap()
+
+    return http_request.identity_map
+
+
+def get_cached_object_or_404(request, model, pk):
+    """Аналог get_object_or_404 для поиска по первичному ключу, который
+    возвращает уже загруженный в этом запросе объект."""
+
+    if request is None:
+        return IdentityMap().get(model, pk)
+
+    return get_identity_map(request).get(model, pk)
+
+
+class IdentityMapMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        identity_map = get_identity_map(request)
+        response = self.get_response(request)
+
+        if identity_map.fetches:
+            logger.debug('%s %s: загружено объектов - %d, '
+                         'повторных загрузок удалось избежать - %d',
+                         request.method, request.path,
+                         identity_map.fetches, identity_map.hits)
+
+        return response
@@ -0,0 +1,172 @@
+"""Метрики запросов по маршрутам: число запросов, гистограмма времени
+ответа, число и время SQL-запросов. Маршрут - имя URL из роутера
+(boards-detail, cards-change-list и т.д.), SQL-запросы считаются
+обертками выполнения запросов (connection.execute_wrapper), поэтому
+DEBUG не нужен. Метрики накапливаются в памяти процесса и отдаются в
+текстовом формате Prometheus на /api/v1/metrics/ только персоналу; при
+нескольких процессах каждый отдает свои метрики."""
+
+import bisect
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class QueryTimer:
+    """Обертка выполнения запросов: считает запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ('count', 'buckets', 'duration', 'queries', 'sql_duration')
+
+    def __init__(self, bucket_count):
+        self.count = 0
+        self.buckets = [0] * bucket_count
+        self.duration = 0
+        self.queries = 0
+        self.sql_duration = 0
+
+
+class Registry:
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def observe(self, route, method, duration, queries, sql_duration):
+        index = bisect.bisect_left(self.buckets, duration)
+
+        with self.lock:
+            metrics = self.routes.get((route, method))
+
+            if metrics is None:
+                metrics = RouteMetrics(len(self.buckets) + 1)
+                self.routes[route, method] = metrics
+
+            metrics.count += 1
+            metrics.buckets[index] += 1
+            metrics.duration += duration
+            metrics.queries += queries
+            metrics.sql_duration += sql_duration
+
+    def render(self):
+        with self.lock:
+            routes = sorted((key, (metrics.count, list(metrics.buckets),
+                                   metrics.duration, metrics.queries,
+                                   metrics.sql_duration))
+                            for key, metrics in self.routes.items())
+
+        lines = [
+            '# HELP taskplanner_requests_total Число запросов.',
+            '# TYPE taskplanner_requests_total counter',
+        ]
+        lines += [f'taskplanner_requests_total{{{labels(*key)}}} {row[0]}'
+                  for key, row in routes]
+
+        lines += [
+            '# HELP taskplanner_request_duration_seconds Время ответа.',
+            '# TYPE taskplanner_request_duration_seconds histogram',
+        ]
+
+        for key, (count, buckets, duration, _, _) in routes:
+            cumulative = 0
+
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                lines.append(
+                    f'taskplanner_request_duration_seconds_bucket'
+                    f'{{{labels(*key)},le="{bound}"}} {cumulative}')
+
+            lines += [
+                f'taskplanner_request_duration_seconds_bucket'
+                f'{{{labels(*key)},le="+Inf"}} {count}',
+                f'taskplanner_request_duration_seconds_sum'
+                f'{{{labels(*key)}}} {duration}',
+                f'taskplanner_request_duration_seconds_count'
+                f'{{{labels(*key)}}} {count}',
+            ]
+
+        lines += [
+            '# HELP taskplanner_sql_queries_total Число SQL-запросов.',
+            '# TYPE taskplanner_sql_queries_total counter',
+        ]
+        lines += [f'taskplanner_sql_queries_total{{{labels(*key)}}} {row[3]}'
+                  for key, row in routes]
+
+        lines += [
+            '# HELP taskplanner_sql_duration_seconds_total '
+            'Время SQL-запросов.',
+            '# TYPE taskplanner_sql_duration_seconds_total counter',
+        ]
+        lines += [f'taskplanner_sql_duration_seconds_total'
+                  f'{{{labels(*key)}}} {row[4]}'
+                  for key, row in routes]
+
+        return '\n'.join(lines) + '\n'
+
+
+def labels(route, method):
+    return f'route="{route}",method="{method}"'
+
+
+registry = Registry(settings.METRICS_LATENCY_BUCKETS)
+
+
+def get_route(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+
+    if resolver_match is None or resolver_match.url_name is None:
+        return 'unmatched'
+
+    return resolver_match.url_name
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+
+            start = time.perf_counter()
+            response = self.get_response(request)
+            duration = time.perf_counter() - start
+
+        registry.observe(get_route(request), request.method, duration,
+                         timer.count, timer.time)
+
+        return response
+
+
+class MetricsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,153 @@
+"""Поиск N+1 запросов. Во время обработки HTTP-запроса каждый SQL-запрос
+сводится к виду (fingerprint, см. slow_queries.normalize) и месту вызова
+- ближайшему к запросу кадру стека вне django.db. Если один и тот же вид
+запроса из одного места выполняется больше N_PLUS_ONE_THRESHOLD раз,
+это считается N+1: обычно это ленивая загрузка связи в цикле по
+объектам. Для каждого такого случая сохраняется стек вызова.
+
+N_PLUS_ONE_ACTION задает реакцию: 'raise' - исключение NPlusOneError
+(включается тестовым раннером), 'log' - предупреждение в логгер
+taskplanner.n_plus_one (для тестового стенда), None - middleware
+исключается из цепочки. По умолчанию поиск выключен: он замедляет
+каждый запрос к базе.
+Маршруты из N_PLUS_ONE_ALLOWLIST не проверяются."""
+
+import logging
+import os
+import sys
+import traceback
+from contextlib import ExitStack
+
+import django.db
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import get_route
+from .slow_queries import get_fingerprint
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_STATEMENTS = ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN',
+                          'COMMIT')
+IGNORED_PATHS = (os.path.dirname(django.db.__file__), __file__)
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def get_wrapper_codes(connection):
+    """Код оберток выполнения запросов соединения (метрики, журнал
+    медленных запросов), чтобы не принимать их за место вызова."""
+    codes = set()
+
+    for wrapper in connection.execute_wrappers:
+        function = getattr(wrapper, '__func__', wrapper)
+        code = getattr(function, '__code__', None)
+
+        if code is None:
+            code = getattr(type(wrapper).__call__, '__code__', None)
+
+        codes.add(code)
+
+    return codes
+
+
+def is_ignored(frame, wrapper_codes):
+    return (frame.f_code in wrapper_codes
+            or frame.f_code.co_filename.startswith(IGNORED_PATHS))
+
+
+def get_call_site(frame, wrapper_codes):
+    """Ближайший кадр вне django.db и оберток выполнения запросов."""
+
+    while frame is not None and is_ignored(frame, wrapper_codes):
+        frame = frame.f_back
+
+    return frame
+
+
+def format_stack(frame, wrapper_codes):
+    """Место вызова и кадры проекта над ним, от внешних к внутренним."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [(frame, frame.f_lineno)]
+    frame = frame.f_back
+
+    while frame is not None:
+        if (frame.f_code.co_filename.startswith(base_dir)
+                and not is_ignored(frame, wrapper_codes)):
+            frames.append((frame, frame.f_lineno))
+
+        frame = frame.f_back
+
+    return ''.join(traceback.format_list(
+        traceback.StackSummary.extract(reversed(frames))))
+
+
+class QueryCounter:
+    """Обертка выполнения запросов: считает запросы по виду и месту
+    вызова и запоминает стек тех, что повторились больше threshold раз."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = {}
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+
+        if not sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+            wrapper_codes = get_wrapper_codes(context['connection'])
+            frame = get_call_site(sys._getframe(1), wrapper_codes)
+            key = (get_fingerprint(sql),
+                   frame and (frame.f_code.co_filename, frame.f_lineno))
+            count = self.counts.get(key, 0) + 1
+            self.counts[key] = count
+
+            if count == self.threshold + 1:
+                self.stacks[key] = (sql, format_stack(frame, wrapper_codes)
+                                    if frame is not None else '')
+
+        return execute(sql, params, many, context)
+
+    def get_report(self, route, method):
+        lines = [f'N+1 запросы в {method} {route}:']
+
+        for key, (sql, stack) in self.stacks.items():
+            lines += [f'{self.counts[key]} раз: {sql}', stack]
+
+        return '\n'.join(lines)
+
+
+class NPlusOneMiddleware:
+
+    def __init__(self, get_response):
+
+        if settings.N_PLUS_ONE_ACTION is None:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter(settings.N_PLUS_ONE_THRESHOLD)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+
+            response = self.get_response(request)
+
+        route = get_route(request)
+
+        # при ошибке сервера запросы делает и отчет об ошибке, а исходное
+        # исключение важнее
+        if (counter.stacks and response.status_code < 500
+                and route not in settings.N_PLUS_ONE_ALLOWLIST):
+            report = counter.get_report(route, request.method)
+
+            if settings.N_PLUS_ONE_ACTION == 'raise':
+                raise NPlusOneError(report)
+
+            logger.warning(report)
+
+        return response
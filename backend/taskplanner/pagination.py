@@ -0,0 +1,207 @@
+"""Постраничный вывод по ключу (keyset pagination).
+
+Страница выбирается не через OFFSET, а условием "строки после последней
+показанной" по составному ключу сортировки, например (name, id). Поэтому
+запрос любой страницы стоит столько же, сколько первой, а строки,
+добавленные между запросами страниц, не сдвигают выдачу и не приводят к
+повторам или пропускам. Последнее поле ключа должно быть уникальным."""
+
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """В отличие от DjangoJSONEncoder сохраняет микросекунды, иначе
+    сравнение с ключом пропускало бы строки с близким временем."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    ordering = ('id', )
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_fields(queryset.model)
+        key, is_reversed = self.decode_cursor(request)
+
+        return self.get_page(queryset, key, is_reversed)
+
+    def paginate_tail(self, queryset, request, url, page_size):
+        """Последняя страница queryset для встраивания в другой ответ.
+        Ссылка previous ведет на предыдущую страницу по адресу url."""
+        self.url = replace_query_param(request.build_absolute_uri(url),
+                                       self.page_size_query_param, page_size)
+        self.page_size = page_size
+        self.fields = self.get_fields(queryset.model)
+
+        return self.get_page(queryset, key=None, is_reversed=True)
+
+    def get_page(self, queryset, key, is_reversed):
+        self.is_reversed = is_reversed
+
+        ordering = [self.get_order_by(field, descending, self.is_reversed)
+                    for field, descending in self.fields]
+        queryset = queryset.order_by(*ordering)
+
+        if key is not None:
+            queryset = queryset.filter(self.get_filter(key))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_more = len(page) > self.page_size
+        self.key = key
+        page = page[:self.page_size]
+
+        if self.is_reversed:
+            page.reverse()
+
+        self.page = page
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size < 1:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_fields(self, model):
+        """Возвращает пары (поле модели, по убыванию) для полей ключа."""
+        fields = []
+
+        for name in self.ordering:
+            descending = name.startswith('-')
+            field = model._meta.get_field(name.lstrip('-'))
+            fields.append((field, descending))
+
+        return fields
+
+    @staticmethod
+    def get_order_by(field, descending, is_reversed):
+        prefix = '-' if descending != is_reversed else ''
+        return prefix + field.attname
+
+    def get_filter(self, key):
+        """Условие "ключ строки идет после key" в виде
+        (a > x) OR (a = x AND b > y) OR ..."""
+        condition = Q()
+
+        for index, (field, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != self.is_reversed else 'gt'
+            equal = {
+                previous.attname: key[number]
+                for number, (previous, _) in enumerate(self.fields[:index])
+            }
+            condition |= Q(**equal, **{f'{field.attname}__{lookup}':
+                                       key[index]})
+
+        return condition
+
+    def get_key(self, obj):
+        return [getattr(obj, field.attname) for field, _ in self.fields]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if encoded is None:
+            return None, False
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+
+            if len(data['key']) != len(self.fields):
+                raise ValueError
+
+            key = [field.to_python(value)
+                   for (field, _), value in zip(self.fields, data['key'])]
+
+            return key, bool(data.get('reversed'))
+        except (binascii.Error, KeyError, TypeError, ValueError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, key, is_reversed):
+        data = json.dumps({'key': key, 'reversed': is_reversed},
+                          cls=CursorEncoder)
+        encoded = base64.urlsafe_b64encode(data.encode()).decode()
+
+        return replace_query_param(self.url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        has_next = self.key is not None if self.is_reversed else self.has_more
+
+        if not (has_next and self.page):
+            return None
+
+        return self.encode_cursor(self.get_key(self.page[-1]),
+                                  is_reversed=False)
+
+    def get_previous_link(self):
+        has_previous = (self.has_more if self.is_reversed
+                        else self.key is not None)
+
+        if not has_previous:
+            return None
+
+        key = self.get_key(self.page[0]) if self.page else self.key
+        return self.encode_cursor(key, is_reversed=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,168 @@
+"""Профилирование отдельных запросов. Запрос профилируется, если в
+заголовке X-Profile или параметре profile передан подписанный токен
+сотрудника (выдается на /api/v1/profiling/token/), или если он попал в
+выборку: каждый PROFILING_SAMPLE_RATE-й запрос каждого маршрута.
+
+Профиль снимается сэмплированием стека потока запроса с интервалом
+PROFILING_INTERVAL от выбора представления до ответа, то есть охватывает
+dispatch DRF, разрешения и сериализаторы. Результат записывается в
+PROFILING_DIR в формате свернутых стеков (flamegraph.pl, speedscope),
+хранятся последние PROFILING_MAX_FILES файлов. Имя файла возвращается в
+заголовке X-Profile-File только сотруднику, запросившему профиль: по
+выборке профилируются запросы любых пользователей, и им незачем знать,
+что их запрос профилировался. Если PROFILING_ENABLED
+выключен, middleware исключается из цепочки и ничего не стоит."""
+
+import itertools
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .metrics import get_route
+from users.models import CustomUser
+
+SALT = 'taskplanner.profiling'
+
+
+class StackSampler:
+    """Раз в interval секунд записывает стек потока thread_id."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            if frame is not None:
+                self.stacks[self.format_stack(frame)] += 1
+
+    @staticmethod
+    def format_stack(frame):
+        names = []
+
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} '
+                         f'({code.co_filename}:{code.co_firstlineno})')
+            frame = frame.f_back
+
+        return ';'.join(reversed(names))
+
+    def get_folded(self):
+        return ''.join(f'{stack} {count}\n'
+                       for stack, count in self.stacks.most_common())
+
+
+def make_token(user):
+    return signing.dumps({'user': user.id}, salt=SALT)
+
+
+def get_token_user_id(token):
+    try:
+        return signing.loads(token, salt=SALT,
+                             max_age=settings.PROFILING_TOKEN_MAX_AGE)['user']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def write_profile(name, folded):
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+
+    with open(path, 'w') as output:
+        output.write(folded)
+
+    profiles = sorted(entry.path for entry in os.scandir(directory)
+                      if entry.name.endswith('.folded'))
+
+    for old_path in profiles[:-settings.PROFILING_MAX_FILES]:
+        os.remove(old_path)
+
+    return path
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.counters = {}
+
+    def is_requested(self, request):
+        token = (request.META.get('HTTP_X_PROFILE')
+                 or request.GET.get('profile'))
+
+        if not token:
+            return False
+
+        user_id = get_token_user_id(token)
+
+        return user_id is not None and CustomUser.objects.filter(
+            pk=user_id, is_staff=True, is_active=True).exists()
+
+    def is_sampled(self, route):
+        rate = settings.PROFILING_SAMPLE_RATE
+
+        if not rate:
+            return False
+
+        counter = self.counters.setdefault(route, itertools.count())
+        return next(counter) % rate == 0
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = get_route(request)
+
+        request.profile_requested = self.is_requested(request)
+
+        if self.is_sampled(route) or request.profile_requested:
+            request.profiler = StackSampler(threading.get_ident(),
+                                            settings.PROFILING_INTERVAL)
+            request.profiler.start()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        profiler = getattr(request, 'profiler', None)
+
+        if profiler is not None:
+            profiler.stop()
+            name = (f'{datetime.now().strftime("%Y%m%d-%H%M%S-%f")}-'
+                    f'{get_route(request)}-{request.method.lower()}.folded')
+            write_profile(name, profiler.get_folded())
+
+            if request.profile_requested:
+                response['X-Profile-File'] = name
+
+        return response
+
+
+class ProfilingTokenAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'token': make_token(request.user),
+                         'expires_in': settings.PROFILING_TOKEN_MAX_AGE})
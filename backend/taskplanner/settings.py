@@ -30,7 +30,15 @@ INSTALLED_APPS = [
     'cards',
 ]
 
+# проверка планов запросов (audit_query_plans) вызывает эндпоинты на
+# тестовых данных и нужна только при разработке
+if DEBUG:
+    INSTALLED_APPS.append('taskplanner.bench')
+
 MIDDLEWARE = [
+    'taskplanner.metrics.MetricsMiddleware',
+    'taskplanner.slow_queries.SlowQueryMiddleware',
+    'taskplanner.n_plus_one.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,10 +46,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'taskplanner.identity_map.IdentityMapMiddleware',
+    'taskplanner.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'taskplanner.urls'
 
+TEST_RUNNER = 'taskplanner.test_runner.TestRunner'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -65,9 +77,103 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'ATOMIC_REQUESTS': True,
     }
 }
 
+# общий для процессов кэш, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache и
+# CACHE_LOCATION=127.0.0.1:11211; без них - кэш в памяти процесса
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'local',
+        'TIMEOUT': 5,
+    },
+}
+
+MEMBERSHIP_LOCAL_CACHE = 'local'
+MEMBERSHIP_SHARED_CACHE = 'default'
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+BOARD_SNAPSHOT_CACHE = 'default'
+BOARD_SNAPSHOT_TIMEOUT = 60 * 60
+
+BOARD_CHANGES_MAX_RESULTS = 500
+BOARD_CHANGES_MAX_AGE = timedelta(days=30)
+BOARD_CHANGES_MAX_ENTRIES = 5000
+
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+                           2.5, 5, 10)
+
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.log'
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUP_COUNT = 3
+
+# поиск N+1 стоит времени на каждом запросе, поэтому по умолчанию
+# выключен; на стенде включается переменной окружения (обычно 'log'),
+# в тестах - раннером taskplanner.test_runner ('raise')
+N_PLUS_ONE_ACTION = os.environ.get('N_PLUS_ONE_ACTION') or None
+N_PLUS_ONE_THRESHOLD = 5
+# подзапросы пакета по природе повторяют одни и те же запросы
+N_PLUS_ONE_ALLOWLIST = {'batch'}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': SLOW_QUERY_LOG_MAX_BYTES,
+            'backupCount': SLOW_QUERY_LOG_BACKUP_COUNT,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'taskplanner.n_plus_one': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'taskplanner.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+PROFILING_ENABLED = False
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 100
+PROFILING_SAMPLE_RATE = 0
+PROFILING_INTERVAL = 0.001
+PROFILING_TOKEN_MAX_AGE = 3600
+
+BATCH_URL = '/api/v1/batch/'
+BATCH_MAX_OPERATIONS = 50
+
+EVENTS_URL = '/api/v1/events/'
+EVENTS_KEEPALIVE = 30
+EVENTS_QUEUE_SIZE = 100
+
+SEARCH_RESULTS_LIMIT = 50
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,9 +210,15 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS':
-        'rest_framework.pagination.LimitOffsetPagination'
+        'taskplanner.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
+PAGINATION_MAX_PAGE_SIZE = 200
+
+CARD_EMBEDDED_OBJECTS_LIMIT = 10
+CARDS_BULK_CREATE_MAX_SIZE = 500
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'users.serializers.CustomUserSerializer',
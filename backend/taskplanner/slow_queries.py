@@ -0,0 +1,203 @@
+"""Журнал медленных запросов. Каждый SQL-запрос, выполнявшийся во время
+обработки HTTP-запроса дольше SLOW_QUERY_THRESHOLD секунд, записывается
+в логгер taskplanner.slow_queries одной JSON-строкой: SQL без значений,
+типы параметров, маршрут (boards-detail, cards-change-list и т.д.), метод
+и план выполнения (EXPLAIN QUERY PLAN в SQLite). Значения в журнал не
+попадают: среди них бывают пароли, токены и тексты пользователей. План
+снимается один раз для каждого вида запроса в процессе; вид запроса
+(fingerprint) - SQL без значений, по нему записи собирает команда
+slow_queries. Если
+SLOW_QUERY_THRESHOLD равен None, middleware исключается из цепочки."""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from .metrics import get_route
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAMS = 50
+EXPLAINED_LIMIT = 1000
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+explained = set()
+
+
+def normalize(sql):
+    """SQL без значений: строки, числа, %s и списки IN заменяются на ?."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?, ...)', sql)
+
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def mask_params(params):
+    """Числа и None оставляет, остальные значения заменяет типом, а
+    строки - типом и длиной."""
+    masked = []
+
+    for value in list(params or ())[:MAX_PARAMS]:
+        if value is None or isinstance(value, (bool, int, float)):
+            masked.append(value)
+        elif isinstance(value, (str, bytes)):
+            masked.append(f'<{type(value).__name__}:{len(value)}>')
+        else:
+            masked.append(f'<{type(value).__name__}>')
+
+    return masked
+
+
+def get_fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """Возвращает строки плана выполнения или None, если база или запрос
+    его не поддерживают."""
+
+    if (connection.vendor != 'sqlite'
+            or not sql.lstrip().upper().startswith(EXPLAINABLE)):
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+
+    depths = {0: -1}
+    plan = []
+
+    for node_id, parent_id, _, detail in rows:
+        depths[node_id] = depths.get(parent_id, -1) + 1
+        plan.append('  ' * depths[node_id] + detail)
+
+    return plan
+
+
+class SlowQueryLogger:
+    """Обертка выполнения запросов (connection.execute_wrapper)."""
+
+    def __init__(self, request):
+        self.request = request
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+
+        if self.explaining:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+
+        if duration >= settings.SLOW_QUERY_THRESHOLD:
+            self.log(context['connection'], sql, params, many, duration)
+
+        return result
+
+    def log(self, connection, sql, params, many, duration):
+        fingerprint = get_fingerprint(sql)
+        plan = None
+
+        if not many and fingerprint not in explained:
+            self.explaining = True
+
+            try:
+                plan = explain(connection, sql, params)
+            finally:
+                self.explaining = False
+
+            if len(explained) < EXPLAINED_LIMIT:
+                explained.add(fingerprint)
+
+        logger.warning(json.dumps({
+            'time': timezone.now().isoformat(),
+            'duration': round(duration, 6),
+            'fingerprint': fingerprint,
+            'sql': normalize(sql),
+            'params': mask_params(params) if not many else None,
+            'route': get_route(self.request),
+            'method': self.request.method,
+            'plan': plan,
+        }, default=str, ensure_ascii=False))
+
+
+class SlowQueryMiddleware:
+
+    def __init__(self, get_response):
+
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_query_logger = SlowQueryLogger(request)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(slow_query_logger))
+
+            return self.get_response(request)
+
+
+def read_log(paths):
+    """Читает записи из файлов журнала, пропуская чужие строки."""
+
+    for path in paths:
+        try:
+            log_file = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            continue
+
+        with log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                if isinstance(entry, dict) and 'fingerprint' in entry:
+                    yield entry
+
+
+def aggregate(entries):
+    """Собирает записи по fingerprint: число, суммарное, среднее и
+    максимальное время, маршруты, пример SQL и план."""
+    groups = {}
+
+    for entry in entries:
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'sql': normalize(entry['sql']),
+            'count': 0,
+            'total': 0,
+            'max': 0,
+            'routes': {},
+            'plan': None,
+        })
+        group['count'] += 1
+        group['total'] += entry['duration']
+        group['max'] = max(group['max'], entry['duration'])
+        route = f'{entry["method"]} {entry["route"]}'
+        group['routes'][route] = group['routes'].get(route, 0) + 1
+        group['plan'] = group['plan'] or entry.get('plan')
+
+    for group in groups.values():
+        group['mean'] = group['total'] / group['count']
+
+    return list(groups.values())
@@ -0,0 +1,531 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import profiling, slow_queries
+from .bench import query_plans
+from .bench.scenarios import SCENARIOS, SIZES, build_fixture, get_endpoints
+from .n_plus_one import NPlusOneError
+from .slow_queries import explain
+from boards import benchmark, synthetic
+from boards.models import Board, ParticipantInBoard
+from cards.models import Card, CardQuerySet, CheckList, Comment, RANK_STEP
+from lists.models import List
+from users.models import CustomUser
+
+
+class QueryCountTest(TestCase):
+    """Для каждого маршрута роутера число SQL-запросов на большом наборе
+    данных совпадает с малым (или превышает его не больше бюджета
+    сценария). Методы test_<представление>_<действие>_<метод> создаются
+    по роутеру, поэтому новый маршрут без сценария тоже падает."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixtures = {name: build_fixture(name, **sizes)
+                        for name, sizes in SIZES.items()}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+
+    def count_queries(self, call):
+        for cache in caches.all():
+            cache.clear()
+
+        client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(call.user)}')
+        method = getattr(client, self.method)
+        extra = {} if call.multipart else {'content_type': 'application/json'}
+
+        with self.settings(MEDIA_ROOT=self.media_root), \
+                CaptureQueriesContext(connection) as context:
+            response = method(call.path, call.data, **extra)
+
+        self.assertLess(response.status_code, 400,
+                        f'{self.method.upper()} {call.path}: '
+                        f'{response.content[:200]}')
+
+        return len([query for query in context.captured_queries
+                    if 'SAVEPOINT' not in query['sql']])
+
+    def check_endpoint(self, viewset, action, method):
+        scenario = SCENARIOS.get((viewset, action, method))
+
+        if scenario is None:
+            self.fail(f'Нет сценария для {viewset}.{action} ({method})')
+
+        self.method = method
+        calls = {name: scenario(fixture)
+                 for name, fixture in self.fixtures.items()}
+        counts = {name: self.count_queries(call)
+                  for name, call in calls.items()}
+
+        self.assertLessEqual(
+            counts['large'] - counts['small'], calls['large'].budget,
+            f'{viewset}.{action} ({method}): {counts}')
+
+    def test_scenarios_match_routes(self):
+        self.assertEqual(set(SCENARIOS), set(get_endpoints()))
+
+
+def make_test(endpoint):
+    def test(self):
+        self.check_endpoint(*endpoint)
+
+    return test
+
+
+for endpoint in get_endpoints():
+    setattr(QueryCountTest, 'test_{}_{}_{}'.format(*endpoint),
+            make_test(endpoint))
+
+
+class QueryPlanTest(TestCase):
+    """Запросы эндпоинтов находят строки по индексам, а не просмотром
+    таблиц."""
+
+    def test_scanned_tables(self):
+        sql = ('SELECT "boards_board"."id" FROM "boards_board" WHERE '
+               'EXISTS(SELECT 1 FROM "boards_favorite" U0 WHERE '
+               'U0."board_id" = "boards_board"."id")')
+        plan = ['SCAN boards_board', 'CORRELATED SCALAR SUBQUERY 1',
+                '  SCAN U0', '  SEARCH U1 USING INDEX i (id=?)']
+
+        self.assertEqual(query_plans.get_scanned_tables(sql, plan),
+                         ['boards_board', 'boards_favorite'])
+
+    def test_audit(self):
+        fixture = build_fixture('small', **SIZES['small'])
+        name = Board._meta.db_table
+        queryset = Board.objects.filter(description='Описание')
+        sql, params = queryset.query.sql_with_params()
+
+        self.assertEqual(query_plans.get_scanned_tables(
+            sql, explain(connection, sql, params)), [name])
+        self.assertEqual(query_plans.audit(fixture, min_rows=0), ([], []))
+
+
+class BatchTest(TestCase):
+    """Пакет операций выполняется в одной транзакции целиком или не
+    выполняется вовсе."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+        self.list_1 = List.objects.create(name='1', board=self.board,
+                                          position=1)
+        self.list_2 = List.objects.create(name='2', board=self.board,
+                                          position=2)
+        self.cards = [
+            Card.objects.create(name=str(number), list=self.list_1,
+                                rank=number * RANK_STEP)
+            for number in range(1, 4)
+        ]
+
+    def batch(self, operations):
+        return self.client.post('/api/v1/batch/', operations,
+                                content_type='application/json')
+
+    def move(self, card, list_, position):
+        return {'method': 'POST',
+                'path': f'/api/v1/cards/{card.id}/change_list/',
+                'data': {'id': list_.id, 'position': position}}
+
+    def get_names(self, list_):
+        return list(list_.cards.order_by('rank').values_list('name',
+                                                             flat=True))
+
+    def test_operations_are_applied_in_order(self):
+        tag = self.board.tags.first()
+        response = self.batch([
+            self.move(self.cards[0], self.list_2, 1),
+            self.move(self.cards[2], self.list_2, 1),
+            {'method': 'POST',
+             'path': f'/api/v1/cards/{self.cards[1].id}/tags/',
+             'data': {'id': tag.id}},
+            {'method': 'GET', 'path': f'/api/v1/lists/{self.list_2.id}/'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         [200, 200, 201, 200])
+        self.assertEqual([card['name'] for card in results[3]['data']
+                          ['cards']], ['3', '1'])
+        self.assertEqual(self.get_names(self.list_1), ['2'])
+
+    def test_failed_operation_rolls_back_batch(self):
+        response = self.batch([
+            self.move(self.cards[0], self.list_2, 1),
+            {'method': 'POST', 'path': '/api/v1/cards/0/change_list/',
+             'data': {'id': self.list_2.id, 'position': 1}},
+        ])
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertEqual(self.get_names(self.list_1), ['1', '2', '3'])
+        self.assertEqual(self.get_names(self.list_2), [])
+
+    def test_read_after_rollback(self):
+        board_path = f'/api/v1/boards/{self.board.id}/'
+        response = self.batch([
+            self.move(self.cards[0], self.list_2, 1),
+            {'method': 'GET', 'path': board_path},
+            {'method': 'POST', 'path': '/api/v1/cards/0/change_list/',
+             'data': {'id': self.list_2.id, 'position': 1}},
+        ])
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['results'][1]['data']['lists'][1]
+                         ['cards'][0]['name'], '1')
+
+        response = self.batch([{'method': 'GET', 'path': board_path}])
+        lists = response.json()['results'][0]['data']['lists']
+        self.assertEqual([card['name'] for card in lists[0]['cards']],
+                         ['1', '2', '3'])
+        self.assertEqual(lists[1]['cards'], [])
+
+    def test_size_limit(self):
+        with self.settings(BATCH_MAX_OPERATIONS=2):
+            response = self.batch(
+                [self.move(card, self.list_2, 1) for card in self.cards])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_names(self.list_2), [])
+
+
+class BenchmarkTest(TestCase):
+    """Генератор создает данные заданного размера, а замеры проходят по
+    всем эндпоинтам."""
+
+    def test_generate_and_run(self):
+        user_ids, board_ids = synthetic.generate(
+            users=4, boards=3, participants=3, lists=2, cards=3,
+            comments=2, tags=2, card_participants=2, boards_per_batch=2)
+
+        self.assertEqual(len(user_ids), 4)
+        self.assertEqual(len(board_ids), 3)
+        self.assertEqual(ParticipantInBoard.objects.count(), 9)
+        self.assertEqual(Card.objects.count(), 18)
+        self.assertEqual(Comment.objects.count(), 36)
+        self.assertEqual(Card.tags.through.objects.count(), 36)
+
+        results = benchmark.run(board_ids[0], repeat=2)
+
+        self.assertIn('participants-destroy', results)
+        self.assertEqual(set(results['boards-list']),
+                         {'p50_ms', 'p95_ms', 'queries', 'sql_ms',
+                          'peak_memory_kb'})
+
+    def test_seed_scale(self):
+        call_command('seed_scale', users=20, boards=15, batch=4,
+                     stdout=io.StringIO())
+        positions = {}
+
+        for board_id, position in List.objects.values_list('board',
+                                                           'position'):
+            positions.setdefault(board_id, []).append(position)
+
+        self.assertEqual(Board.objects.count(), 15)
+        self.assertFalse(Board.objects.annotate(
+            tag_count=Count('tags')).exclude(tag_count=6).exists())
+
+        for board_positions in positions.values():
+            self.assertEqual(sorted(board_positions),
+                             list(range(1, len(board_positions) + 1)))
+
+        self.assertFalse(Card.tags.through.objects.exclude(
+            tag__board=F('card__list__board')).exists())
+        self.assertFalse(Card.participants.through.objects.exclude(
+            customuser__boards_participants=F('card__list__board')).exists())
+
+
+class MetricsTest(TestCase):
+    """Метрики запросов собираются по маршрутам и доступны только
+    персоналу."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.staff = CustomUser.objects.create(username='staff',
+                                               email='staff@test.ru',
+                                               is_staff=True)
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+
+    def get_client(self, user):
+        return Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def get_metric(self, text, name, route):
+        prefix = f'{name}{{route="{route}",method="GET"}} '
+
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+
+        return 0
+
+    def test_metrics(self):
+        staff_client = self.get_client(self.staff)
+        text = staff_client.get('/api/v1/metrics/').content.decode()
+        count = self.get_metric(text, 'taskplanner_requests_total',
+                                'boards-detail')
+        queries = self.get_metric(text, 'taskplanner_sql_queries_total',
+                                  'boards-detail')
+
+        self.get_client(self.user).get(f'/api/v1/boards/{self.board.id}/')
+
+        response = staff_client.get('/api/v1/metrics/')
+        text = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertEqual(self.get_metric(text, 'taskplanner_requests_total',
+                                         'boards-detail'), count + 1)
+        self.assertGreater(
+            self.get_metric(text, 'taskplanner_sql_queries_total',
+                            'boards-detail'), queries)
+        self.assertIn('taskplanner_request_duration_seconds_bucket{'
+                      'route="boards-detail",method="GET",le="+Inf"}', text)
+
+    def test_metrics_require_staff(self):
+        response = self.get_client(self.user).get('/api/v1/metrics/')
+        self.assertEqual(response.status_code, 403)
+
+
+class ProfilingTest(TestCase):
+    """Запрос профилируется по токену сотрудника или по выборке, профиль
+    записывается в каталог с ограниченным числом файлов."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.staff = CustomUser.objects.create(username='staff',
+                                               email='staff@test.ru',
+                                               is_staff=True)
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def get_client(self, user):
+        return Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def get_board(self, **extra):
+        return self.get_client(self.user).get(
+            f'/api/v1/boards/{self.board.id}/', **extra)
+
+    def test_profile_by_token(self):
+        token = self.get_client(self.staff).get(
+            '/api/v1/profiling/token/').json()['token']
+        user_token = profiling.make_token(self.user)
+
+        with self.settings(PROFILING_ENABLED=True,
+                           PROFILING_DIR=self.directory,
+                           PROFILING_INTERVAL=0.0001):
+            self.assertNotIn('X-Profile-File', self.get_board())
+            self.assertNotIn('X-Profile-File',
+                             self.get_board(HTTP_X_PROFILE=user_token))
+            response = self.get_board(HTTP_X_PROFILE=token)
+
+        name = response['X-Profile-File']
+        self.assertTrue(name.endswith('-boards-detail-get.folded'))
+        self.assertEqual(os.listdir(self.directory), [name])
+
+        with open(os.path.join(self.directory, name)) as profile:
+            for line in profile:
+                stack, count = line.rsplit(' ', 1)
+                self.assertGreater(int(count), 0)
+
+    def test_sampling_and_rotation(self):
+        with self.settings(PROFILING_ENABLED=True,
+                           PROFILING_DIR=self.directory,
+                           PROFILING_SAMPLE_RATE=2, PROFILING_MAX_FILES=2):
+            client = self.get_client(self.user)
+            names = set()
+
+            for _ in range(6):
+                response = client.get(f'/api/v1/boards/{self.board.id}/')
+                self.assertNotIn('X-Profile-File', response)
+                names.update(os.listdir(self.directory))
+
+        self.assertEqual(len(names), 3)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_disabled(self):
+        with self.settings(PROFILING_DIR=self.directory,
+                           PROFILING_SAMPLE_RATE=1):
+            response = self.get_board()
+
+        self.assertNotIn('X-Profile-File', response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class SlowQueryTest(TestCase):
+    """Медленные запросы записываются с маршрутом и планом, команда
+    собирает их по видам запросов."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.board = Board.objects.create_board(author=self.user,
+                                                name='Доска')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_normalize(self):
+        self.assertEqual(
+            slow_queries.normalize(
+                "SELECT * FROM t WHERE a = 'x''y' AND b IN (1, 2, 3) "
+                "AND c = %s AND t1.d > 2.5"),
+            'SELECT * FROM t WHERE a = ? AND b IN (?, ...) '
+            'AND c = ? AND t1.d > ?')
+        self.assertEqual(
+            slow_queries.get_fingerprint('SELECT 1 FROM t WHERE id IN (1)'),
+            slow_queries.get_fingerprint(
+                'SELECT 1 FROM t WHERE id IN (7, 8)'))
+
+    def test_log_and_report(self):
+        slow_queries.explained.clear()
+
+        with self.settings(SLOW_QUERY_THRESHOLD=0), \
+                self.assertLogs('taskplanner.slow_queries') as logs:
+            for _ in range(2):
+                self.client.get(f'/api/v1/boards/{self.board.id}/')
+
+        entries = [json.loads(record.getMessage())
+                   for record in logs.records]
+        self.assertEqual({entry['route'] for entry in entries},
+                         {'boards-detail'})
+        self.assertTrue(any(entry['plan'] for entry in entries))
+
+        log = tempfile.NamedTemporaryFile('w', suffix='.log', delete=False)
+        self.addCleanup(os.remove, log.name)
+
+        with log:
+            log.write(''.join(f'{record.getMessage()}\n'
+                              for record in logs.records))
+
+        output = io.StringIO()
+        call_command('slow_queries', log=[log.name], json=True, top=100,
+                     order='count', stdout=output)
+        groups = json.loads(output.getvalue())
+
+        self.assertEqual(sum(group['count'] for group in groups),
+                         len(entries))
+        self.assertEqual(len({group['fingerprint'] for group in groups}),
+                         len(groups))
+        self.assertGreaterEqual(groups[0]['count'], 2)
+        self.assertIn('GET boards-detail', groups[0]['routes'])
+
+    def test_values_are_not_logged(self):
+        self.assertEqual(
+            slow_queries.mask_params([1, None, 'секрет', b'ab', 2.5]),
+            [1, None, '<str:6>', '<bytes:2>', 2.5])
+
+        with self.settings(SLOW_QUERY_THRESHOLD=0), \
+                self.assertLogs('taskplanner.slow_queries') as logs:
+            self.client.patch(f'/api/v1/boards/{self.board.id}/',
+                              {'name': 'Секретная доска'},
+                              content_type='application/json')
+
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.name, 'Секретная доска')
+
+        for record in logs.records:
+            self.assertNotIn('Секретная', record.getMessage())
+
+    def test_disabled(self):
+        with self.settings(SLOW_QUERY_THRESHOLD=None), \
+                mock.patch.object(slow_queries.logger, 'warning') as warning:
+            self.client.get(f'/api/v1/boards/{self.board.id}/')
+
+        warning.assert_not_called()
+
+
+class NPlusOneTest(TestCase):
+    """Список карточек подгружает связанные объекты заранее, а
+    повторяющиеся из одного места запросы находит NPlusOneMiddleware."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='user',
+                                              email='user@test.ru')
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        board = Board.objects.create_board(author=self.user, name='Доска')
+        self.list = List.objects.create(name='Список', board=board,
+                                        position=1)
+
+    def create_cards(self, count):
+        tags = list(self.list.board.tags.all()[:2])
+
+        for number in range(count):
+            card = Card.objects.create(name=str(number), list=self.list,
+                                       rank=(number + 1) * RANK_STEP)
+            card.tags.add(*tags)
+            card.participants.add(self.user)
+            Comment.objects.create(author=self.user, card=card, text='1')
+            CheckList.objects.create(card=card, text='Пункт')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/cards/')
+
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_cards_list(self):
+        self.create_cards(2)
+        small_count = self.count_queries()
+        self.create_cards(10)
+
+        self.assertEqual(self.count_queries(), small_count)
+
+    def test_detection(self):
+        self.create_cards(10)
+
+        with mock.patch.object(CardQuerySet, 'with_related',
+                               lambda queryset: queryset):
+            with self.assertRaises(NPlusOneError) as raised:
+                self.client.get('/api/v1/cards/')
+
+            with self.settings(N_PLUS_ONE_ALLOWLIST={'cards-list'}):
+                self.assertEqual(
+                    self.client.get('/api/v1/cards/').status_code, 200)
+
+            with self.settings(N_PLUS_ONE_ACTION='log'), \
+                    self.assertLogs('taskplanner.n_plus_one') as logs:
+                self.client.get('/api/v1/cards/')
+
+        self.assertIn('GET cards-list', str(raised.exception))
+        self.assertIn('cards_comment', str(raised.exception))
+        self.assertIn('rest_framework', str(raised.exception))
+        self.assertIn('GET cards-list', logs.output[0])
+
+    def test_threshold(self):
+        self.create_cards(3)
+
+        with mock.patch.object(CardQuerySet, 'with_related',
+                               lambda queryset: queryset), \
+                self.settings(N_PLUS_ONE_THRESHOLD=3):
+            self.assertEqual(self.client.get('/api/v1/cards/').status_code,
+                             200)
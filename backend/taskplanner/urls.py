@@ -9,6 +9,9 @@ from cards.views import (CardViewSet, ParticipantInCardViewSet,
                          CheckListViewSet)
 from requests.views import BoardRequestViewSet, UserRequestViewSet
 from lists.views import ListViewSet
+from .batch import BatchAPIView
+from .metrics import MetricsAPIView
+from .profiling import ProfilingTokenAPIView
 
 
 router = DefaultRouter()
@@ -46,5 +49,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('users.urls')),
     path('api/v1/search/', SearchAPIView.as_view(), name='search'),
+    path('api/v1/batch/', BatchAPIView.as_view(), name='batch'),
+    path('api/v1/metrics/', MetricsAPIView.as_view(), name='metrics'),
+    path('api/v1/profiling/token/', ProfilingTokenAPIView.as_view(),
+         name='profiling-token'),
     path('api/v1/', include(router.urls)),
 ]